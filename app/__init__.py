@@ -10,11 +10,13 @@ def create_app(config_class=Config):
     from .services.samples import SampleManager
     from .services.optimization import Optimizer
     from .services.evaluation import Evaluator
+    from .services.jobs import EvaluationJobManager
     
     app_state = AppState()
     sample_manager = SampleManager(app_state)
     optimizer = Optimizer(app_state, sample_manager)
     evaluator = Evaluator(app_state, sample_manager)
+    job_manager = EvaluationJobManager(app_state, evaluator)
     
     # Register blueprints
     from .routes.main import create_main_routes
@@ -24,15 +26,19 @@ def create_app(config_class=Config):
     from .routes.api import create_api_routes
     from .routes.models import create_model_routes
     
-    app.register_blueprint(create_main_routes(app_state, sample_manager, optimizer, evaluator))
+    app.register_blueprint(create_main_routes(app_state, sample_manager, optimizer, evaluator, job_manager))
     app.register_blueprint(create_signature_routes(app_state, sample_manager), url_prefix='/signatures')
     app.register_blueprint(create_sample_routes(app_state, sample_manager), url_prefix='/samples')
     app.register_blueprint(create_program_routes(app_state, optimizer), url_prefix='/programs')
     app.register_blueprint(create_model_routes(app_state), url_prefix='/models')
-    app.register_blueprint(create_api_routes(app_state, sample_manager, optimizer, evaluator), url_prefix='/api')
+    app.register_blueprint(create_api_routes(app_state, sample_manager, optimizer, evaluator, job_manager), url_prefix='/api')
     
     # Template filters
     from .utils.filters import register_filters
     register_filters(app)
     
+    # CLI commands
+    from .commands import register_commands
+    register_commands(app, app_state, sample_manager)
+    
     return app
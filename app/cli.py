@@ -0,0 +1,285 @@
+"""
+Command line interface for running evaluations, optimizations and sample generation
+without the web application
+
+Usage:
+    python -m app.cli evaluate --model anthropic/claude-3-7-sonnet-20250219 --format jsonl
+    python -m app.cli optimize --model openai/gpt-4o --signature PLNSignature
+    python -m app.cli generate --model openai/gpt-4o --results results.json --below 0.5
+"""
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import click
+from tabulate import tabulate
+
+from .config import Config
+
+FORMATS = click.Choice(["json", "jsonl", "table"])
+
+def parse_sample_ids(spec: Optional[str], shard: Optional[str], limit: Optional[int],
+                     num_samples: int) -> Optional[List[int]]:
+    """Select sample indices from command line options
+
+    Args:
+        spec: Comma separated indices and ranges, e.g. "0-9,15"
+        shard: "<index>/<count>" to keep every count-th sample starting at index
+        limit: Maximum number of samples to keep
+        num_samples: Number of samples of the signature
+
+    Returns:
+        Optional[List[int]]: The selected indices, or None for every sample
+    """
+    if spec is None and shard is None and limit is None:
+        return None
+
+    if spec is None:
+        sample_ids = list(range(num_samples))
+    else:
+        sample_ids = []
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                if "-" in part:
+                    start, end = part.split("-", 1)
+                    sample_ids.extend(range(int(start), int(end) + 1))
+                else:
+                    sample_ids.append(int(part))
+            except ValueError:
+                raise click.BadParameter(f"Invalid sample range: {part}", param_hint="--samples")
+        sample_ids = sorted(set(sample_ids))
+
+    if shard is not None:
+        try:
+            index, count = (int(value) for value in shard.split("/"))
+            if count < 1 or not 0 <= index < count:
+                raise ValueError
+        except ValueError:
+            raise click.BadParameter(f"Expected <index>/<count>, got {shard}", param_hint="--shard")
+        sample_ids = [i for i in sample_ids if i % count == index]
+
+    if limit is not None:
+        sample_ids = sample_ids[:limit]
+    return sample_ids
+
+def sample_options(fn):
+    """Add the options that select a subset of the samples"""
+    fn = click.option("--limit", type=int, help="Use at most this many of the selected samples.")(fn)
+    fn = click.option("--shard", help="Use the samples of one shard, e.g. 0/4 for every 4th sample from the first.")(fn)
+    fn = click.option("--samples", "samples_spec", help="Sample indices and ranges, e.g. 0-9,15.")(fn)
+    return fn
+
+def create_services() -> Dict:
+    """Create the services used by the web application, after options have set the config"""
+    from .services.state import AppState
+    from .services.samples import SampleManager
+    from .services.optimization import Optimizer
+    from .services.evaluation import Evaluator
+
+    app_state = AppState()
+    sample_manager = SampleManager(app_state)
+    return {
+        "app_state": app_state,
+        "sample_manager": sample_manager,
+        "optimizer": Optimizer(app_state, sample_manager),
+        "evaluator": Evaluator(app_state, sample_manager),
+    }
+
+def resolve_program(app_state, program_id: Optional[str], signature_name: Optional[str]) -> Optional[str]:
+    """Get the program to use: the given one, the newest for a signature, or the current one"""
+    if program_id:
+        return program_id
+    if signature_name:
+        programs = app_state.get_programs_for_signature(signature_name, limit=1)
+        return next(iter(programs), None)
+    return app_state.current_program_id
+
+def write_records(out, records: Iterable[Dict]):
+    """Write one JSON record per line, flushing so each record can be consumed immediately"""
+    for record in records:
+        out.write(json.dumps(record, default=str) + "\n")
+        out.flush()
+
+@click.group()
+@click.option("--cache-dir", type=click.Path(file_okay=False, path_type=Path),
+              help="Directory of the prediction and judge caches.")
+@click.option("--lm-transport", type=click.Choice(["live", "record", "replay"]),
+              help="Call providers, record their responses, or replay recorded responses.")
+@click.option("--transcript", type=click.Path(dir_okay=False, path_type=Path),
+              help="Transcript file to record to or replay from.")
+@click.option("--replay-latency", help="Simulated latency of replayed responses, e.g. lognormal:-0.5,0.4.")
+@click.pass_context
+def cli(ctx, cache_dir, lm_transport, transcript, replay_latency):
+    """Run PromptGen evaluations, optimizations and sample generation"""
+    if cache_dir:
+        Config.CACHE_DIR = cache_dir
+    if lm_transport:
+        Config.LM_TRANSPORT = "" if lm_transport == "live" else lm_transport
+    if transcript:
+        Config.LM_TRANSCRIPT = str(transcript)
+    if replay_latency:
+        Config.LM_REPLAY_LATENCY = replay_latency
+    # Library code reports progress with print(); keep stdout for results
+    ctx.obj = {"out": sys.stdout}
+    ctx.with_resource(redirect_stdout(sys.stderr))
+
+@cli.command()
+@click.option("--model", required=True, help="Model to run the program with.")
+@click.option("--similarity-model", help="Model to judge predictions with. Defaults to --model.")
+@click.option("--program", "program_id", help="Program to evaluate. Defaults to the current program.")
+@click.option("--signature", "signature_name", help="Evaluate the newest program of this signature.")
+@click.option("--workers", type=int, help="Samples evaluated concurrently. Defaults to the model's max_workers.")
+@click.option("--no-cache", is_flag=True, help="Run the program on every sample instead of reusing cached outputs.")
+@sample_options
+@click.option("--format", "output_format", type=FORMATS, default="json", show_default=True,
+              help="json: the full result; jsonl: a progress record per sample as it finishes; table: a summary.")
+@click.option("--output", type=click.File("w"), help="Write results to a file instead of stdout.")
+@click.pass_obj
+def evaluate(obj, model, similarity_model, program_id, signature_name, workers, no_cache,
+             samples_spec, shard, limit, output_format, output):
+    """Evaluate a program on its signature's samples"""
+    services = create_services()
+    app_state = services["app_state"]
+    evaluator = services["evaluator"]
+    out = output or obj["out"]
+
+    program_id = resolve_program(app_state, program_id, signature_name)
+    if not program_id:
+        raise click.ClickException("No program found to evaluate.")
+    program_signature = app_state.programs.get(program_id, {}).get("signature_name")
+    num_samples = services["sample_manager"].count_samples(program_signature) if program_signature else 0
+    sample_ids = parse_sample_ids(samples_spec, shard, limit, num_samples)
+
+    options = dict(num_workers=workers, program_id=program_id, use_cache=not no_cache, sample_ids=sample_ids)
+    if output_format == "jsonl":
+        failed = []
+
+        def records():
+            for record in evaluator.stream_evaluation(model, similarity_model, **options):
+                if record["type"] == "error":
+                    failed.append(record)
+                yield record
+        write_records(out, records())
+        if failed:
+            sys.exit(1)
+        return
+
+    result = evaluator.run_evaluation(model, similarity_model, **options)
+    if result.get("status") != "success":
+        raise click.ClickException(result.get("message", "Evaluation failed"))
+
+    if output_format == "json":
+        json.dump(result, out, indent=2, default=str)
+        out.write("\n")
+    else:
+        rows = [
+            [r["sample_id"], r.get("overall_score"), r.get("cached", False),
+             ", ".join(r.get("served_models", [])), r.get("error", "")]
+            for r in result["results"]
+        ]
+        out.write(tabulate(rows, headers=["sample", "score", "cached", "served by", "error"]) + "\n")
+        metrics = result["metrics"]
+        out.write(f"\nProgram {result['program_id']}: average score {metrics['avg_score']:.3f} over "
+                  f"{metrics['num_samples']} samples ({metrics['cache_hits']} cached)\n")
+
+@cli.command()
+@click.option("--model", required=True, help="Model to optimize the program for.")
+@click.option("--signature", "signature_name", help="Signature to optimize. Defaults to the program's signature.")
+@click.option("--program", "program_id", help="Program to start from. Defaults to the newest program of the signature.")
+@sample_options
+@click.option("--format", "output_format", type=FORMATS, default="json", show_default=True)
+@click.option("--output", type=click.File("w"), help="Write the result to a file instead of stdout.")
+@click.pass_obj
+def optimize(obj, model, signature_name, program_id, samples_spec, shard, limit, output_format, output):
+    """Optimize a program with MIPROv2 and save it as a new program"""
+    services = create_services()
+    app_state = services["app_state"]
+    out = output or obj["out"]
+
+    program_id = resolve_program(app_state, program_id, signature_name)
+    if not program_id:
+        raise click.ClickException("No program found to optimize.")
+    signature_name = signature_name or app_state.programs.get(program_id, {}).get("signature_name")
+    num_samples = services["sample_manager"].count_samples(signature_name) if signature_name else 0
+    sample_ids = parse_sample_ids(samples_spec, shard, limit, num_samples)
+
+    new_program_id = services["optimizer"].run_optimization(model, signature_name, program_id, sample_ids)
+    if not new_program_id:
+        raise click.ClickException("Optimization failed; see the log above.")
+
+    result = {"status": "success", "program_id": new_program_id, "base_program_id": program_id,
+              "signature_name": signature_name, "model": model}
+    if output_format == "table":
+        out.write(tabulate(result.items()) + "\n")
+    else:
+        out.write(json.dumps(result, indent=2 if output_format == "json" else None) + "\n")
+
+@cli.command()
+@click.option("--model", required=True, help="Model to generate samples with.")
+@click.option("--results", "results_file", type=click.File("r"), required=True,
+              help="Evaluation result written by 'evaluate --format json'.")
+@click.option("--below", type=float, default=1.0, show_default=True,
+              help="Only generate from samples that scored below this.")
+@click.option("--workers", type=int, default=1, show_default=True, help="Samples generated concurrently.")
+@sample_options
+@click.option("--save", is_flag=True, help="Add the generated samples to the signature's samples.")
+@click.option("--format", "output_format", type=FORMATS, default="json", show_default=True)
+@click.option("--output", type=click.File("w"), help="Write samples to a file instead of stdout.")
+@click.pass_obj
+def generate(obj, model, results_file, below, workers, samples_spec, shard, limit, save, output_format, output):
+    """Generate new samples from the weak results of an evaluation"""
+    services = create_services()
+    app_state = services["app_state"]
+    sample_manager = services["sample_manager"]
+    out = output or obj["out"]
+
+    evaluation = json.load(results_file)
+    program_id = evaluation.get("program_id")
+    metadata = (app_state.catalog.get(program_id) or {}) if program_id else {}
+    signature_name = metadata.get("signature_name") or app_state.current_signature_name
+    if not signature_name:
+        raise click.ClickException("Can't tell which signature the evaluation belongs to.")
+
+    results = evaluation.get("results", [])
+    sample_ids = parse_sample_ids(samples_spec, shard, limit, max((r["sample_id"] for r in results), default=-1) + 1)
+    selected = [
+        r for r in results
+        if r.get("overall_score", 0.0) < below and not r.get("error")
+        and (sample_ids is None or r["sample_id"] in sample_ids)
+    ]
+
+    def generate_one(result):
+        sample = sample_manager.generate_new_sample_from_evaluation(
+            result, model, metadata.get("instructions", ""), signature_name)
+        return {"source_sample_id": result["sample_id"], "sample": sample}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        generated = [record for record in executor.map(generate_one, selected) if record["sample"]]
+
+    if save and generated:
+        sample_manager.add_samples([record["sample"] for record in generated], signature_name)
+
+    if output_format == "jsonl":
+        write_records(out, generated)
+    elif output_format == "json":
+        json.dump({"signature_name": signature_name, "samples": generated}, out, indent=2, default=str)
+        out.write("\n")
+    else:
+        rows = [[r["source_sample_id"]] + [str(r["sample"].get(field, ""))[:60] for field in r["sample"]]
+                for r in generated]
+        headers = ["from sample"] + (list(generated[0]["sample"]) if generated else [])
+        out.write(tabulate(rows, headers=headers) + "\n")
+        out.write(f"\n{len(generated)} samples generated{' and saved' if save else ''}\n")
+
+def main():
+    """Entry point of the command line interface"""
+    cli()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Command line commands registered with the Flask CLI
+"""
+import click
+import dspy
+
+from .config import Config
+from .services.sample_store import SQLiteSampleStore
+from .utils.program_utils import update_program_metadata
+
+def register_commands(app, app_state, sample_manager):
+    """Register CLI commands with the app"""
+
+    @app.cli.command('backfill-program-metadata')
+    @click.option('--force', is_flag=True, help='Rewrite programs that already have instructions in their metadata.')
+    def backfill_program_metadata(force):
+        """Store instructions and prompt profiles in the metadata of saved programs"""
+        updated = skipped = failed = 0
+        for program_dir in sorted(Config.PROGRAM_DIR.iterdir()):
+            if not (program_dir / "program.pkl").exists():
+                continue
+            metadata = app_state.programs.get(program_dir.name, {})
+            if "instructions" in metadata and not force:
+                skipped += 1
+                continue
+            try:
+                program = dspy.load(str(program_dir))
+                update_program_metadata(program_dir, program)
+                app_state.register_program(program_dir.name)
+                updated += 1
+                click.echo(f"Updated {program_dir.name}")
+            except Exception as e:
+                failed += 1
+                click.echo(f"Failed to update {program_dir.name}: {e}", err=True)
+        click.echo(f"{updated} updated, {skipped} already up to date, {failed} failed")
+
+    @app.cli.command('migrate-samples')
+    @click.option('--force', is_flag=True, help='Re-import signatures that were imported before, replacing their samples.')
+    def migrate_samples(force):
+        """Import the JSON sample files into the SQLite sample store"""
+        store = sample_manager.store
+        if not isinstance(store, SQLiteSampleStore):
+            click.echo(f"The {Config.SAMPLE_STORE} sample store reads the JSON files directly; nothing to migrate")
+            return
+        suffix = "_samples.json"
+        for sample_file in sorted(Config.SAMPLES_DIR.glob(f"*{suffix}")):
+            signature_name = sample_file.name[:-len(suffix)]
+            try:
+                imported = store.migrate(signature_name, force=force)
+                click.echo(f"{signature_name}: {imported} samples imported, {store.count(signature_name)} stored")
+            except Exception as e:
+                click.echo(f"Failed to import {sample_file.name}: {e}", err=True)
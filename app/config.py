@@ -11,12 +11,55 @@ class Config:
     SAMPLES_DIR = BASE_DIR / 'samples'
     SIGNATURES_DIR = BASE_DIR / 'signatures'
     MODELS_DIR = BASE_DIR / 'models'
+    DATA_DIR = BASE_DIR / 'data'
+    EVALUATIONS_DIR = DATA_DIR / 'evaluations'
+    CACHE_DIR = DATA_DIR / 'cache'
     
     # Ensure directories exist
     PROGRAM_DIR.mkdir(exist_ok=True)
     SAMPLES_DIR.mkdir(exist_ok=True)
     SIGNATURES_DIR.mkdir(exist_ok=True)
     MODELS_DIR.mkdir(exist_ok=True)
+    EVALUATIONS_DIR.mkdir(parents=True, exist_ok=True)
+    
+    # Number of evaluation jobs that may run at the same time
+    MAX_EVALUATION_JOBS = int(os.environ.get('MAX_EVALUATION_JOBS', 2))
+    
+    # Maximum size of the cache of program outputs used by evaluations
+    PREDICTION_CACHE_MAX_BYTES = int(os.environ.get('PREDICTION_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    
+    # Maximum size of the cache of judge scores shared by evaluation and optimization
+    JUDGE_CACHE_MAX_BYTES = int(os.environ.get('JUDGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    
+    # Number of MeTTa interpreters kept warm for scoring PLN statements
+    METTA_POOL_SIZE = int(os.environ.get('METTA_POOL_SIZE', os.cpu_count() or 4))
+    
+    # Worker processes for cleaning PLN statements that need MeTTa (off by default: 0 or 1
+    # cleans in-process), and the number of such statements worth sending to them
+    PLN_CLEAN_PROCESSES = int(os.environ.get('PLN_CLEAN_PROCESSES', 0))
+    PLN_CLEAN_MIN_BATCH = int(os.environ.get('PLN_CLEAN_MIN_BATCH', 8))
+    
+    # Number of loaded programs kept in memory
+    PROGRAM_CACHE_SIZE = int(os.environ.get('PROGRAM_CACHE_SIZE', 16))
+    
+    # Threads for hedged fallback chains, on top of those the model definitions need
+    LM_CHAIN_WORKERS = int(os.environ.get('LM_CHAIN_WORKERS', 8))
+    
+    # Send LM calls to the providers (empty), record their responses ("record"), or
+    # serve recorded responses without a network ("replay"). The transcript defaults
+    # to data/lm_transcript.jsonl. Replay latency is "none", "recorded", "fixed:<s>",
+    # "uniform:<min>,<max>" or "lognormal:<mu>,<sigma>".
+    LM_TRANSPORT = os.environ.get('LM_TRANSPORT', '')
+    LM_TRANSCRIPT = os.environ.get('LM_TRANSCRIPT')
+    LM_REPLAY_LATENCY = os.environ.get('LM_REPLAY_LATENCY', 'none')
+    LM_REPLAY_SEED = int(os.environ['LM_REPLAY_SEED']) if os.environ.get('LM_REPLAY_SEED') else None
+    
+    # Where samples are kept: "json" (a samples/<signature>_samples.json file per signature,
+    # rewritten on every change), "sqlite" (data/samples.sqlite3, one row per sample; import the
+    # JSON files with `flask migrate-samples`) or "jsonl" (a samples/<signature>_samples.jsonl
+    # file with an offset index, read through mmap). Signatures that have a JSONL file are
+    # always read from it.
+    SAMPLE_STORE = os.environ.get('SAMPLE_STORE', 'json')
     
     # Default model
     DEFAULT_MODEL = 'anthropic/claude-3-7-sonnet-20250219'
@@ -1,11 +1,18 @@
 """
 Module for model definition
 """
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 class ModelDefinition:
     """Class for managing model definitions and their configurations"""
     
+    # Limits of the model's provider: requests per minute, tokens per minute and
+    # concurrent requests. They are shared by every model of the provider.
+    RATE_LIMIT_PARAMETERS = ("rpm", "tpm", "max_in_flight")
+    
+    # Parameters used by the application itself rather than passed to dspy.LM
+    RUNTIME_PARAMETERS = ("max_workers", "fallbacks", "hedge_delay") + RATE_LIMIT_PARAMETERS
+    
     def __init__(self, 
                 name: str, 
                 provider: str,
@@ -18,7 +25,12 @@ class ModelDefinition:
             name: Name of the model
             provider: Provider of the model (e.g., 'anthropic', 'openai')
             description: Description of the model
-            parameters: Dictionary of model parameters (e.g., temperature, max_tokens)
+            parameters: Dictionary of model parameters (e.g., temperature, max_tokens).
+                        May also hold runtime settings such as max_workers, the number
+                        of samples evaluated concurrently with this model, the
+                        provider's rate limits rpm, tpm and max_in_flight, and
+                        fallbacks, the full names of models to try in order when this
+                        one fails or hasn't answered within hedge_delay seconds.
         """
         self.name = name
         self.provider = provider
@@ -47,4 +59,50 @@ class ModelDefinition:
     @property
     def full_name(self) -> str:
         """Get full model name as provider/name"""
-        return f"{self.provider}/{self.name}"
\ No newline at end of file
+        return f"{self.provider}/{self.name}"
+    
+    @property
+    def lm_parameters(self) -> Dict[str, any]:
+        """Get the parameters that should be passed to dspy.LM"""
+        return {
+            key: value for key, value in self.parameters.items()
+            if key not in self.RUNTIME_PARAMETERS
+        }
+    
+    @property
+    def max_workers(self) -> int:
+        """Get the number of concurrent workers to use with this model"""
+        try:
+            return max(1, int(self.parameters.get("max_workers", 1)))
+        except (TypeError, ValueError):
+            return 1
+    
+    @property
+    def rate_limits(self) -> Dict[str, int]:
+        """Get the provider rate limits configured for this model"""
+        limits = {}
+        for key in self.RATE_LIMIT_PARAMETERS:
+            try:
+                value = int(self.parameters.get(key) or 0)
+            except (TypeError, ValueError):
+                continue
+            if value > 0:
+                limits[key] = value
+        return limits
+    
+    @property
+    def fallbacks(self) -> List[str]:
+        """Get the full names of the models to fall back to, in order"""
+        value = self.parameters.get("fallbacks") or []
+        if isinstance(value, str):
+            value = [value]
+        return [str(name) for name in value if name and name != self.full_name]
+    
+    @property
+    def hedge_delay(self) -> Optional[float]:
+        """Get the seconds to wait for an answer before also asking the next fallback"""
+        try:
+            delay = float(self.parameters["hedge_delay"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        return delay if delay >= 0 else None
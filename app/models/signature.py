@@ -1,6 +1,8 @@
 """
 Module for signature definition model
 """
+import hashlib
+import json
 from typing import Dict, List, Optional
 
 class SignatureDefinition:
@@ -43,6 +45,12 @@ class SignatureDefinition:
             "field_processors": self.field_processors
         }
     
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the definition, which changes whenever the signature is edited"""
+        payload = json.dumps(self.to_dict(), sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
     @classmethod
     def from_dict(cls, data: Dict) -> 'SignatureDefinition':
         """Create signature definition from dictionary"""
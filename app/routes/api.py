@@ -1,17 +1,33 @@
 """
 API routes for the application
 """
+import json
+
 import dspy
-from flask import Blueprint, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, Response, request, jsonify, redirect, url_for, flash, stream_with_context
+
+from ..services.program_cache import program_cache
+from .samples import parse_sample_query
+from ..utils.program_utils import get_program_instructions
 
-def create_api_routes(app_state, sample_manager, optimizer, evaluator):
+def create_api_routes(app_state, sample_manager, optimizer, evaluator, job_manager):
     bp = Blueprint('api', __name__)
     
     @bp.route('/programs')
     def get_programs():
-        """Get the list of available programs"""
+        """Get the list of available programs, newest first
+        
+        Filter with signature and base_program_id, and page with offset and limit.
+        """
+        signature_name = request.args.get('signature')
+        base_program_id = request.args.get('base_program_id')
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', type=int)
+        
         programs = []
-        for program_id, metadata in app_state.programs.items():
+        for metadata in app_state.catalog.list(signature_name=signature_name, base_program_id=base_program_id,
+                                               offset=offset, limit=limit):
+            program_id = metadata["id"]
             program_data = {
                 "id": program_id,
                 "model": metadata.get("model", "unknown"),
@@ -21,22 +37,25 @@ def create_api_routes(app_state, sample_manager, optimizer, evaluator):
                 "signature_name": metadata.get("signature_name", "")
             }
             
-            # Try to load the program to get the instructions
-            if program_id == app_state.current_program_id and app_state.current_program_id:
+            # Instructions are stored in the metadata at save time
+            if "instructions" in metadata:
+                program_data["instructions"] = metadata["instructions"]
+                program_data["prompt_profile"] = metadata.get("prompt_profile", {})
+            elif program_id == app_state.current_program_id:
+                # Programs saved before that need to be loaded to get the instructions
                 try:
-                    program_path = f"./programs/{program_id}/"
-                    program = dspy.load(program_path)
-                    if hasattr(program, 'predict') and hasattr(program.predict, 'signature'):
-                        program_data["instructions"] = program.predict.signature.instructions
+                    program_data["instructions"] = get_program_instructions(program_cache.get(program_id))
                 except Exception as e:
                     print(f"Failed to load program instructions: {e}")
             
             programs.append(program_data)
         
-        # Sort by creation time (newest first)
-        programs.sort(key=lambda x: x["created_at"], reverse=True)
-        
-        return jsonify({"programs": programs})
+        return jsonify({
+            "programs": programs,
+            "total": app_state.catalog.count(signature_name=signature_name, base_program_id=base_program_id),
+            "offset": offset,
+            "limit": limit
+        })
     
     @bp.route('/signatures')
     def get_signatures():
@@ -54,6 +73,54 @@ def create_api_routes(app_state, sample_manager, optimizer, evaluator):
         
         return jsonify({"signatures": signatures})
     
+    @bp.route('/samples/<signature_name>')
+    def list_samples(signature_name):
+        """Get a page of the samples of a signature
+        
+        Filter with filter_<field>, sort with sort and order (asc or desc), and page
+        with limit and the next_cursor returned with the previous page.
+        """
+        signature = app_state.get_signature(signature_name)
+        if not signature:
+            return jsonify({"status": "error", "message": f"Signature '{signature_name}' not found."}), 404
+        try:
+            query = parse_sample_query(request.args, signature)
+            samples, next_cursor = sample_manager.query_samples(signature_name, **query)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        
+        return jsonify({
+            "signature_name": signature_name,
+            "samples": [{"id": sample_id, "sample": sample} for sample_id, sample in samples],
+            "next_cursor": next_cursor,
+            "total": sample_manager.count_samples(signature_name),
+            "limit": query["limit"]
+        })
+    
+    @bp.route('/samples/<signature_name>/import', methods=['POST'])
+    def import_samples(signature_name):
+        """Import a JSON array or JSONL file of samples, streaming progress records
+        
+        The file is sent as samples_file; merge_strategy=replace replaces the
+        existing samples. Records are sent as newline-delimited JSON: "start",
+        "progress" after each batch written, then "done" or "error".
+        """
+        if not app_state.get_signature(signature_name):
+            return jsonify({"status": "error", "message": f"Signature '{signature_name}' not found."}), 404
+        file = request.files.get('samples_file')
+        if not file or file.filename == '':
+            return jsonify({"status": "error", "message": "No file selected."}), 400
+        replace = request.form.get('merge_strategy', 'append') == 'replace'
+        
+        def generate():
+            for record in sample_manager.stream_import(file.stream, signature_name, replace=replace):
+                yield json.dumps(record) + "\n"
+        
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        response.headers.set('Cache-Control', 'no-cache')
+        response.headers.set('X-Accel-Buffering', 'no')
+        return response
+    
     @bp.route('/generate_sample', methods=['POST'])
     def generate_sample():
         """Generate a sample using the LLM."""
@@ -123,7 +190,7 @@ def create_api_routes(app_state, sample_manager, optimizer, evaluator):
         
         try:
             # Load the selected program for generation
-            program = dspy.load(str(Config.PROGRAM_DIR / app_state.current_program_id))
+            program = program_cache.get(app_state.current_program_id)
             
             # Generate the sample using the loaded program and specific LM instance
             with dspy.context(lm=sample_lm):
@@ -159,7 +226,7 @@ def create_api_routes(app_state, sample_manager, optimizer, evaluator):
     
     @bp.route('/evaluate', methods=['POST'])
     def evaluate():
-        """Evaluate the current program against samples"""
+        """Submit an evaluation of the current program as a background job"""
         model_name = request.form.get('model', app_state.current_model)
         similarity_model = request.form.get('similarity_model')
         
@@ -167,14 +234,121 @@ def create_api_routes(app_state, sample_manager, optimizer, evaluator):
         if similarity_model == '':
             similarity_model = None
             
-        # Run evaluation
-        results = evaluator.run_evaluation(model_name, similarity_model)
+        # Optional override of the model's max_workers parameter
+        num_workers = request.form.get('num_workers', type=int)
         
-        # Store results in app state
-        if results.get('status') == 'success':
-            app_state.evaluation_results = results
+        # no_cache=1 runs the program on every sample instead of reusing cached outputs
+        use_cache = request.form.get('no_cache', '').lower() not in ('1', 'true', 'on')
+            
+        if not app_state.current_program_id:
+            return jsonify({
+                "status": "error",
+                "message": "No program selected. Please select a program first."
+            })
             
-        return jsonify(results)
+        # Queue the evaluation and return immediately
+        job = job_manager.submit(model_name, similarity_model, num_workers=num_workers, use_cache=use_cache)
+        
+        return jsonify({
+            "status": "submitted",
+            "job_id": job.id,
+            "status_url": url_for('api.evaluation_job', job_id=job.id)
+        }), 202
+    
+    @bp.route('/evaluate/stream', methods=['GET', 'POST'])
+    def evaluate_stream():
+        """Evaluate the current program, streaming one record per finished sample
+        
+        Records are sent as newline-delimited JSON, or as Server-Sent Events when
+        format=sse is given or the client accepts text/event-stream. Closing the
+        connection stops the evaluation.
+        """
+        values = request.values
+        model_name = values.get('model', app_state.current_model)
+        similarity_model = values.get('similarity_model') or None
+        num_workers = values.get('num_workers', type=int)
+        use_cache = values.get('no_cache', '').lower() not in ('1', 'true', 'on')
+        
+        use_sse = (values.get('format') == 'sse' or
+                   request.accept_mimetypes.best == 'text/event-stream')
+        
+        records = evaluator.stream_evaluation(model_name, similarity_model,
+                                              num_workers=num_workers, use_cache=use_cache)
+        
+        def generate():
+            try:
+                for record in records:
+                    data = json.dumps(record)
+                    if use_sse:
+                        yield f"event: {record['type']}\ndata: {data}\n\n"
+                    else:
+                        yield data + "\n"
+            finally:
+                # Runs when the client disconnects, cancelling pending samples
+                records.close()
+        
+        mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+        response = Response(stream_with_context(generate()), mimetype=mimetype)
+        response.headers.set('Cache-Control', 'no-cache')
+        response.headers.set('X-Accel-Buffering', 'no')
+        return response
+    
+    @bp.route('/cache_stats')
+    def cache_stats():
+        """Get hit/miss counters and sizes of the caches, the LM pool and coalesced LM requests"""
+        from ..utils.metrics import get_judge_cache
+        from ..utils.lm_pool import lm_pool
+        from ..utils.lm_client import lm_requests
+        return jsonify({
+            "predictions": evaluator.prediction_cache.stats(),
+            "judge": get_judge_cache().stats(),
+            "lm_clients": lm_pool.stats(),
+            "lm_requests": lm_requests.stats(),
+            "samples": sample_manager.cache_stats()
+        })
+    
+    @bp.route('/evaluations')
+    def evaluation_jobs():
+        """List evaluation jobs"""
+        return jsonify({"jobs": job_manager.list_jobs()})
+    
+    @bp.route('/evaluations/<job_id>')
+    def evaluation_job(job_id):
+        """Get the status of an evaluation job, and its result once finished"""
+        job = job_manager.get_job(job_id)
+        if not job:
+            return jsonify({"status": "error", "message": f"Evaluation job '{job_id}' not found."}), 404
+        return jsonify(job.to_dict(include_result=job.done))
+    
+    @bp.route('/evaluations/<job_id>/cancel', methods=['POST'])
+    def cancel_evaluation_job(job_id):
+        """Cancel a queued or running evaluation job"""
+        cancelled = job_manager.cancel(job_id)
+        if cancelled is None:
+            return jsonify({"status": "error", "message": f"Evaluation job '{job_id}' not found."}), 404
+        if not cancelled:
+            return jsonify({"status": "error", "message": f"Evaluation job '{job_id}' has already finished."}), 409
+        return jsonify({"status": "success", "job_id": job_id})
+    
+    @bp.route('/evaluations/<job_id>/results')
+    def evaluation_job_results(job_id):
+        """Get the per-sample results an evaluation job has produced so far
+        
+        Pass offset to only fetch results finished since the last poll.
+        """
+        job = job_manager.get_job(job_id)
+        if not job:
+            return jsonify({"status": "error", "message": f"Evaluation job '{job_id}' not found."}), 404
+        offset = request.args.get('offset', 0, type=int)
+        results = job.get_partial_results(offset)
+        return jsonify({
+            "job_id": job.id,
+            "status": job.status,
+            "offset": offset,
+            "next_offset": offset + len(results),
+            "total": job.total,
+            "results": results
+        })
     
     @bp.route('/generate_sample_from_evaluation', methods=['GET', 'POST'])
     def generate_sample_from_evaluation():
@@ -182,9 +356,13 @@ def create_api_routes(app_state, sample_manager, optimizer, evaluator):
         # Get the sample ID and model name
         sample_id = request.args.get('sample_id') or request.form.get('sample_id')
         model_name = request.args.get('model') or request.form.get('model', app_state.current_model)
+        job_id = request.args.get('job_id') or request.form.get('job_id')
+        
+        # Use the results of the given job, or the latest evaluation
+        evaluation_results = job_manager.get_result(job_id) if job_id else app_state.evaluation_results
         
         # Verify we have evaluation results
-        if not app_state.evaluation_results or not app_state.evaluation_results.get('results'):
+        if not evaluation_results or not evaluation_results.get('results'):
             flash("No evaluation results available. Please run an evaluation first.")
             return redirect(url_for('main.index'))
         
@@ -192,26 +370,26 @@ def create_api_routes(app_state, sample_manager, optimizer, evaluator):
         sample_id = int(sample_id) if sample_id else None
         eval_result = None
         
-        for result in app_state.evaluation_results.get('results', []):
+        for result in evaluation_results.get('results', []):
             if result.get('sample_id') == sample_id:
                 eval_result = result
                 break
                 
         if not eval_result:
             flash(f"Sample #{sample_id} not found in evaluation results.")
-            return redirect(url_for('main.evaluation_results'))
+            return redirect(url_for('main.evaluation_results', job_id=job_id))
             
         # Get the program instructions
         program_instructions = ""
         if app_state.current_program_id:
-            try:
-                from ..config import Config
-                program_path = Config.PROGRAM_DIR / app_state.current_program_id
-                program = dspy.load(str(program_path))
-                if hasattr(program, 'predict') and hasattr(program.predict, 'signature'):
-                    program_instructions = program.predict.signature.instructions
-            except Exception as e:
-                print(f"Failed to load program instructions: {e}")
+            metadata = app_state.programs.get(app_state.current_program_id, {})
+            if "instructions" in metadata:
+                program_instructions = metadata["instructions"]
+            else:
+                try:
+                    program_instructions = get_program_instructions(program_cache.get(app_state.current_program_id))
+                except Exception as e:
+                    print(f"Failed to load program instructions: {e}")
         
         # Generate a new sample
         new_sample = sample_manager.generate_new_sample_from_evaluation(
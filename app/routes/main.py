@@ -3,15 +3,17 @@ Main routes for the application
 """
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
 
-def create_main_routes(app_state, sample_manager, optimizer, evaluator):
+def create_main_routes(app_state, sample_manager, optimizer, evaluator, job_manager):
     bp = Blueprint('main', __name__)
     
     @bp.route('/')
     def index():
         """Home page route"""
-        samples = sample_manager.load_samples()
+        # Only the first few samples are shown
+        samples = list(sample_manager.iter_samples(limit=3))
         return render_template('index.html', 
                             samples=samples, 
+                            sample_count=sample_manager.count_samples(),
                             optimization_running=optimizer.running,
                             evaluation_results=app_state.evaluation_results,
                             models=app_state.AVAILABLE_MODELS,
@@ -47,13 +49,18 @@ def create_main_routes(app_state, sample_manager, optimizer, evaluator):
         """Check optimization status"""
         return jsonify({"running": optimizer.running})
         
-    @bp.route('/evaluation_results')
-    def evaluation_results():
-        """View detailed evaluation results"""
-        if not app_state.evaluation_results:
+    @bp.route('/evaluation_results', defaults={'job_id': None})
+    @bp.route('/evaluation_results/<job_id>')
+    def evaluation_results(job_id):
+        """View detailed evaluation results of a job, or of the latest evaluation"""
+        results = job_manager.get_result(job_id) if job_id else app_state.evaluation_results
+        if not results:
             flash("No evaluation results available. Please run an evaluation first.")
             return redirect(url_for('main.index'))
             
-        return render_template('evaluation_results.html', app_state=app_state)
+        return render_template('evaluation_results.html',
+                             app_state=app_state,
+                             evaluation_results=results,
+                             job_id=results.get('job_id'))
 
     return bp
\ No newline at end of file
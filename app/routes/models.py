@@ -33,6 +33,7 @@ def create_model_routes(app_state):
             parameters = {}
             temperature = request.form.get('temperature', '')
             max_tokens = request.form.get('max_tokens', '')
+            max_workers = request.form.get('max_workers', '')
             
             if temperature:
                 try:
@@ -47,6 +48,13 @@ def create_model_routes(app_state):
                 except ValueError:
                     flash("Max tokens must be an integer")
                     return render_template('add_model.html')
+                    
+            if max_workers:
+                try:
+                    parameters['max_workers'] = int(max_workers)
+                except ValueError:
+                    flash("Max workers must be an integer")
+                    return render_template('add_model.html')
             
             # Create model
             new_model = ModelDefinition(
@@ -88,6 +96,7 @@ def create_model_routes(app_state):
             parameters = {}
             temperature = request.form.get('temperature', '')
             max_tokens = request.form.get('max_tokens', '')
+            max_workers = request.form.get('max_workers', '')
             
             if temperature:
                 try:
@@ -102,13 +111,22 @@ def create_model_routes(app_state):
                 except ValueError:
                     flash("Max tokens must be an integer")
                     return render_template('edit_model.html', model=model)
+                    
+            if max_workers:
+                try:
+                    parameters['max_workers'] = int(max_workers)
+                except ValueError:
+                    flash("Max workers must be an integer")
+                    return render_template('edit_model.html', model=model)
             
             # Update model
             model.description = description
             model.parameters = parameters
             
             # Save model
-            app_state.update_model(model)
+            if not app_state.update_model(model):
+                flash(f"Could not update model: {model.full_name}")
+                return render_template('edit_model.html', model=model)
             flash(f"Updated model: {model.full_name}")
             return redirect(url_for('models.view_models'))
             
@@ -4,15 +4,18 @@ Routes for managing programs
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
 import os
 import json
-import dspy
 from threading import Thread
 
+from ..services.program_cache import program_cache
+from ..utils.program_utils import get_program_instructions, resave_program
+
 def create_program_routes(app_state, optimizer):
     bp = Blueprint('programs', __name__)
     
     @bp.route('/')
     def view_programs():
         """View all programs"""
+        app_state.refresh_programs()
         return render_template('programs.html', 
                              programs=app_state.programs,
                              current_program_id=app_state.current_program_id)
@@ -79,16 +82,16 @@ def create_program_routes(app_state, optimizer):
         
         if request.method == 'POST':
             new_instructions = request.form.get('instructions', '')
-            program_path = f"./programs/{program_id}/"
             
             try:
-                # Load the program
-                program = dspy.load(program_path)
+                # Copy the cached program so the shared one isn't changed before it is saved
+                program = program_cache.get(program_id).deepcopy()
                 if hasattr(program, 'predict') and hasattr(program.predict, 'signature'):
-                    # Update the instructions
-                    program.predict.signature.instructions = new_instructions
+                    # Update the instructions on a new signature class, which copies don't share
+                    program.predict.signature = program.predict.signature.with_instructions(new_instructions)
                     # Save the program
-                    program.save(program_path, save_program=True)
+                    resave_program(program, program_id)
+                    app_state.register_program(program_id)
                     flash("Program instructions updated successfully")
                     return redirect(url_for('main.index'))
                 else:
@@ -101,14 +104,11 @@ def create_program_routes(app_state, optimizer):
         
         # GET request - show the form
         try:
-            from pathlib import Path
-            from ..config import Config
-            
-            program_path = Config.PROGRAM_DIR / program_id
-            program = dspy.load(str(program_path))
-            instructions = ""
-            if hasattr(program, 'predict') and hasattr(program.predict, 'signature'):
-                instructions = program.predict.signature.instructions
+            metadata = app_state.programs.get(program_id, {})
+            if "instructions" in metadata:
+                instructions = metadata["instructions"]
+            else:
+                instructions = get_program_instructions(program_cache.get(program_id))
             
             return render_template('edit_program_instructions.html', 
                                   program_id=program_id, 
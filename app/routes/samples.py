@@ -1,11 +1,72 @@
 """
 Routes for managing samples
 """
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from typing import Dict
+
+from flask import Blueprint, Response, render_template, request, jsonify, redirect, url_for, flash
+
+# Samples per page of the sample listings, by default and at most
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def parse_sample_query(args, signature) -> Dict:
+    """Read the filters, sort order and page of a sample listing from request arguments
+    
+    Args:
+        args: Request arguments: filter_<field>, sort, order (asc or desc), cursor and limit
+        signature: Signature whose fields can be filtered and sorted by
+    
+    Returns:
+        Dict: Keyword arguments for SampleManager.query_samples
+    
+    Raises:
+        ValueError: If the sort field isn't a field of the signature
+    """
+    fields = signature.input_fields + signature.output_fields
+    filters = {}
+    for field in fields:
+        text = args.get(f"filter_{field}", "").strip()
+        if text:
+            filters[field] = text
+    sort = args.get("sort") or None
+    if sort is not None and sort not in fields:
+        raise ValueError(f"Can't sort by unknown field '{sort}'")
+    return {
+        "filters": filters,
+        "sort": sort,
+        "descending": args.get("order") == "desc",
+        "cursor": args.get("cursor") or None,
+        "limit": min(max(args.get("limit", PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    }
 
 def create_sample_routes(app_state, sample_manager):
     bp = Blueprint('samples', __name__)
     
+    def render_samples(signature_name, signature):
+        """Render a page of the samples of a signature, as selected by the request arguments"""
+        try:
+            query = parse_sample_query(request.args, signature)
+            samples, next_cursor = sample_manager.query_samples(signature_name, **query)
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for('samples.view_signature_samples', signature_name=signature_name))
+        
+        def page_url(cursor):
+            args = request.args.to_dict()
+            args.pop("cursor", None)
+            if cursor:
+                args["cursor"] = cursor
+            return url_for(request.endpoint, **(request.view_args or {}), **args)
+        
+        return render_template('samples.html', 
+                             samples=samples, 
+                             total=sample_manager.count_samples(signature_name),
+                             query=query,
+                             next_url=page_url(next_cursor) if next_cursor else None,
+                             first_url=page_url(None) if query["cursor"] else None,
+                             signature=signature,
+                             signature_name=signature_name)
+    
     @bp.route('/')
     def view_samples():
         """View samples for the current signature"""
@@ -15,11 +76,7 @@ def create_sample_routes(app_state, sample_manager):
             return redirect(url_for('signatures.view_signatures'))
             
         signature = app_state.get_signature(signature_name)
-        samples = sample_manager.load_samples(signature_name)
-        return render_template('samples.html', 
-                             samples=samples, 
-                             signature=signature,
-                             signature_name=signature_name)
+        return render_samples(signature_name, signature)
                              
     @bp.route('/<signature_name>')
     def view_signature_samples(signature_name):
@@ -29,29 +86,25 @@ def create_sample_routes(app_state, sample_manager):
             flash(f"Signature '{signature_name}' not found")
             return redirect(url_for('signatures.view_signatures'))
             
-        samples = sample_manager.load_samples(signature_name)
-        return render_template('samples.html', 
-                             samples=samples, 
-                             signature=signature,
-                             signature_name=signature_name)
+        return render_samples(signature_name, signature)
                              
     @bp.route('/export/<signature_name>')
     def export_samples(signature_name):
-        """Export samples for a specific signature as JSON"""
+        """Export samples for a specific signature as a JSON array, or as JSONL with format=jsonl"""
         signature = app_state.get_signature(signature_name)
         if not signature:
             flash(f"Signature '{signature_name}' not found")
             return redirect(url_for('signatures.view_signatures'))
             
-        samples = sample_manager.load_samples(signature_name)
-        if not samples:
+        if not sample_manager.count_samples(signature_name):
             flash(f"No samples found for signature '{signature_name}'")
             return redirect(url_for('samples.view_signature_samples', signature_name=signature_name))
-            
-        # Create a response with the JSON data
-        response = jsonify(samples)
-        response.headers.set('Content-Disposition', f'attachment; filename={signature_name}_samples.json')
-        response.headers.set('Content-Type', 'application/json')
+        
+        # Stream the file, so it is never held in memory whole
+        export_format = 'jsonl' if request.args.get('format') == 'jsonl' else 'json'
+        mimetype = 'application/x-ndjson' if export_format == 'jsonl' else 'application/json'
+        response = Response(sample_manager.stream_export(signature_name, export_format), mimetype=mimetype)
+        response.headers.set('Content-Disposition', f'attachment; filename={signature_name}_samples.{export_format}')
         return response
         
     @bp.route('/import/<signature_name>', methods=['GET', 'POST'])
@@ -76,49 +129,22 @@ def create_sample_routes(app_state, sample_manager):
                 return redirect(request.url)
                 
             if file:
-                try:
-                    # Read the JSON file
-                    import json
-                    import_data = json.loads(file.read().decode('utf-8'))
-                    
-                    # Validate that it's a list
-                    if not isinstance(import_data, list):
-                        flash("Invalid file format. Expected a JSON array of samples.")
-                        return redirect(request.url)
-                    
-                    # Validate each sample against the signature
-                    valid_samples = []
-                    for sample in import_data:
-                        if sample_manager.validate_sample(sample, signature_name):
-                            valid_samples.append(sample)
-                    
-                    # Check if any valid samples were found
-                    if not valid_samples:
-                        flash("No valid samples found in the import file.")
-                        return redirect(request.url)
-                    
-                    # Get current samples
-                    current_samples = sample_manager.load_samples(signature_name)
-                    
-                    # Add the imported samples
-                    merge_strategy = request.form.get('merge_strategy', 'append')
-                    if merge_strategy == 'replace':
-                        # Replace all existing samples
-                        sample_manager.save_samples(valid_samples, signature_name)
-                        flash(f"Imported {len(valid_samples)} samples, replacing existing samples.")
-                    else:
-                        # Append to existing samples
-                        current_samples.extend(valid_samples)
-                        sample_manager.save_samples(current_samples, signature_name)
-                        flash(f"Imported {len(valid_samples)} samples, appended to existing {len(current_samples) - len(valid_samples)} samples.")
-                    
-                    return redirect(url_for('samples.view_signature_samples', signature_name=signature_name))
-                except json.JSONDecodeError:
-                    flash("Invalid JSON file.")
-                    return redirect(request.url)
-                except Exception as e:
-                    flash(f"Error importing samples: {e}")
+                # Parse, validate and write the samples a batch at a time
+                replace = request.form.get('merge_strategy', 'append') == 'replace'
+                last = {}
+                for last in sample_manager.stream_import(file.stream, signature_name, replace=replace):
+                    pass
+                
+                if last.get("type") != "done":
+                    flash(f"Error importing samples: {last.get('message', 'the import stopped')}")
                     return redirect(request.url)
+                
+                skipped = f" Skipped {last['invalid']} invalid samples." if last["invalid"] else ""
+                if replace:
+                    flash(f"Imported {last['imported']} samples, replacing existing samples.{skipped}")
+                else:
+                    flash(f"Imported {last['imported']} samples, appended to existing {last['existing']} samples.{skipped}")
+                return redirect(url_for('samples.view_signature_samples', signature_name=signature_name))
             
         # GET request - show import form
         return render_template('import_samples.html', 
@@ -133,10 +159,10 @@ def create_sample_routes(app_state, sample_manager):
             flash("No signature selected. Please select a signature first.")
             return redirect(url_for('signatures.view_signatures'))
             
-        samples = sample_manager.load_samples(signature_name)
-        if 0 <= sample_id < len(samples):
+        sample = sample_manager.get_sample(sample_id, signature_name)
+        if sample is not None:
             return render_template('sample.html', 
-                                 sample=samples[sample_id], 
+                                 sample=sample, 
                                  sample_id=sample_id,
                                  signature=app_state.get_signature(signature_name),
                                  signature_name=signature_name)
@@ -150,10 +176,10 @@ def create_sample_routes(app_state, sample_manager):
             flash(f"Signature '{signature_name}' not found")
             return redirect(url_for('signatures.view_signatures'))
             
-        samples = sample_manager.load_samples(signature_name)
-        if 0 <= sample_id < len(samples):
+        sample = sample_manager.get_sample(sample_id, signature_name)
+        if sample is not None:
             return render_template('sample.html', 
-                                 sample=samples[sample_id], 
+                                 sample=sample, 
                                  sample_id=sample_id,
                                  signature=signature,
                                  signature_name=signature_name)
@@ -168,27 +194,29 @@ def create_sample_routes(app_state, sample_manager):
             return redirect(url_for('signatures.view_signatures'))
             
         signature = app_state.get_signature(signature_name)
-        samples = sample_manager.load_samples(signature_name)
+        sample = sample_manager.get_sample(sample_id, signature_name)
         
         if request.method == 'POST':
-            if 0 <= sample_id < len(samples):
+            if sample is not None:
+                # Loaded samples are read-only; edit a copy
+                sample = dict(sample)
                 # Update all fields from the form based on signature definition
                 for field in signature.input_fields + signature.output_fields:
                     value = request.form.get(field, '')
                     # Check if this field is marked as a list
                     if request.form.get(f"{field}_is_list", "").lower() == 'true':
                         # Split by newlines and filter out empty lines
-                        samples[sample_id][field] = [line.strip() for line in value.split('\n') if line.strip()]
+                        sample[field] = [line.strip() for line in value.split('\n') if line.strip()]
                     else:
-                        samples[sample_id][field] = value
+                        sample[field] = value
                     
-                sample_manager.save_samples(samples, signature_name)
+                sample_manager.update_sample(sample_id, sample, signature_name)
                 flash("Sample updated successfully")
                 return redirect(url_for('samples.view_sample', sample_id=sample_id))
         
-        if 0 <= sample_id < len(samples):
+        if sample is not None:
             return render_template('edit_sample.html', 
-                                 sample=samples[sample_id], 
+                                 sample=sample, 
                                  sample_id=sample_id,
                                  signature=signature,
                                  signature_name=signature_name)
@@ -202,29 +230,31 @@ def create_sample_routes(app_state, sample_manager):
             flash(f"Signature '{signature_name}' not found")
             return redirect(url_for('signatures.view_signatures'))
             
-        samples = sample_manager.load_samples(signature_name)
+        sample = sample_manager.get_sample(sample_id, signature_name)
         
         if request.method == 'POST':
-            if 0 <= sample_id < len(samples):
+            if sample is not None:
+                # Loaded samples are read-only; edit a copy
+                sample = dict(sample)
                 # Update all fields from the form based on signature definition
                 for field in signature.input_fields + signature.output_fields:
                     value = request.form.get(field, '')
                     # Check if this field is marked as a list
                     if request.form.get(f"{field}_is_list", "").lower() == 'true':
                         # Split by newlines and filter out empty lines
-                        samples[sample_id][field] = [line.strip() for line in value.split('\n') if line.strip()]
+                        sample[field] = [line.strip() for line in value.split('\n') if line.strip()]
                     else:
-                        samples[sample_id][field] = value
+                        sample[field] = value
                     
-                sample_manager.save_samples(samples, signature_name)
+                sample_manager.update_sample(sample_id, sample, signature_name)
                 flash("Sample updated successfully")
                 return redirect(url_for('samples.view_signature_sample', 
                                       signature_name=signature_name, 
                                       sample_id=sample_id))
         
-        if 0 <= sample_id < len(samples):
+        if sample is not None:
             return render_template('edit_sample.html', 
-                                 sample=samples[sample_id], 
+                                 sample=sample, 
                                  sample_id=sample_id,
                                  signature=signature,
                                  signature_name=signature_name)
@@ -256,9 +286,7 @@ def create_sample_routes(app_state, sample_manager):
             
             # Validate the sample
             if sample_manager.validate_sample(new_sample, signature_name):
-                samples = sample_manager.load_samples(signature_name)
-                samples.append(new_sample)
-                sample_manager.save_samples(samples, signature_name)
+                sample_manager.add_samples([new_sample], signature_name)
                 flash("New sample added successfully")
                 return redirect(url_for('samples.view_samples'))
             else:
@@ -308,9 +336,7 @@ def create_sample_routes(app_state, sample_manager):
             
             # Validate the sample
             if sample_manager.validate_sample(new_sample, signature_name):
-                samples = sample_manager.load_samples(signature_name)
-                samples.append(new_sample)
-                sample_manager.save_samples(samples, signature_name)
+                sample_manager.add_samples([new_sample], signature_name)
                 flash("New sample added successfully")
                 return redirect(url_for('samples.view_signature_samples', signature_name=signature_name))
             else:
@@ -335,11 +361,7 @@ def create_sample_routes(app_state, sample_manager):
             flash(f"Signature '{signature_name}' not found")
             return redirect(url_for('signatures.view_signatures'))
             
-        samples = sample_manager.load_samples(signature_name)
-        if 0 <= index < len(samples):
-            # Remove the sample
-            del samples[index]
-            sample_manager.save_samples(samples, signature_name)
+        if sample_manager.delete_sample(index, signature_name):
             flash(f"Sample #{index+1} deleted successfully")
             
         return redirect(url_for('samples.view_signature_samples', signature_name=signature_name))
@@ -113,7 +113,7 @@ def create_signature_routes(app_state, sample_manager):
             signature.field_processors = field_processors
             
             # Save signature
-            app_state._save_signature(signature)
+            app_state.update_signature(signature)
             flash(f"Updated signature: {signature_name}")
             return redirect(url_for('signatures.view_signatures'))
             
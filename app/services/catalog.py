@@ -0,0 +1,211 @@
+"""
+Persistent index of saved programs
+"""
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+class ProgramCatalog:
+    """SQLite index of program metadata, kept in step with the program directories
+
+    Programs are added and removed incrementally as they are saved and deleted.
+    sync() reconciles the index with the program directory, reading only the
+    metadata files that are new or have changed since they were indexed.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Initialize a program catalog
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = Path(path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS programs (
+                    id TEXT PRIMARY KEY,
+                    signature_name TEXT,
+                    created_at REAL NOT NULL,
+                    base_program_id TEXT,
+                    metadata_mtime INTEGER NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS programs_signature_name ON programs (signature_name, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS programs_created_at ON programs (created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS programs_base_program_id ON programs (base_program_id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS program_sequence (seq INTEGER PRIMARY KEY AUTOINCREMENT)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _read_metadata(program_dir: Path) -> Optional[Dict]:
+        """Read a program's metadata.json, or None if it has none"""
+        metadata_path = program_dir / "metadata.json"
+        try:
+            with open(metadata_path, "r") as f:
+                metadata = json.load(f)
+            # Add creation time from file if not in metadata
+            if "created_at" not in metadata:
+                metadata["created_at"] = os.path.getctime(metadata_path)
+        except FileNotFoundError:
+            return None
+        metadata["id"] = program_dir.name
+        return metadata
+
+    def _upsert(self, conn: sqlite3.Connection, program_id: str, metadata: Dict, metadata_mtime: int):
+        conn.execute(
+            "INSERT OR REPLACE INTO programs "
+            "(id, signature_name, created_at, base_program_id, metadata_mtime, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (program_id, metadata.get("signature_name"), metadata.get("created_at") or 0,
+             metadata.get("base_program_id"), metadata_mtime, json.dumps(metadata))
+        )
+
+    def add(self, program_dir: Path) -> Optional[Dict]:
+        """Index (or re-index) a single program directory
+
+        Args:
+            program_dir: Directory of the program
+
+        Returns:
+            Optional[Dict]: The program's metadata, or None if it has no metadata.json
+        """
+        program_dir = Path(program_dir)
+        try:
+            metadata_mtime = (program_dir / "metadata.json").stat().st_mtime_ns
+            metadata = self._read_metadata(program_dir)
+        except Exception as e:
+            print(f"Error loading program {program_dir.name}: {e}")
+            return None
+        if metadata is None:
+            return None
+        with self._lock:
+            conn = self._connect()
+            self._upsert(conn, program_dir.name, metadata, metadata_mtime)
+            conn.commit()
+        return metadata
+
+    def next_sequence(self) -> int:
+        """Allocate the next program sequence number
+
+        Numbers are handed out by SQLite, so they are unique and increasing
+        across every process that shares the catalog.
+
+        Returns:
+            int: The allocated sequence number
+        """
+        with self._lock:
+            conn = self._connect()
+            seq = conn.execute("INSERT INTO program_sequence DEFAULT VALUES").lastrowid
+            # Only the counter in sqlite_sequence needs to be kept
+            conn.execute("DELETE FROM program_sequence WHERE seq < ?", (seq,))
+            conn.commit()
+        return seq
+
+    def remove(self, program_id: str):
+        """Remove a program from the index"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM programs WHERE id = ?", (program_id,))
+            conn.commit()
+
+    def sync(self, programs_dir: Path):
+        """Bring the index in line with the program directories on disk
+
+        Args:
+            programs_dir: Directory containing one directory per program
+        """
+        on_disk = {}
+        if programs_dir.exists():
+            with os.scandir(programs_dir) as entries:
+                for entry in entries:
+                    # Dot directories are programs still being written
+                    if entry.name.startswith(".") or not entry.is_dir():
+                        continue
+                    try:
+                        on_disk[entry.name] = os.stat(os.path.join(entry.path, "metadata.json")).st_mtime_ns
+                    except FileNotFoundError:
+                        continue
+
+        with self._lock:
+            conn = self._connect()
+            indexed = dict(conn.execute("SELECT id, metadata_mtime FROM programs"))
+            removed = [(program_id,) for program_id in indexed if program_id not in on_disk]
+            conn.executemany("DELETE FROM programs WHERE id = ?", removed)
+            for program_id, metadata_mtime in on_disk.items():
+                if indexed.get(program_id) == metadata_mtime:
+                    continue
+                try:
+                    metadata = self._read_metadata(programs_dir / program_id)
+                except Exception as e:
+                    print(f"Error loading program {program_id}: {e}")
+                    continue
+                if metadata is not None:
+                    self._upsert(conn, program_id, metadata, metadata_mtime)
+            conn.commit()
+
+    def get(self, program_id: str) -> Optional[Dict]:
+        """Get the metadata of a program"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT metadata FROM programs WHERE id = ?", (program_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, signature_name: Optional[str] = None, base_program_id: Optional[str] = None,
+             offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """List program metadata, newest first
+
+        Args:
+            signature_name (str, optional): Only list programs for this signature
+            base_program_id (str, optional): Only list programs derived from this program
+            offset (int): Number of programs to skip
+            limit (int, optional): Maximum number of programs to return
+
+        Returns:
+            List[Dict]: Metadata of the matching programs
+        """
+        query, params = self._where(signature_name, base_program_id)
+        query = f"SELECT metadata FROM programs{query} ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params += [limit if limit is not None else -1, offset]
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, signature_name: Optional[str] = None, base_program_id: Optional[str] = None) -> int:
+        """Count the programs matching the same filters as list()"""
+        query, params = self._where(signature_name, base_program_id)
+        with self._lock:
+            return self._connect().execute(f"SELECT COUNT(*) FROM programs{query}", params).fetchone()[0]
+
+    @staticmethod
+    def _where(signature_name: Optional[str], base_program_id: Optional[str]):
+        clauses, params = [], []
+        if signature_name is not None:
+            clauses.append("signature_name = ?")
+            params.append(signature_name)
+        if base_program_id is not None:
+            clauses.append("base_program_id = ?")
+            params.append(base_program_id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
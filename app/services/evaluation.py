@@ -2,160 +2,391 @@
 Evaluation service for DSPy programs
 """
 import dspy
-from typing import Dict, List, Any, Optional
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Any, Optional
 import time
 
 from ..config import Config
 from .state import AppState
 from .samples import SampleManager
 from ..utils.metrics import judge_metric
+from ..utils.cache import DiskCache, make_cache_key
+from ..utils.program_utils import program_fingerprint
+from ..utils.lm_client import track_served_models
+from .program_cache import program_cache
+
+logger = logging.getLogger(__name__)
+
+# Key under which cached program outputs keep the models that produced them
+SERVED_MODELS_KEY = "_served_models"
 
 class Evaluator:
-    """Class for evaluating DSPy programs"""
+    """Class for evaluating DSPy programs
+    
+    Several evaluations can run at once, so their state lives in the context
+    of each run rather than on the evaluator: a run is cancelled by setting
+    the cancel_event it was started with.
+    """
     
     def __init__(self, app_state: AppState, sample_manager: SampleManager):
         self.app_state = app_state
         self.sample_manager = sample_manager
-        self.running = False
+        # Program outputs keyed on program, sample inputs and model
+        self.prediction_cache = DiskCache(
+            Config.CACHE_DIR / "predictions.sqlite3",
+            Config.PREDICTION_CACHE_MAX_BYTES
+        )
+    
+    def _get_num_workers(self, model_name: str) -> int:
+        """Get the configured number of concurrent workers for a model
+        
+        Args:
+            model_name (str): Name of the model used for evaluation
+            
+        Returns:
+            int: Number of samples to evaluate concurrently
+        """
+        model_def = self.app_state.get_model(model_name)
+        return model_def.max_workers if model_def else 1
+    
+    def _lm_chain(self, eval_lm: Any, model_name: str) -> List[List]:
+        """Get the model and settings of an LM and of each of its fallbacks, in order"""
+        from ..utils import get_lm
+        chain = [[getattr(eval_lm, "model", model_name), getattr(eval_lm, "kwargs", {})]]
+        for name in getattr(eval_lm, "fallbacks", ()):
+            fallback = get_lm(name)
+            chain.append([getattr(fallback, "model", name), getattr(fallback, "kwargs", {})])
+        return chain
     
-    def run_evaluation(self, model_name: str, similarity_model_name: Optional[str] = None) -> Dict:
-        """Run evaluation on current program
+    def _prediction_cache_key(self, context: Dict, input_data: Dict) -> str:
+        """Get the prediction cache key for a sample's inputs"""
+        return make_cache_key(
+            "prediction",
+            context["program_hash"],
+            input_data,
+            context["lm_chain"]
+        )
+    
+    def _evaluate_sample(self, context: Dict, sample: Dict, sample_id: int) -> Dict:
+        """Run the program on a single sample and score the prediction
+        
+        The LM contexts are entered here rather than by the caller because
+        dspy.context only applies to the current thread.
+        
+        Args:
+            context (Dict): Context returned by prepare_evaluation
+            sample (Dict): The sample to evaluate
+            sample_id (int): Index of the sample in the sample list
+            
+        Returns:
+            Dict: The prediction result for the sample
+        """
+        logger.debug("Evaluating sample %s", sample_id)
+        signature = context["signature"]
+        cache = context["prediction_cache"]
+        try:
+            # Prepare input data
+            input_data = {}
+            for field in signature.input_fields:
+                input_data[field] = sample.get(field, "")
+            
+            # Reuse the program output if this program has already seen these inputs
+            pred = None
+            served_models = []
+            if cache:
+                cache_key = self._prediction_cache_key(context, input_data)
+                cached_outputs = cache.get(cache_key)
+                if cached_outputs is not None:
+                    served_models = cached_outputs.pop(SERVED_MODELS_KEY, [])
+                    pred = dspy.Prediction(**cached_outputs)
+            
+            # Run the prediction
+            start_time = time.time()
+            cached = pred is not None
+            if not cached:
+                # Note which model of a fallback chain answered each call
+                with dspy.context(lm=context["eval_lm"]), track_served_models() as served_models:
+                    pred = context["program"](**input_data)
+                served_models = list(dict.fromkeys(served_models))
+                # Outputs a fallback model produced would be replayed as the evaluated model's
+                if cache and all(model == context["lm_chain"][0][0] for model in served_models):
+                    cached_outputs = {
+                        field: getattr(pred, field, "") for field in signature.output_fields
+                    }
+                    cached_outputs[SERVED_MODELS_KEY] = served_models
+                    cache.set(cache_key, cached_outputs)
+            end_time = time.time()
+            
+            # Create a prediction result
+            pred_result = {
+                "sample_id": sample_id,
+                "time_taken": end_time - start_time,
+                "cached": cached,
+                "served_models": served_models
+            }
+            
+            # Add input fields
+            for field in signature.input_fields:
+                pred_result[f"input_{field}"] = sample.get(field, "")
+            
+            # Add expected output fields
+            for field in signature.output_fields:
+                pred_result[f"expected_{field}"] = sample.get(field, "")
+                pred_result[f"predicted_{field}"] = getattr(pred, field, "")
+            
+            # Create Example objects for metric evaluation
+            example_data = {}
+            for field in signature.input_fields:
+                example_data[field] = sample.get(field, "")
+            for field in signature.output_fields:
+                example_data[field] = sample.get(field, "")
+            
+            example = dspy.Example(**example_data)
+
+            # Evaluate the prediction using our metric
+            with dspy.context(lm=context["sim_lm"]):
+                score, explanation = judge_metric(example, pred, signature=signature)
+
+            pred_result["overall_score"] = score
+            pred_result["similarity_result"] = {
+                "explanation": explanation
+            }
+            
+            return pred_result
+            
+        except Exception as e:
+            # Handle errors for individual samples
+            logger.warning("Evaluating sample %s failed: %s", sample_id, e)
+            return {
+                "sample_id": sample_id,
+                "error": str(e),
+                "overall_score": 0.0
+            }
+    
+    def prepare_evaluation(self, model_name: str, similarity_model_name: Optional[str] = None,
+                           num_workers: Optional[int] = None, program_id: Optional[str] = None,
+                           use_cache: bool = True, sample_ids: Optional[List[int]] = None,
+                           cancel_event: Optional[threading.Event] = None) -> Dict:
+        """Validate and load everything an evaluation needs
         
         Args:
             model_name (str): Name of model to use for evaluation
             similarity_model_name (str, optional): Name of model to use for similarity scoring
                                                 If None, uses the same model as evaluation
+            num_workers (int, optional): Number of samples to evaluate concurrently.
+                                      If None, uses the max_workers parameter of the model
+            program_id (str, optional): ID of the program to evaluate.
+                                     If None, uses the current program.
+            use_cache (bool): Whether to reuse cached program outputs
+            sample_ids (List[int], optional): Indices of the samples to evaluate.
+                                           If None, evaluates every sample.
+            cancel_event (threading.Event, optional): Set to stop the run before
+                                                    its remaining samples
         
         Returns:
-            Dict: Evaluation results
+            Dict: An error result, or the loaded evaluation context with status "ready"
         """
-        self.running = True
+        program_id = program_id or self.app_state.current_program_id
         
-        try:
-            # Validate that we have all we need
-            if not self.app_state.current_program_id:
-                return {
-                    "status": "error",
-                    "message": "No program selected. Please select a program first."
-                }
+        # Validate that we have all we need
+        if not program_id:
+            return {
+                "status": "error",
+                "message": "No program selected. Please select a program first."
+            }
+        
+        # Get the signature for the program
+        program_metadata = self.app_state.programs.get(program_id, {})
+        signature_name = program_metadata.get("signature_name")
+        if not signature_name:
+            return {
+                "status": "error",
+                "message": "Program has no associated signature."
+            }
             
-            # Get the signature for the current program
-            program_metadata = self.app_state.programs.get(self.app_state.current_program_id, {})
-            signature_name = program_metadata.get("signature_name")
-            if not signature_name:
-                return {
-                    "status": "error",
-                    "message": "Program has no associated signature."
-                }
-                
-            signature = self.app_state.get_signature(signature_name)
-            if not signature:
-                return {
-                    "status": "error",
-                    "message": f"Signature '{signature_name}' not found."
-                }
-                
-            # Load samples
-            samples = self.sample_manager.load_samples(signature_name)
+        signature = self.app_state.get_signature(signature_name)
+        if not signature:
+            return {
+                "status": "error",
+                "message": f"Signature '{signature_name}' not found."
+            }
+            
+        # Load samples
+        samples = self.sample_manager.load_samples(signature_name)
+        if not samples:
+            return {
+                "status": "error",
+                "message": f"No samples found for signature '{signature_name}'."
+            }
+        
+        # Keep the indices of the full sample list, so results of subsets can be merged
+        if sample_ids is None:
+            sample_ids = list(range(len(samples)))
+        else:
+            sample_ids = [i for i in sample_ids if 0 <= i < len(samples)]
+            samples = [samples[i] for i in sample_ids]
             if not samples:
                 return {
                     "status": "error",
-                    "message": f"No samples found for signature '{signature_name}'."
+                    "message": "None of the selected samples exist."
                 }
-                
-            # Load the program
-            program_path = Config.PROGRAM_DIR / self.app_state.current_program_id
+            
+        # Load the program
+        try:
+            program = program_cache.get(program_id)
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Failed to load program: {e}"
+            }
+        
+        # Configure models
+        from ..utils import get_lm
+        eval_lm = get_lm(model_name)
+        sim_lm = get_lm(similarity_model_name) if similarity_model_name else eval_lm
+        
+        if num_workers is None:
+            num_workers = self._get_num_workers(model_name)
+        
+        # Program outputs are cached against the saved program content and the models
+        # that can answer for it
+        program_hash = None
+        lm_chain = None
+        if use_cache:
             try:
-                program = dspy.load(str(program_path))
-            except Exception as e:
+                program_hash = program_fingerprint(program_id)
+                lm_chain = self._lm_chain(eval_lm, model_name)
+            except OSError as e:
+                logger.warning("Not caching predictions for %s: %s", program_id, e)
+        
+        return {
+            "status": "ready",
+            "program_id": program_id,
+            "program_hash": program_hash,
+            "prediction_cache": self.prediction_cache if program_hash else None,
+            "lm_chain": lm_chain,
+            "model_name": model_name,
+            "program": program,
+            "signature": signature,
+            "samples": samples,
+            "sample_ids": sample_ids,
+            "eval_lm": eval_lm,
+            "sim_lm": sim_lm,
+            "num_workers": max(1, min(num_workers, len(samples))),
+            "cancel_event": cancel_event or threading.Event()
+        }
+    
+    def iter_results(self, context: Dict) -> Iterator[Dict]:
+        """Evaluate the samples of a prepared evaluation
+        
+        Results are yielded as soon as each sample finishes, so with several
+        workers they arrive in completion order rather than sample order.
+        Closing the generator early, or setting the context's cancel_event,
+        cancels the samples not yet started.
+        
+        Args:
+            context (Dict): Context returned by prepare_evaluation
+        
+        Yields:
+            Dict: The prediction result for each sample
+        """
+        indexed_samples = list(zip(context["sample_ids"], context["samples"]))
+        cancel_event = context["cancel_event"]
+        
+        def evaluate(sample: Dict, sample_id: int) -> Optional[Dict]:
+            if cancel_event.is_set():
+                return None
+            return self._evaluate_sample(context, sample, sample_id)
+        
+        if context["num_workers"] == 1:
+            for i, sample in indexed_samples:
+                pred_result = evaluate(sample, i)
+                if pred_result is None:
+                    return
+                yield pred_result
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=context["num_workers"])
+        finished = False
+        try:
+            futures = [executor.submit(evaluate, sample, i) for i, sample in indexed_samples]
+            for future in as_completed(futures):
+                pred_result = future.result()
+                if pred_result is None:
+                    return
+                yield pred_result
+            finished = True
+        finally:
+            if not finished:
+                # Samples the executor has already picked up return without running
+                cancel_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def run_evaluation(self, model_name: str, similarity_model_name: Optional[str] = None,
+                       num_workers: Optional[int] = None, program_id: Optional[str] = None,
+                       on_result: Optional[Callable[[Dict, int, int], None]] = None,
+                       use_cache: bool = True, sample_ids: Optional[List[int]] = None,
+                       cancel_event: Optional[threading.Event] = None) -> Dict:
+        """Run evaluation on a program
+        
+        Args:
+            model_name (str): Name of model to use for evaluation
+            similarity_model_name (str, optional): Name of model to use for similarity scoring
+                                                If None, uses the same model as evaluation
+            num_workers (int, optional): Number of samples to evaluate concurrently.
+                                      If None, uses the max_workers parameter of the model
+            program_id (str, optional): ID of the program to evaluate.
+                                     If None, uses the current program.
+            on_result (Callable, optional): Called with (pred_result, completed, total)
+                                         each time a sample finishes, in completion order
+            use_cache (bool): Whether to reuse cached program outputs.
+                           Pass False to run the program on every sample.
+            sample_ids (List[int], optional): Indices of the samples to evaluate.
+                                           If None, evaluates every sample.
+            cancel_event (threading.Event, optional): Set to stop the evaluation;
+                                                    it then returns status "cancelled"
+        
+        Returns:
+            Dict: Evaluation results
+        """
+        try:
+            context = self.prepare_evaluation(model_name, similarity_model_name, num_workers,
+                                              program_id, use_cache, sample_ids, cancel_event)
+            if context["status"] != "ready":
+                return context
+            
+            samples = context["samples"]
+            
+            # Evaluate each sample
+            results = []
+            for pred_result in self.iter_results(context):
+                results.append(pred_result)
+                if on_result:
+                    on_result(pred_result, len(results), len(samples))
+            
+            if len(results) < len(samples):
                 return {
-                    "status": "error",
-                    "message": f"Failed to load program: {e}"
+                    "status": "cancelled",
+                    "message": f"Evaluation was cancelled after {len(results)} of {len(samples)} samples"
                 }
             
-            # Configure models
-            from ..utils import get_lm
-            eval_lm = get_lm(model_name)
-            sim_lm = get_lm(similarity_model_name) if similarity_model_name else eval_lm
+            # Keep results in the original sample order
+            results.sort(key=lambda result: result["sample_id"])
+            total_score = sum(result["overall_score"] for result in results)
             
-            # Prepare results dictionary
-            results = []
             metrics = {
-                "avg_score": 0.0,
+                "avg_score": total_score / len(samples),
                 "num_samples": len(samples),
+                "num_workers": context["num_workers"],
+                "cache_hits": sum(1 for result in results if result.get("cached")),
             }
-            total_score = 0.0
-            
-            # Evaluate each sample
-            with dspy.context(lm=eval_lm):
-                for i, sample in enumerate(samples):
-                    print(i)
-                    try:
-                        # Prepare input data
-                        input_data = {}
-                        for field in signature.input_fields:
-                            input_data[field] = sample.get(field, "")
-                        
-                        # Run the prediction
-                        start_time = time.time()
-                        pred = program(**input_data)
-                        end_time = time.time()
-                        
-                        # Create a prediction result
-                        pred_result = {
-                            "sample_id": i,
-                            "time_taken": end_time - start_time
-                        }
-                        
-                        # Add input fields
-                        for field in signature.input_fields:
-                            pred_result[f"input_{field}"] = sample.get(field, "")
-                        
-                        # Add expected output fields
-                        for field in signature.output_fields:
-                            pred_result[f"expected_{field}"] = sample.get(field, "")
-                            pred_result[f"predicted_{field}"] = getattr(pred, field, "")
-                        
-                        # Create Example objects for metric evaluation
-                        example_data = {}
-                        for field in signature.input_fields:
-                            example_data[field] = sample.get(field, "")
-                        for field in signature.output_fields:
-                            example_data[field] = sample.get(field, "")
-                        
-                        example = dspy.Example(**example_data)
-
-                        # Evaluate the prediction using our metric
-                        with dspy.context(lm=sim_lm):
-                            score, explanation = judge_metric(example, pred)
-
-                        pred_result["overall_score"] = score
-                        pred_result["similarity_result"] = {
-                            "explanation": explanation
-                        }
-                        
-                        # Add the result to our results list
-                        results.append(pred_result)
-                        
-                        # Update total score
-                        total_score += score
-                        
-                    except Exception as e:
-                        # Handle errors for individual samples
-                        print(e)
-                        results.append({
-                            "sample_id": i,
-                            "error": str(e),
-                            "overall_score": 0.0
-                        })
-            
-            # Calculate average score
-            if len(samples) > 0:
-                metrics["avg_score"] = total_score / len(samples)
             
             # Return the results
             return {
                 "status": "success",
+                "program_id": context["program_id"],
                 "metrics": metrics,
                 "results": results
             }
@@ -165,5 +396,82 @@ class Evaluator:
                 "status": "error",
                 "message": str(e)
             }
-        finally:
-            self.running = False
+    
+    def stream_evaluation(self, model_name: str, similarity_model_name: Optional[str] = None,
+                          num_workers: Optional[int] = None, program_id: Optional[str] = None,
+                          use_cache: bool = True, sample_ids: Optional[List[int]] = None,
+                          cancel_event: Optional[threading.Event] = None) -> Iterator[Dict]:
+        """Run evaluation on a program, yielding a progress record per sample
+        
+        Only running totals are kept, so memory does not grow with the number
+        of samples. The first record has type "start" and the last one type
+        "done", "cancelled" if cancel_event was set first, or "error" if the
+        evaluation could not run.
+        
+        Args:
+            model_name (str): Name of model to use for evaluation
+            similarity_model_name (str, optional): Name of model to use for similarity scoring
+                                                If None, uses the same model as evaluation
+            num_workers (int, optional): Number of samples to evaluate concurrently.
+                                      If None, uses the max_workers parameter of the model
+            program_id (str, optional): ID of the program to evaluate.
+                                     If None, uses the current program.
+            use_cache (bool): Whether to reuse cached program outputs
+            sample_ids (List[int], optional): Indices of the samples to evaluate.
+                                           If None, evaluates every sample.
+            cancel_event (threading.Event, optional): Set to stop the evaluation
+        
+        Yields:
+            Dict: Progress records
+        """
+        try:
+            context = self.prepare_evaluation(model_name, similarity_model_name, num_workers,
+                                              program_id, use_cache, sample_ids, cancel_event)
+            if context["status"] != "ready":
+                yield {"type": "error", "message": context["message"]}
+                return
+            
+            total = len(context["samples"])
+            yield {
+                "type": "start",
+                "program_id": context["program_id"],
+                "total": total,
+                "num_workers": context["num_workers"]
+            }
+            
+            completed = 0
+            cache_hits = 0
+            total_score = 0.0
+            for pred_result in self.iter_results(context):
+                completed += 1
+                cache_hits += 1 if pred_result.get("cached") else 0
+                total_score += pred_result["overall_score"]
+                yield {
+                    "type": "result",
+                    "sample_id": pred_result["sample_id"],
+                    "score": pred_result["overall_score"],
+                    "latency": pred_result.get("time_taken"),
+                    "cached": pred_result.get("cached", False),
+                    "served_models": pred_result.get("served_models", []),
+                    "explanation": pred_result.get("similarity_result", {}).get("explanation"),
+                    "error": pred_result.get("error"),
+                    "completed": completed,
+                    "total": total,
+                    "running_avg_score": total_score / completed
+                }
+            
+            if completed < total:
+                yield {"type": "cancelled", "completed": completed, "total": total}
+                return
+            
+            yield {
+                "type": "done",
+                "metrics": {
+                    "avg_score": total_score / total,
+                    "num_samples": total,
+                    "num_workers": context["num_workers"],
+                    "cache_hits": cache_hits
+                }
+            }
+        except Exception as e:
+            yield {"type": "error", "message": str(e)}
@@ -0,0 +1,306 @@
+"""
+Background evaluation jobs
+"""
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from ..config import Config
+from .state import AppState
+from .evaluation import Evaluator
+
+class EvaluationJob:
+    """An evaluation submitted to run in the background"""
+
+    def __init__(self,
+                 job_id: str,
+                 program_id: Optional[str],
+                 model_name: str,
+                 similarity_model_name: Optional[str] = None,
+                 num_workers: Optional[int] = None,
+                 use_cache: bool = True):
+        """
+        Initialize an evaluation job
+
+        Args:
+            job_id: Unique ID of the job
+            program_id: ID of the program to evaluate
+            model_name: Name of the model to use for evaluation
+            similarity_model_name: Name of the model to use for similarity scoring
+            num_workers: Number of samples to evaluate concurrently
+            use_cache: Whether to reuse cached program outputs
+        """
+        self.id = job_id
+        self.program_id = program_id
+        self.model_name = model_name
+        self.similarity_model_name = similarity_model_name
+        self.num_workers = num_workers
+        self.use_cache = use_cache
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.completed = 0
+        self.total = 0
+        self.total_score = 0.0
+        self.partial_results = []
+        self.result = None
+        self.error = None
+        # Set to stop the evaluation before its remaining samples
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def record_result(self, pred_result: Dict, completed: int, total: int):
+        """Record a finished sample while the job is running"""
+        with self._lock:
+            self.partial_results.append(pred_result)
+            self.completed = completed
+            self.total = total
+            self.total_score += pred_result.get("overall_score", 0.0)
+
+    def get_partial_results(self, offset: int = 0) -> List[Dict]:
+        """Get the samples finished so far, in completion order, starting at offset"""
+        with self._lock:
+            return list(self.partial_results[offset:])
+
+    def cancel(self) -> bool:
+        """Ask the job to stop, returning False if it has already finished"""
+        if self.done:
+            return False
+        self.cancel_event.set()
+        return True
+
+    @property
+    def done(self) -> bool:
+        """Whether the job has finished, successfully or not"""
+        return self.status in ("completed", "failed", "cancelled")
+
+    def to_dict(self, include_result: bool = False) -> Dict:
+        """Convert job to dictionary"""
+        with self._lock:
+            data = {
+                "job_id": self.id,
+                "status": self.status,
+                "program_id": self.program_id,
+                "model": self.model_name,
+                "similarity_model": self.similarity_model_name,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "completed": self.completed,
+                "total": self.total,
+                "running_avg_score": self.total_score / self.completed if self.completed else 0.0,
+                "error": self.error
+            }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'EvaluationJob':
+        """Create a finished job from dictionary"""
+        job = cls(
+            job_id=data.get("job_id", ""),
+            program_id=data.get("program_id"),
+            model_name=data.get("model", ""),
+            similarity_model_name=data.get("similarity_model")
+        )
+        job.status = data.get("status", "completed")
+        job.created_at = data.get("created_at")
+        job.started_at = data.get("started_at")
+        job.finished_at = data.get("finished_at")
+        job.completed = data.get("completed", 0)
+        job.total = data.get("total", 0)
+        job.error = data.get("error")
+        job.result = data.get("result")
+        if job.result:
+            job.partial_results = job.result.get("results", [])
+            job.total_score = sum(r.get("overall_score", 0.0) for r in job.partial_results)
+        return job
+
+class EvaluationJobManager:
+    """Runs evaluations in the background and keeps their results
+
+    Only queued and running jobs are held in memory. Finished jobs are saved
+    to a results file each and loaded back from it when asked for, and a
+    summary of each is appended to an index that listings read instead of
+    the results files.
+    """
+
+    def __init__(self, app_state: AppState, evaluator: Evaluator, max_jobs: Optional[int] = None):
+        self.app_state = app_state
+        self.evaluator = evaluator
+        self.jobs = {}  # Dictionary of job_id -> EvaluationJob
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_jobs or Config.MAX_EVALUATION_JOBS,
+            thread_name_prefix="evaluation-job"
+        )
+
+    def _get_job_file(self, job_id: str):
+        """Get the results file path for a job"""
+        return Config.EVALUATIONS_DIR / f"{job_id}.json"
+
+    def _get_index_file(self):
+        """Get the file holding a summary of every saved job, one JSON object per line"""
+        return Config.EVALUATIONS_DIR / "index.jsonl"
+
+    def _index_job(self, summary: Dict):
+        """Append the summary of a saved job to the index; a later line for a job replaces earlier ones"""
+        with self._index_lock:
+            with open(self._get_index_file(), "a") as f:
+                f.write(json.dumps(summary) + "\n")
+
+    def submit(self, model_name: str, similarity_model_name: Optional[str] = None,
+               num_workers: Optional[int] = None, program_id: Optional[str] = None,
+               use_cache: bool = True) -> EvaluationJob:
+        """Submit an evaluation to run in the background
+
+        Args:
+            model_name (str): Name of model to use for evaluation
+            similarity_model_name (str, optional): Name of model to use for similarity scoring
+            num_workers (int, optional): Number of samples to evaluate concurrently
+            program_id (str, optional): ID of the program to evaluate.
+                                     If None, uses the current program at submission time.
+            use_cache (bool): Whether to reuse cached program outputs
+
+        Returns:
+            EvaluationJob: The queued job
+        """
+        job = EvaluationJob(
+            job_id=f"eval_{uuid.uuid4().hex}",
+            program_id=program_id or self.app_state.current_program_id,
+            model_name=model_name,
+            similarity_model_name=similarity_model_name,
+            num_workers=num_workers,
+            use_cache=use_cache
+        )
+        with self._lock:
+            self.jobs[job.id] = job
+        self._executor.submit(self._run_job, job)
+        return job
+
+    def _run_job(self, job: EvaluationJob):
+        """Run a job and store its result"""
+        job.status = "running"
+        job.started_at = time.time()
+        status = "failed"
+        try:
+            result = self.evaluator.run_evaluation(
+                job.model_name,
+                job.similarity_model_name,
+                num_workers=job.num_workers,
+                program_id=job.program_id,
+                on_result=job.record_result,
+                use_cache=job.use_cache,
+                cancel_event=job.cancel_event
+            )
+            result["job_id"] = job.id
+            job.result = result
+            if result.get("status") == "success":
+                status = "completed"
+                # Keep the dashboard pointing at the latest successful evaluation
+                self.app_state.evaluation_results = result
+            elif result.get("status") == "cancelled":
+                status = "cancelled"
+            else:
+                job.error = result.get("message", "Unknown error")
+        except Exception as e:
+            print(f"Evaluation job {job.id} failed: {e}")
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            # Only report the job as done once its result is on disk
+            saved = self._save_job(job, status)
+            job.status = status
+            if saved:
+                # get_job loads it back from disk from now on
+                with self._lock:
+                    self.jobs.pop(job.id, None)
+
+    def _save_job(self, job: EvaluationJob, status: Optional[str] = None) -> bool:
+        """Save a finished job to file, optionally with the status it is finishing with"""
+        data = job.to_dict(include_result=True)
+        if status is not None:
+            data["status"] = status
+        try:
+            with open(self._get_job_file(job.id), "w") as f:
+                json.dump(data, f, indent=2)
+            data.pop("result", None)
+            self._index_job(data)
+            return True
+        except Exception as e:
+            print(f"Error saving evaluation job {job.id}: {e}")
+            return False
+
+    def get_job(self, job_id: str) -> Optional[EvaluationJob]:
+        """Get a job by ID, loading finished jobs from disk"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job:
+            return job
+
+        job_file = self._get_job_file(job_id)
+        if not job_file.exists():
+            return None
+        try:
+            with open(job_file, "r") as f:
+                job = EvaluationJob.from_dict(json.load(f))
+        except Exception as e:
+            print(f"Error loading evaluation job {job_id}: {e}")
+            return None
+        return job
+
+    def cancel(self, job_id: str) -> Optional[bool]:
+        """Cancel a job
+
+        Samples already being evaluated finish, the rest are skipped.
+
+        Returns:
+            Optional[bool]: None if the job doesn't exist, False if it had already finished
+        """
+        job = self.get_job(job_id)
+        return job.cancel() if job else None
+
+    def get_result(self, job_id: str) -> Optional[Dict]:
+        """Get the final result of a finished job"""
+        job = self.get_job(job_id)
+        return job.result if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        """List all known jobs, newest first"""
+        jobs = {}
+        # Finished jobs, from this and earlier runs of the application
+        index_file = self._get_index_file()
+        if index_file.exists():
+            with open(index_file, "r") as f:
+                for line in f:
+                    try:
+                        data = json.loads(line)
+                        jobs[data["job_id"]] = data
+                    except Exception as e:
+                        print(f"Skipping invalid line of the evaluation job index: {e}")
+
+        # Jobs saved before the index existed are read once and added to it
+        for job_file in Config.EVALUATIONS_DIR.glob("eval_*.json"):
+            if job_file.stem in jobs:
+                continue
+            try:
+                with open(job_file, "r") as f:
+                    data = json.load(f)
+                data.pop("result", None)
+                jobs[data["job_id"]] = data
+                self._index_job(data)
+            except Exception as e:
+                print(f"Error loading evaluation job from {job_file}: {e}")
+
+        with self._lock:
+            current_jobs = list(self.jobs.values())
+        for job in current_jobs:
+            jobs[job.id] = job.to_dict()
+
+        return sorted(jobs.values(), key=lambda x: x.get("created_at") or 0, reverse=True)
@@ -1,6 +1,7 @@
 """
 Module for optimizing DSPy programs
 """
+from functools import partial
 from typing import List, Dict, Optional
 
 import dspy
@@ -9,7 +10,8 @@ from ..models.signature import SignatureDefinition
 from ..config import Config
 from .state import AppState
 from .samples import SampleManager
-from ..utils.metrics import judge_metric
+from .program_cache import program_cache
+from ..utils.metrics import judge_metric, get_judge_cache
 
 class Optimizer:
     """Handles optimization process for the language model"""
@@ -47,16 +49,25 @@ class Optimizer:
         
         return examples
 
-    def run_optimization(self, model_name: str, signature_name: Optional[str] = None) -> None:
+    def run_optimization(self, model_name: str, signature_name: Optional[str] = None,
+                         program_id: Optional[str] = None,
+                         sample_ids: Optional[List[int]] = None) -> Optional[str]:
         """Run the optimization process with thread safety
         
         Args:
             model_name (str): Name of the model to use
             signature_name (str, optional): Name of the signature to optimize.
                                          If None, uses the current signature.
+            program_id (str, optional): ID of the program to start from.
+                                     If None, uses the current program.
+            sample_ids (List[int], optional): Indices of the samples to train on.
+                                           If None, trains on every sample.
+        
+        Returns:
+            Optional[str]: The ID of the optimized program, or None if optimization failed
         """
         if self.running:
-            return
+            return None
 
         self.running = True
         try:
@@ -73,17 +84,19 @@ class Optimizer:
             from ..utils import get_lm
             thread_lm = get_lm(model_name)
             if not thread_lm:
-                return
+                return None
             
             # Load samples for the signature
             samples = self.sample_manager.load_samples(sig_name)
+            if sample_ids is not None:
+                samples = [samples[i] for i in sample_ids if 0 <= i < len(samples)]
             training_data = self._prepare_training_data(samples, signature)
             
             if not training_data:
                 raise ValueError(f"No valid training data found for signature {sig_name}")
 
             # Base task must be loaded from an existing program
-            current_program = self.app_state.current_program_id
+            current_program = program_id or self.app_state.current_program_id
             current_program_sig = self.app_state.programs.get(current_program, {}).get("signature_name")
             
             # Check if current program matches the signature we're optimizing
@@ -94,15 +107,19 @@ class Optimizer:
                 # Load the current program as a base
                 print(f"Loading base program from {current_program}")
                 try:
-                    base_task = dspy.load(str(Config.PROGRAM_DIR / current_program))
+                    # Copy the cached program so the optimizer can't change the shared one
+                    base_task = program_cache.get(current_program).deepcopy()
                     print(f"Successfully loaded base task: {type(base_task)}")
                     
                     # Use the same optimization technique
                     with dspy.context(lm=thread_lm):
                         optimized_task = dspy.MIPROv2(
-                            metric=self._optimization_metric,
+                            metric=partial(self._optimization_metric, signature=signature),
                             auto="light"
                         ).compile(base_task, trainset=training_data, requires_permission_to_run=False)
+                    
+                    judge_stats = get_judge_cache().stats()
+                    print(f"Judge cache: {judge_stats['hits']} hits, {judge_stats['misses']} misses")
                 except Exception as e:
                     error_msg = f"Failed to load program: {e}"
                     print(error_msg)
@@ -117,25 +134,27 @@ class Optimizer:
             from ..utils.program_utils import save_program
             
             print("Saving optimized program")
-            program_id = save_program(
+            new_program_id = save_program(
                 optimized_task,
                 model_name,
                 sig_name,
                 signature.description,
-                self.app_state.current_program_id
+                current_program
             )
             
             # Update current program in app state
-            self.app_state.current_program_id = program_id
-            self.app_state.load_available_programs()  # Refresh program list
+            self.app_state.current_program_id = new_program_id
+            self.app_state.register_program(new_program_id)
+            return new_program_id
         except Exception as e:
             print(f"Optimization error: {e}")
+            return None
         finally:
             self.running = False
 
-    def _optimization_metric(self, example, pred, trace=None) -> float:
+    def _optimization_metric(self, example, pred, trace=None, signature: Optional[SignatureDefinition] = None) -> float:
         """Metric for optimization process"""
-        score, _ = judge_metric(example, pred)
+        score, _ = judge_metric(example, pred, signature=signature)
         print("\n")
         print("score:")
         print(score)
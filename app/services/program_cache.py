@@ -0,0 +1,90 @@
+"""
+Cache of loaded DSPy programs
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import dspy
+
+from ..config import Config
+
+class ProgramCache:
+    """Keeps recently used programs loaded, so each request doesn't unpickle program.pkl
+
+    Entries are keyed by program directory and are reloaded when the directory or
+    its program.pkl changes on disk. The least recently used program is evicted
+    once max_entries programs are loaded. Loaded programs are shared between
+    threads, so callers that modify one must work on a copy.
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize a program cache
+
+        Args:
+            max_entries: Maximum number of loaded programs to keep
+        """
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # Program directory -> (version, program)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(program_dir) -> Optional[Tuple]:
+        """Get the on-disk version of a program, or None if it can't be read"""
+        try:
+            dir_stat = program_dir.stat()
+            pkl_stat = (program_dir / "program.pkl").stat()
+        except OSError:
+            return None
+        return (dir_stat.st_mtime_ns, pkl_stat.st_mtime_ns, pkl_stat.st_size)
+
+    def get(self, program_id: str) -> dspy.Module:
+        """Get a loaded program, loading it if it isn't cached or has changed
+
+        Args:
+            program_id (str): The ID of the program
+
+        Returns:
+            dspy.Module: The loaded program
+        """
+        program_dir = Config.PROGRAM_DIR / program_id
+        key = str(program_dir)
+        version = self._version(program_dir)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and version is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Unpickle outside the lock so other programs can be served meanwhile
+        program = dspy.load(key)
+        if version is None:
+            return program
+
+        with self._lock:
+            self._entries[key] = (version, program)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return program
+
+    def invalidate(self, program_id: Optional[str] = None):
+        """Drop a program from the cache, or all programs if no ID is given"""
+        with self._lock:
+            if program_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(Config.PROGRAM_DIR / program_id), None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+# Shared by the routes and services of the application
+program_cache = ProgramCache(Config.PROGRAM_CACHE_SIZE)
@@ -0,0 +1,844 @@
+"""
+Storage backends for samples
+"""
+import base64
+import hashlib
+import json
+import mmap
+import os
+import re
+import sqlite3
+import string
+import tempfile
+import threading
+import uuid
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from ..config import Config
+
+# Page of a query: (index, sample) pairs and the cursor of the next page, or None at the end
+QueryPage = Tuple[List[Tuple[int, Dict]], Optional[str]]
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_FIELD_NAME = re.compile(r"^\w+$")
+
+def sample_text(value) -> Optional[str]:
+    """Get the text field filters and sorting compare: strings as is, anything else as compact JSON"""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def _fold(text: str) -> str:
+    # ASCII-only, like SQLite's lower()
+    return text.translate(_ASCII_LOWER)
+
+def encode_cursor(sort: Optional[str], descending: bool, key: str, index: int) -> str:
+    """Encode the position of the last sample of a page"""
+    payload = json.dumps([sort, descending, key, index], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], sort: Optional[str], descending: bool) -> Optional[Tuple[str, int]]:
+    """Decode a cursor made by encode_cursor for the same sort order
+
+    Raises:
+        ValueError: If the cursor is malformed or was made for another sort order
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_descending, key, index = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or cursor_descending != descending:
+        raise ValueError("The cursor belongs to another sort order")
+    return str(key), int(index)
+
+def _page(items: List[Tuple[str, int, Dict]], sort: Optional[str], descending: bool, limit: int) -> QueryPage:
+    """Cut (key, index, sample) items fetched with one extra item into a page"""
+    page = items[:limit]
+    next_cursor = None
+    if len(items) > limit and page:
+        key, index, _ = page[-1]
+        next_cursor = encode_cursor(sort, descending, key, index)
+    return [(index, sample) for _, index, sample in page], next_cursor
+
+def _matches(sample: Dict, needles: Dict[str, str]) -> bool:
+    for field, needle in needles.items():
+        text = sample_text(sample.get(field))
+        if text is None or needle not in _fold(text):
+            return False
+    return True
+
+def query_indexed(indexed: Iterable[Tuple[int, Dict]], filters: Optional[Dict[str, str]] = None,
+                  sort: Optional[str] = None, descending: bool = False, cursor: Optional[str] = None,
+                  limit: int = 50) -> QueryPage:
+    """Filter, sort and page (index, sample) pairs in memory; see SampleStore.query()"""
+    after = decode_cursor(cursor, sort, descending)
+    needles = {field: _fold(text) for field, text in (filters or {}).items() if text}
+    items = []
+    for index, sample in indexed:
+        if _matches(sample, needles):
+            key = (sample_text(sample.get(sort)) or "") if sort else ""
+            if after is None or ((key, index) < after if descending else (key, index) > after):
+                items.append((key, index, sample))
+    items.sort(key=lambda item: item[:2], reverse=descending)
+    return _page(items[:limit + 1], sort, descending, limit)
+
+class SampleStore:
+    """Interface of sample storage backends
+
+    Samples of a signature form an ordered list and are addressed by their
+    index in it, like the sample IDs used by the routes and evaluations.
+    """
+
+    # Whether get, count, page, stream and query read only the samples they need,
+    # rather than the whole list
+    partial_reads = False
+
+    def list(self, signature_name: str) -> List[Dict]:
+        """Get every sample of a signature, in order"""
+        raise NotImplementedError
+
+    def get(self, signature_name: str, index: int) -> Optional[Dict]:
+        """Get a sample by index, or None if there is no such sample"""
+        samples = self.list(signature_name)
+        return samples[index] if 0 <= index < len(samples) else None
+
+    def count(self, signature_name: str) -> int:
+        """Get the number of samples of a signature"""
+        return len(self.list(signature_name))
+
+    def page(self, signature_name: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """Get the samples of a signature from offset on, at most limit of them"""
+        samples = self.list(signature_name)[max(offset, 0):]
+        return samples if limit is None else samples[:limit]
+
+    def stream(self, signature_name: str, offset: int = 0, limit: Optional[int] = None) -> Iterator[Dict]:
+        """Iterate over the samples of a signature from offset on, at most limit of them"""
+        yield from self.page(signature_name, offset, limit)
+
+    def query(self, signature_name: str, filters: Optional[Dict[str, str]] = None,
+              sort: Optional[str] = None, descending: bool = False, cursor: Optional[str] = None,
+              limit: int = 50) -> QueryPage:
+        """Get a page of the samples of a signature that match filters, in sort order
+
+        Args:
+            signature_name: Name of the signature
+            filters: Field name -> text the field must contain, ignoring ASCII case.
+                Fields that aren't strings are matched as compact JSON.
+            sort: Field to sort by, or None for sample order
+            descending: Sort in descending order
+            cursor: Cursor returned with the previous page, or None for the first page
+            limit: Maximum number of samples in the page
+
+        Returns:
+            QueryPage: (index, sample) pairs, and the cursor of the next page or None
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        filters = {field: text for field, text in (filters or {}).items() if text}
+        if filters or sort:
+            return query_indexed(enumerate(self.stream(signature_name)), filters, sort, descending, cursor, limit)
+        return self._query_by_index(signature_name, descending, cursor, limit)
+
+    def _query_by_index(self, signature_name: str, descending: bool, cursor: Optional[str], limit: int) -> QueryPage:
+        """Page through all samples in sample order, reading only the page"""
+        after = decode_cursor(cursor, None, descending)
+        if descending:
+            end = after[1] if after else self.count(signature_name)
+            start = max(0, end - limit - 1)
+            indices = range(end - 1, start - 1, -1)
+            samples = self.page(signature_name, start, end - start)[::-1]
+        else:
+            start = after[1] + 1 if after else 0
+            indices = range(start, start + limit + 1)
+            samples = self.page(signature_name, start, limit + 1)
+        return _page([("", index, sample) for index, sample in zip(indices, samples)], None, descending, limit)
+
+    def add(self, signature_name: str, samples: Iterable[Dict]) -> int:
+        """Append samples, returning the number added"""
+        raise NotImplementedError
+
+    def update(self, signature_name: str, index: int, sample: Dict) -> bool:
+        """Replace a sample, returning False if there is no such sample"""
+        raise NotImplementedError
+
+    def delete(self, signature_name: str, index: int) -> bool:
+        """Delete a sample, returning False if there is no such sample"""
+        raise NotImplementedError
+
+    def replace(self, signature_name: str, samples: Iterable[Dict]):
+        """Replace every sample of a signature"""
+        raise NotImplementedError
+
+    @contextmanager
+    def bulk_import(self, signature_name: str, replace: bool = False) -> Iterator[Callable[[List[Dict]], None]]:
+        """Write samples given in batches as a single change
+
+        The batches are staged in a temporary file and written with one add()
+        or replace() when the with block ends. If the block raises, the
+        signature's samples are left as they were.
+
+        Args:
+            signature_name: Name of the signature
+            replace: Replace the existing samples instead of appending to them
+
+        Yields:
+            Callable[[List[Dict]], None]: Function that stages a batch of samples
+        """
+        with tempfile.TemporaryFile() as staging:
+            def stage(batch: List[Dict]):
+                staging.writelines(json.dumps(sample).encode() + b"\n" for sample in batch)
+
+            yield stage
+            staging.seek(0)
+            samples = (json.loads(line) for line in staging)
+            if replace:
+                self.replace(signature_name, samples)
+            else:
+                self.add(signature_name, samples)
+
+    def version(self, signature_name: str) -> Optional[Hashable]:
+        """Get a token that changes whenever the samples of a signature change
+
+        Returns None if the store can't tell, so its samples can't be cached.
+        """
+        return None
+
+    def close(self):
+        """Release the resources held by the store"""
+
+class StaleSampleFileError(RuntimeError):
+    """Raised when a JSON sample file changed after it was imported into the SQLite store"""
+
+def file_version(path: Path) -> Hashable:
+    """Get the modification time and size of a file, or () if it doesn't exist"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return ()
+    return (stat.st_mtime_ns, stat.st_size)
+
+def json_sample_file(signature_name: str) -> Path:
+    """Get the JSON file holding the samples of a signature"""
+    return Config.SAMPLES_DIR / f"{signature_name}_samples.json"
+
+def read_json_samples(signature_name: str) -> Optional[List[Dict]]:
+    """Read the JSON sample file of a signature, or None if it has none"""
+    try:
+        with open(json_sample_file(signature_name), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+class JSONSampleStore(SampleStore):
+    """Stores the samples of each signature in samples/<signature>_samples.json
+
+    Every change rewrites the whole file to a temporary file that then
+    replaces it, so a failed write leaves the old file in place.
+    """
+
+    def list(self, signature_name: str) -> List[Dict]:
+        return read_json_samples(signature_name) or []
+
+    def _write(self, signature_name: str, samples: List[Dict]):
+        path = json_sample_file(signature_name)
+        tmp_file = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(samples, f, indent=2)
+            os.replace(tmp_file, path)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+
+    def add(self, signature_name: str, samples: Iterable[Dict]) -> int:
+        current = self.list(signature_name)
+        added = list(samples)
+        self._write(signature_name, current + added)
+        return len(added)
+
+    def update(self, signature_name: str, index: int, sample: Dict) -> bool:
+        samples = self.list(signature_name)
+        if not 0 <= index < len(samples):
+            return False
+        samples[index] = sample
+        self._write(signature_name, samples)
+        return True
+
+    def delete(self, signature_name: str, index: int) -> bool:
+        samples = self.list(signature_name)
+        if not 0 <= index < len(samples):
+            return False
+        del samples[index]
+        self._write(signature_name, samples)
+        return True
+
+    def replace(self, signature_name: str, samples: Iterable[Dict]):
+        self._write(signature_name, list(samples))
+
+    def version(self, signature_name: str) -> Optional[Hashable]:
+        return file_version(json_sample_file(signature_name))
+
+class SQLiteSampleStore(SampleStore):
+    """Stores samples as rows of an SQLite table, one row per sample
+
+    Adding, editing or deleting a sample only writes its own row, and each
+    change is a transaction, so several workers can share the database. The
+    JSON sample file of a signature is imported the first time the signature
+    is used, and its modification time, size and hash are recorded. If the
+    file changes after that, the signature is refused until it is re-imported
+    with migrate(force=True), rather than silently ignoring the change.
+    """
+
+    partial_reads = True
+
+    def __init__(self, path: Path):
+        """
+        Initialize an SQLite sample store
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = Path(path)
+        self._conn = None
+        self._migrated = {}  # signature name -> version of its JSON file when last checked
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS samples (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    signature_name TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS samples_signature_name ON samples (signature_name, id)")
+            # The version and SHA-256 of each signature's JSON file when it was imported
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS migrated_signatures (
+                    signature_name TEXT PRIMARY KEY,
+                    source_version TEXT,
+                    source_hash TEXT
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(migrated_signatures)")}
+            for column in ("source_version", "source_hash"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE migrated_signatures ADD COLUMN {column} TEXT")
+            # Bumped by every change to the samples of a signature
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sample_versions (
+                    signature_name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _begin(self, signature_name: str) -> sqlite3.Connection:
+        """Start a write transaction, importing the signature's JSON file if it hasn't been yet
+
+        Must be called with the lock held.
+        """
+        conn = self._connect()
+        # Take the write lock up front so other processes can't interleave
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._migrate(conn, signature_name)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection, signature_name: str, force: bool = False) -> int:
+        """Import a signature's JSON sample file within the current transaction
+
+        Raises:
+            StaleSampleFileError: If the file changed since it was imported and force is False
+        """
+        path = json_sample_file(signature_name)
+        version = list(file_version(path))
+        if self._migrated.get(signature_name) == version and not force:
+            return 0
+        row = conn.execute(
+            "SELECT source_version, source_hash FROM migrated_signatures WHERE signature_name = ?",
+            (signature_name,)
+        ).fetchone()
+        imported = 0
+        if row is not None and not force:
+            recorded = json.loads(row[0]) if row[0] is not None else None
+            # A file removed after the import is fine; one that changed is not
+            if version and recorded != version:
+                digest = self._file_hash(path)
+                if recorded is not None and digest != row[1]:
+                    raise StaleSampleFileError(
+                        f"{path} changed after it was imported into {self.path}; run "
+                        f"'flask migrate-samples --force' to replace the stored samples with it"
+                    )
+                # Touched but unchanged, or imported before hashes were recorded
+                conn.execute(
+                    "UPDATE migrated_signatures SET source_version = ?, source_hash = ? WHERE signature_name = ?",
+                    (json.dumps(version), digest, signature_name)
+                )
+        else:
+            samples = read_json_samples(signature_name)
+            if force and samples is not None:
+                conn.execute("DELETE FROM samples WHERE signature_name = ?", (signature_name,))
+                self._bump(conn, signature_name)
+            if samples:
+                imported = self._insert(conn, signature_name, samples)
+                self._bump(conn, signature_name)
+            conn.execute(
+                "INSERT OR REPLACE INTO migrated_signatures (signature_name, source_version, source_hash) "
+                "VALUES (?, ?, ?)",
+                (signature_name, json.dumps(version), self._file_hash(path))
+            )
+        self._migrated[signature_name] = version
+        return imported
+
+    @staticmethod
+    def _file_hash(path: Path) -> Optional[str]:
+        """Get the SHA-256 of a file, or None if it doesn't exist"""
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            return None
+        return digest.hexdigest()
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, signature_name: str):
+        """Bump the version of a signature within the current transaction"""
+        conn.execute(
+            "INSERT INTO sample_versions (signature_name, version) VALUES (?, 1) "
+            "ON CONFLICT (signature_name) DO UPDATE SET version = version + 1",
+            (signature_name,)
+        )
+
+    def _read(self, signature_name: str) -> sqlite3.Connection:
+        """Get the connection for reading a signature, importing its JSON file first if needed"""
+        conn = self._connect()
+        if self._migrated.get(signature_name) != list(file_version(json_sample_file(signature_name))):
+            self._begin(signature_name)
+            conn.execute("COMMIT")
+        return conn
+
+    def _row_id(self, conn: sqlite3.Connection, signature_name: str, index: int) -> Optional[int]:
+        if index < 0:
+            return None
+        row = conn.execute(
+            "SELECT id FROM samples WHERE signature_name = ? ORDER BY id LIMIT 1 OFFSET ?",
+            (signature_name, index)
+        ).fetchone()
+        return row[0] if row else None
+
+    def list(self, signature_name: str) -> List[Dict]:
+        with self._lock:
+            rows = self._read(signature_name).execute(
+                "SELECT data FROM samples WHERE signature_name = ? ORDER BY id", (signature_name,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get(self, signature_name: str, index: int) -> Optional[Dict]:
+        if index < 0:
+            return None
+        with self._lock:
+            row = self._read(signature_name).execute(
+                "SELECT data FROM samples WHERE signature_name = ? ORDER BY id LIMIT 1 OFFSET ?",
+                (signature_name, index)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def page(self, signature_name: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            rows = self._read(signature_name).execute(
+                "SELECT data FROM samples WHERE signature_name = ? ORDER BY id LIMIT ? OFFSET ?",
+                (signature_name, -1 if limit is None else limit, max(offset, 0))
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, signature_name: str) -> int:
+        with self._lock:
+            return self._read(signature_name).execute(
+                "SELECT COUNT(*) FROM samples WHERE signature_name = ?", (signature_name,)
+            ).fetchone()[0]
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, signature_name: str, samples: Iterable[Dict]) -> int:
+        """Insert samples one at a time within the current transaction, returning the number inserted"""
+        count = 0
+
+        def rows():
+            nonlocal count
+            for sample in samples:
+                count += 1
+                yield signature_name, json.dumps(sample)
+
+        conn.executemany("INSERT INTO samples (signature_name, data) VALUES (?, ?)", rows())
+        return count
+
+    def add(self, signature_name: str, samples: Iterable[Dict]) -> int:
+        with self._lock:
+            conn = self._begin(signature_name)
+            try:
+                added = self._insert(conn, signature_name, samples)
+                self._bump(conn, signature_name)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def update(self, signature_name: str, index: int, sample: Dict) -> bool:
+        with self._lock:
+            conn = self._begin(signature_name)
+            try:
+                row_id = self._row_id(conn, signature_name, index)
+                if row_id is not None:
+                    conn.execute("UPDATE samples SET data = ? WHERE id = ?", (json.dumps(sample), row_id))
+                    self._bump(conn, signature_name)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row_id is not None
+
+    def delete(self, signature_name: str, index: int) -> bool:
+        with self._lock:
+            conn = self._begin(signature_name)
+            try:
+                row_id = self._row_id(conn, signature_name, index)
+                if row_id is not None:
+                    conn.execute("DELETE FROM samples WHERE id = ?", (row_id,))
+                    self._bump(conn, signature_name)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row_id is not None
+
+    def replace(self, signature_name: str, samples: Iterable[Dict]):
+        with self._lock:
+            conn = self._begin(signature_name)
+            try:
+                conn.execute("DELETE FROM samples WHERE signature_name = ?", (signature_name,))
+                self._insert(conn, signature_name, samples)
+                self._bump(conn, signature_name)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    # Rows read at a time when streaming
+    STREAM_BATCH_SIZE = 500
+
+    def stream(self, signature_name: str, offset: int = 0, limit: Optional[int] = None) -> Iterator[Dict]:
+        """Stream the samples of a signature in batches, so only one batch is in memory"""
+        with self._lock:
+            row = self._read(signature_name).execute(
+                "SELECT id FROM samples WHERE signature_name = ? ORDER BY id LIMIT 1 OFFSET ?",
+                (signature_name, max(offset, 0))
+            ).fetchone()
+        if row is None:
+            return
+        last_id = row[0] - 1
+        remaining = limit
+        while remaining is None or remaining > 0:
+            batch = self.STREAM_BATCH_SIZE if remaining is None else min(remaining, self.STREAM_BATCH_SIZE)
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT id, data FROM samples WHERE signature_name = ? AND id > ? ORDER BY id LIMIT ?",
+                    (signature_name, last_id, batch)
+                ).fetchall()
+            for row_id, data in rows:
+                yield json.loads(data)
+            if len(rows) < batch:
+                return
+            last_id = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    @staticmethod
+    def _field_text(field: str) -> str:
+        """SQL expression of a field's text, matching sample_text()
+
+        Uses json_extract() rather than the ->> operator, which needs SQLite 3.38.
+        """
+        if not _FIELD_NAME.match(field):
+            raise ValueError(f"Invalid field name: {field}")
+        path = f"'$.\"{field}\"'"
+        value = f"json_extract(data, {path})"
+        # json_extract() gives strings and numbers as SQL values, and arrays and objects as JSON
+        return (f"CASE json_type(data, {path}) WHEN 'null' THEN NULL WHEN 'true' THEN 'true' "
+                f"WHEN 'false' THEN 'false' ELSE CAST({value} AS TEXT) END")
+
+    def query(self, signature_name: str, filters: Optional[Dict[str, str]] = None,
+              sort: Optional[str] = None, descending: bool = False, cursor: Optional[str] = None,
+              limit: int = 50) -> QueryPage:
+        filters = {field: text for field, text in (filters or {}).items() if text}
+        if not filters and not sort:
+            return self._query_by_index(signature_name, descending, cursor, limit)
+
+        after = decode_cursor(cursor, sort, descending)
+        sort_key = f"COALESCE({self._field_text(sort)}, '')" if sort else "''"
+        conditions = []
+        params = [signature_name]
+        for field, text in filters.items():
+            conditions.append(f"instr(lower({self._field_text(field)}), ?) > 0")
+            params.append(_fold(text))
+        if after is not None:
+            conditions.append(f"(sort_key, idx) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        order = "DESC" if descending else "ASC"
+        sql = f"""
+            SELECT sort_key, idx, data FROM (
+                SELECT ROW_NUMBER() OVER (ORDER BY id) - 1 AS idx, data, {sort_key} AS sort_key
+                FROM samples WHERE signature_name = ?
+            )
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            ORDER BY sort_key {order}, idx {order}
+            LIMIT ?
+        """
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._read(signature_name).execute(sql, params).fetchall()
+        return _page([(key, index, json.loads(data)) for key, index, data in rows], sort, descending, limit)
+
+    def version(self, signature_name: str) -> Optional[Hashable]:
+        with self._lock:
+            row = self._read(signature_name).execute(
+                "SELECT version FROM sample_versions WHERE signature_name = ?", (signature_name,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def migrate(self, signature_name: str, force: bool = False) -> int:
+        """Import a signature's JSON sample file
+
+        Args:
+            signature_name: Name of the signature
+            force: Replace the signature's samples with the file's even if it was imported before
+
+        Returns:
+            int: Number of samples imported
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                imported = self._migrate(conn, signature_name, force=force)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return imported
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def jsonl_sample_file(signature_name: str) -> Path:
+    """Get the JSONL file holding the samples of a signature"""
+    return Config.SAMPLES_DIR / f"{signature_name}_samples.jsonl"
+
+class JSONLSampleStore(SampleStore):
+    """Stores the samples of each signature in samples/<signature>_samples.jsonl, one per line
+
+    A sidecar .idx file holds the byte offset of every line followed by the
+    size of the file, as unsigned 64-bit integers. Samples are read through
+    mmap, so fetching one sample or a page decodes only those lines. The index
+    is rebuilt whenever its last entry doesn't match the size of the file,
+    e.g. after the file was edited by hand. Appends only write the new lines;
+    edits and deletes rewrite the file.
+    """
+
+    partial_reads = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index_file(path: Path) -> Path:
+        return path.with_name(path.name + ".idx")
+
+    @staticmethod
+    def _scan(data) -> array:
+        """Find the offsets of the non-blank lines of a file, followed by its size"""
+        offsets = array("Q")
+        size = len(data)
+        start = 0
+        while start < size:
+            end = data.find(b"\n", start)
+            end = size if end == -1 else end + 1
+            if data[start:end].strip():
+                offsets.append(start)
+            start = end
+        offsets.append(size)
+        return offsets
+
+    def _write_index(self, path: Path, offsets: array):
+        index_file = self._index_file(path)
+        tmp_file = index_file.with_name(f".{index_file.name}.{uuid.uuid4().hex}")
+        with open(tmp_file, "wb") as f:
+            offsets.tofile(f)
+        os.replace(tmp_file, index_file)
+
+    def _offsets(self, path: Path, f) -> array:
+        """Read the index of an open file, rebuilding it if it's missing or stale"""
+        size = os.fstat(f.fileno()).st_size
+        offsets = array("Q")
+        try:
+            with open(self._index_file(path), "rb") as index:
+                offsets.frombytes(index.read())
+        except (FileNotFoundError, ValueError):
+            offsets = array("Q")
+        if offsets and offsets[-1] == size:
+            return offsets
+
+        if size == 0:
+            offsets = array("Q", [0])
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offsets = self._scan(data)
+        self._write_index(path, offsets)
+        return offsets
+
+    def _read_range(self, signature_name: str, offset: int, limit: Optional[int]) -> Iterator[Dict]:
+        """Decode the samples in a range of lines"""
+        path = jsonl_sample_file(signature_name)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            offsets = self._offsets(path, f)
+            count = len(offsets) - 1
+            start = max(offset, 0)
+            stop = count if limit is None else min(count, start + max(limit, 0))
+            if start >= stop:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for i in range(start, stop):
+                    yield json.loads(data[offsets[i]:offsets[i + 1]])
+
+    def stream(self, signature_name: str, offset: int = 0, limit: Optional[int] = None) -> Iterator[Dict]:
+        """Stream the samples of a signature from offset on, at most limit of them
+
+        Files are replaced rather than rewritten in place, so the stream keeps
+        reading the file as it was when the first sample was requested.
+        """
+        return self._read_range(signature_name, offset, limit)
+
+    def list(self, signature_name: str) -> List[Dict]:
+        return self.page(signature_name)
+
+    def page(self, signature_name: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            return list(self._read_range(signature_name, offset, limit))
+
+    def get(self, signature_name: str, index: int) -> Optional[Dict]:
+        if index < 0:
+            return None
+        samples = self.page(signature_name, index, 1)
+        return samples[0] if samples else None
+
+    def count(self, signature_name: str) -> int:
+        path = jsonl_sample_file(signature_name)
+        with self._lock:
+            try:
+                with open(path, "rb") as f:
+                    return len(self._offsets(path, f)) - 1
+            except FileNotFoundError:
+                return 0
+
+    def add(self, signature_name: str, samples: Iterable[Dict]) -> int:
+        lines = [json.dumps(sample).encode() + b"\n" for sample in samples]
+        path = jsonl_sample_file(signature_name)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "ab+") as f:
+                size = f.seek(0, os.SEEK_END)
+                offsets = self._offsets(path, f)
+                if size:
+                    # Don't join the first new line to a last line without a newline
+                    f.seek(size - 1)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                        size += 1
+                offsets.pop()
+                for line in lines:
+                    offsets.append(size)
+                    f.write(line)
+                    size += len(line)
+                offsets.append(size)
+            self._write_index(path, offsets)
+        return len(lines)
+
+    def _rewrite(self, signature_name: str, samples: Iterable[Dict]):
+        """Replace the file and index of a signature, holding the lock"""
+        path = jsonl_sample_file(signature_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        offsets = array("Q")
+        size = 0
+        try:
+            with open(tmp_file, "wb") as f:
+                for sample in samples:
+                    line = json.dumps(sample).encode() + b"\n"
+                    offsets.append(size)
+                    f.write(line)
+                    size += len(line)
+            offsets.append(size)
+            os.replace(tmp_file, path)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+        self._write_index(path, offsets)
+
+    def update(self, signature_name: str, index: int, sample: Dict) -> bool:
+        with self._lock:
+            samples = list(self._read_range(signature_name, 0, None))
+            if not 0 <= index < len(samples):
+                return False
+            samples[index] = sample
+            self._rewrite(signature_name, samples)
+        return True
+
+    def delete(self, signature_name: str, index: int) -> bool:
+        with self._lock:
+            samples = list(self._read_range(signature_name, 0, None))
+            if not 0 <= index < len(samples):
+                return False
+            del samples[index]
+            self._rewrite(signature_name, samples)
+        return True
+
+    def replace(self, signature_name: str, samples: Iterable[Dict]):
+        with self._lock:
+            self._rewrite(signature_name, samples)
+
+    def version(self, signature_name: str) -> Optional[Hashable]:
+        return file_version(jsonl_sample_file(signature_name))
+
+def create_sample_store() -> SampleStore:
+    """Create the sample store selected by Config.SAMPLE_STORE"""
+    if Config.SAMPLE_STORE == "sqlite":
+        return SQLiteSampleStore(Config.DATA_DIR / "samples.sqlite3")
+    if Config.SAMPLE_STORE == "jsonl":
+        return JSONLSampleStore()
+    if Config.SAMPLE_STORE != "json":
+        print(f"Unknown sample store {Config.SAMPLE_STORE}, using json")
+    return JSONSampleStore()
@@ -2,64 +2,360 @@
 Module for managing samples for different signatures
 """
 import json
-import time
-import importlib
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, BinaryIO, Iterator, Optional
 from pathlib import Path
 
 import dspy
 
 from ..models.signature import SignatureDefinition
 from ..config import Config
+from ..utils.dynamic_classes import compile_class, dynamic_classes
+from ..utils.frozen import freeze
+from ..utils.json_stream import iter_json_values
+from .sample_store import (JSONLSampleStore, QueryPage, create_sample_store, json_sample_file,
+                           jsonl_sample_file, query_indexed)
 from .state import AppState
 
+# Samples written to the store at a time when importing
+IMPORT_BATCH_SIZE = 500
+
+# Characters of exported JSON sent at a time
+EXPORT_CHUNK_SIZE = 64 * 1024
+
 class SampleManager:
-    """Handles loading and saving of sample data for different signatures"""
+    """Handles loading and saving of sample data for different signatures
+
+    Loaded samples are cached per signature and checked against the store's
+    version of the signature (file mtime and size, or the SQLite version
+    counter) before reuse. They are returned as read-only lists and dicts
+    shared between callers; changes go through save_samples, add_samples,
+    update_sample and delete_sample. Single samples, pages and counts are
+    served from the cached list, which they load on a miss, unless the store
+    can read them without loading every sample.
+    """
     
     def __init__(self, app_state: AppState = None):
         self.app_state = app_state if app_state else AppState()
         Config.SAMPLES_DIR.mkdir(exist_ok=True)
+        self.store = create_sample_store()
+        self.jsonl_store = self.store if isinstance(self.store, JSONLSampleStore) else JSONLSampleStore()
+        # signature name -> (store, version, frozen samples)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
 
     def get_sample_file_for_signature(self, signature_name: str) -> Path:
-        """Get the sample file path for a specific signature"""
-        return Config.SAMPLES_DIR / f"{signature_name}_samples.json"
+        """Get the JSON sample file of a specific signature, used for imports and the JSON store"""
+        return json_sample_file(signature_name)
+
+    def _signature_name(self, signature_name: Optional[str]) -> Optional[str]:
+        return signature_name or self.app_state.current_signature_name
+
+    def _store(self, signature_name: str):
+        """Get the store of a signature: the JSONL store if it has a JSONL file, else the configured one"""
+        if jsonl_sample_file(signature_name).exists():
+            return self.jsonl_store
+        return self.store
+
+    def _cached(self, sig_name: str, store) -> Optional[List[Dict]]:
+        """Get the cached samples of a signature if they are still current"""
+        version = store.version(sig_name)
+        with self._cache_lock:
+            entry = self._cache.get(sig_name)
+        if entry and version is not None and entry[0] is store and entry[1] == version:
+            return entry[2]
+        return None
+
+    def _listed(self, sig_name: str, store) -> Optional[List[Dict]]:
+        """Get the samples to serve a read of part of a signature from
+        
+        Returns:
+            Optional[List[Dict]]: The cached samples, loaded into the cache if the store
+                                would read them all anyway, or None to read the store
+        """
+        if not store.partial_reads:
+            return self.load_samples(sig_name)
+        return self._cached(sig_name, store)
+
+    def _invalidate(self, sig_name: str):
+        with self._cache_lock:
+            self._cache.pop(sig_name, None)
 
     def load_samples(self, signature_name: Optional[str] = None) -> List[Dict]:
-        """Load samples from JSON file for a specific signature
+        """Load samples for a specific signature
         
         Args:
             signature_name (str, optional): Name of the signature to load samples for.
                                          If None, uses the current signature.
         
         Returns:
-            List[Dict]: List of samples for the signature
+            List[Dict]: Read-only list of samples for the signature
         """
-        sig_name = signature_name or self.app_state.current_signature_name
+        sig_name = self._signature_name(signature_name)
         if not sig_name:
             return []
         
-        sample_file = self.get_sample_file_for_signature(sig_name)
-        try:
-            with open(sample_file, "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return []
+        store = self._store(sig_name)
+        samples = self._cached(sig_name, store)
+        if samples is not None:
+            self.hits += 1
+            return samples
+        
+        self.misses += 1
+        # Take the version before reading, so a change made meanwhile is seen next time
+        version = store.version(sig_name)
+        samples = freeze(store.list(sig_name))
+        if version is not None:
+            with self._cache_lock:
+                self._cache[sig_name] = (store, version, samples)
+        return samples
+
+    def cache_stats(self) -> Dict:
+        """Get hit/miss counters and the number of cached signatures"""
+        with self._cache_lock:
+            entries = len(self._cache)
+        return {"hits": self.hits, "misses": self.misses, "signatures": entries}
 
     def save_samples(self, samples: List[Dict], signature_name: Optional[str] = None) -> None:
-        """Save samples to JSON file for a specific signature
+        """Replace the samples of a specific signature
         
         Args:
             samples (List[Dict]): List of samples to save
             signature_name (str, optional): Name of the signature to save samples for.
                                          If None, uses the current signature.
         """
-        sig_name = signature_name or self.app_state.current_signature_name
+        sig_name = self._signature_name(signature_name)
         if not sig_name:
             return
+        self._store(sig_name).replace(sig_name, samples)
+        self._invalidate(sig_name)
+
+    def add_samples(self, samples: List[Dict], signature_name: Optional[str] = None) -> int:
+        """Append samples to a specific signature
+        
+        Args:
+            samples (List[Dict]): Samples to add
+            signature_name (str, optional): Name of the signature to add samples to.
+                                         If None, uses the current signature.
+        
+        Returns:
+            int: Number of samples added
+        """
+        sig_name = self._signature_name(signature_name)
+        if not sig_name:
+            return 0
+        added = self._store(sig_name).add(sig_name, samples)
+        self._invalidate(sig_name)
+        return added
+
+    def get_sample(self, sample_id: int, signature_name: Optional[str] = None) -> Optional[Dict]:
+        """Get one sample of a specific signature
+        
+        Args:
+            sample_id (int): Index of the sample
+            signature_name (str, optional): Name of the signature. If None, uses the current signature.
+        
+        Returns:
+            Optional[Dict]: The read-only sample, or None if there is no such sample
+        """
+        sig_name = self._signature_name(signature_name)
+        if not sig_name:
+            return None
+        store = self._store(sig_name)
+        samples = self._listed(sig_name, store)
+        if samples is not None:
+            return samples[sample_id] if 0 <= sample_id < len(samples) else None
+        return freeze(store.get(sig_name, sample_id))
+
+    def update_sample(self, sample_id: int, sample: Dict, signature_name: Optional[str] = None) -> bool:
+        """Replace one sample of a specific signature
+        
+        Args:
+            sample_id (int): Index of the sample
+            sample (Dict): The new sample
+            signature_name (str, optional): Name of the signature. If None, uses the current signature.
+        
+        Returns:
+            bool: True if the sample was updated, False if there is no such sample
+        """
+        sig_name = self._signature_name(signature_name)
+        if not sig_name:
+            return False
+        updated = self._store(sig_name).update(sig_name, sample_id, sample)
+        self._invalidate(sig_name)
+        return updated
+
+    def delete_sample(self, sample_id: int, signature_name: Optional[str] = None) -> bool:
+        """Delete one sample of a specific signature
+        
+        Args:
+            sample_id (int): Index of the sample
+            signature_name (str, optional): Name of the signature. If None, uses the current signature.
+        
+        Returns:
+            bool: True if the sample was deleted, False if there is no such sample
+        """
+        sig_name = self._signature_name(signature_name)
+        if not sig_name:
+            return False
+        deleted = self._store(sig_name).delete(sig_name, sample_id)
+        self._invalidate(sig_name)
+        return deleted
+
+    def iter_samples(self, signature_name: Optional[str] = None, offset: int = 0,
+                     limit: Optional[int] = None) -> Iterator[Dict]:
+        """Stream the samples of a specific signature, without loading the others
+        
+        Args:
+            signature_name (str, optional): Name of the signature. If None, uses the current signature.
+            offset (int): Index of the first sample
+            limit (int, optional): Maximum number of samples
         
-        sample_file = self.get_sample_file_for_signature(sig_name)
-        with open(sample_file, "w") as f:
-            json.dump(samples, f, indent=2)
+        Returns:
+            Iterator[Dict]: The read-only samples, in order
+        """
+        sig_name = self._signature_name(signature_name)
+        if not sig_name:
+            return iter(())
+        store = self._store(sig_name)
+        samples = self._listed(sig_name, store)
+        if samples is not None:
+            start = max(offset, 0)
+            return iter(samples[start:] if limit is None else samples[start:start + limit])
+        return (freeze(sample) for sample in store.stream(sig_name, offset, limit))
+
+    def query_samples(self, signature_name: Optional[str] = None, filters: Optional[Dict[str, str]] = None,
+                      sort: Optional[str] = None, descending: bool = False, cursor: Optional[str] = None,
+                      limit: int = 50) -> QueryPage:
+        """Get a page of the samples of a specific signature, filtered and sorted
+        
+        Args:
+            signature_name (str, optional): Name of the signature. If None, uses the current signature.
+            filters (Dict[str, str], optional): Field name -> text the field must contain
+            sort (str, optional): Field to sort by. If None, samples stay in order.
+            descending (bool): Sort in descending order
+            cursor (str, optional): Cursor returned with the previous page
+            limit (int): Maximum number of samples in the page
+        
+        Returns:
+            QueryPage: (sample ID, read-only sample) pairs, and the cursor of the next page or None
+        
+        Raises:
+            ValueError: If the cursor or a field name is invalid
+        """
+        sig_name = self._signature_name(signature_name)
+        if not sig_name:
+            return [], None
+        store = self._store(sig_name)
+        samples = self._listed(sig_name, store)
+        if samples is not None:
+            return query_indexed(enumerate(samples), filters, sort, descending, cursor, limit)
+        page, next_cursor = store.query(sig_name, filters, sort, descending, cursor, limit)
+        return [(index, freeze(sample)) for index, sample in page], next_cursor
+
+    def count_samples(self, signature_name: Optional[str] = None) -> int:
+        """Get the number of samples of a specific signature"""
+        sig_name = self._signature_name(signature_name)
+        if not sig_name:
+            return 0
+        store = self._store(sig_name)
+        samples = self._listed(sig_name, store)
+        if samples is not None:
+            return len(samples)
+        return store.count(sig_name)
+
+    def stream_import(self, stream: BinaryIO, signature_name: str, replace: bool = False,
+                      batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[Dict]:
+        """Import samples from a JSON array or JSONL file, reporting progress as it goes
+        
+        The file is read twice: first to check it, so that a malformed file changes
+        nothing, then to stage its valid samples in batches. The staged samples are
+        written as one change once the whole file has been read, so an import that
+        fails or is abandoned partway leaves the existing samples untouched.
+        
+        Args:
+            stream (BinaryIO): Seekable binary file of the samples
+            signature_name (str): Name of the signature to import samples for
+            replace (bool): Replace the existing samples instead of appending to them
+            batch_size (int): Samples read at a time
+        
+        Yields:
+            Dict: A "start" record with the numbers of valid and invalid samples, a
+                "progress" record after each batch, then a "done" or "error" record
+        """
+        def is_valid(sample) -> bool:
+            return isinstance(sample, dict) and self.validate_sample(sample, signature_name)
+        
+        try:
+            start = stream.tell()
+            total = invalid = 0
+            for sample in iter_json_values(stream):
+                if is_valid(sample):
+                    total += 1
+                else:
+                    invalid += 1
+            if not total:
+                yield {"type": "error", "message": "No valid samples found in the import file."}
+                return
+            existing = 0 if replace else self.count_samples(signature_name)
+            yield {"type": "start", "total": total, "invalid": invalid, "existing": existing, "replace": replace}
+            
+            stream.seek(start)
+            imported = 0
+            batch = []
+            try:
+                with self._store(signature_name).bulk_import(signature_name, replace=replace) as stage:
+                    for sample in iter_json_values(stream):
+                        if not is_valid(sample):
+                            continue
+                        batch.append(sample)
+                        if len(batch) == batch_size:
+                            stage(batch)
+                            imported += len(batch)
+                            batch = []
+                            yield {"type": "progress", "imported": imported, "total": total}
+                    if batch:
+                        stage(batch)
+                        imported += len(batch)
+                        yield {"type": "progress", "imported": imported, "total": total}
+            finally:
+                self._invalidate(signature_name)
+            
+            yield {"type": "done", "imported": imported, "invalid": invalid, "existing": existing,
+                   "replace": replace}
+        except Exception as e:
+            yield {"type": "error", "message": str(e)}
+
+    def stream_export(self, signature_name: str, export_format: str = "json") -> Iterator[str]:
+        """Serialize the samples of a signature a chunk at a time
+        
+        Args:
+            signature_name (str): Name of the signature to export
+            export_format (str): "json" for a JSON array, or "jsonl" for a sample per line
+        
+        Yields:
+            str: Consecutive chunks of the file
+        """
+        jsonl = export_format == "jsonl"
+        parts = [] if jsonl else ["["]
+        size = 0
+        for i, sample in enumerate(self.iter_samples(signature_name)):
+            if jsonl:
+                part = json.dumps(sample) + "\n"
+            else:
+                part = ("\n" if i == 0 else ",\n") + json.dumps(sample)
+            parts.append(part)
+            size += len(part)
+            if size >= EXPORT_CHUNK_SIZE:
+                yield "".join(parts)
+                parts = []
+                size = 0
+        if not jsonl:
+            parts.append("\n]\n")
+        if parts:
+            yield "".join(parts)
 
     def validate_sample(self, sample: Dict, signature_name: Optional[str] = None) -> bool:
         """Validate sample structure for a specific signature
@@ -130,12 +426,30 @@ class SampleManager:
         Returns:
             type: A dynamic dspy.Signature class for generating samples
         """
-        # Create a dynamic module for the generator
-        module_name = f"dynamic_generator_{int(time.time())}"
-        spec = importlib.util.spec_from_loader(module_name, loader=None)
-        module = importlib.util.module_from_spec(spec)
-        module.dspy = dspy
+        # Fields holding lists in the evaluation result are typed as lists,
+        # so the generated class depends on them as well as on the signature
+        list_fields = tuple(
+            [field for field in signature.input_fields
+             if isinstance(eval_result.get(f"input_{field}", ""), list)] +
+            [field for field in signature.output_fields
+             if isinstance(eval_result.get(f"expected_{field}", ""), list)]
+        )
+        return dynamic_classes.get(
+            "sample_generator", signature,
+            lambda: self._compile_sample_generator(signature, eval_result),
+            variant=list_fields
+        )
+    
+    def _compile_sample_generator(self, signature: SignatureDefinition, eval_result: Dict) -> type:
+        """Build and compile the sample generator class for a signature
         
+        Args:
+            signature (SignatureDefinition): The signature to create a generator for
+            eval_result (Dict): The evaluation result to base field types on
+            
+        Returns:
+            type: A dynamic dspy.Signature class for generating samples
+        """
         # Build class definition with dynamic fields based on signature
         class_def = f"""class {signature.name}SampleGenerator(dspy.Signature):
     \"\"\"
@@ -190,12 +504,8 @@ class SampleManager:
             
             class_def += f"    {field}: {type_annotation} = dspy.OutputField(desc=\"New {field} output appropriate for the new input\")\n"
         
-        # Execute the class definition in the module's context
-        exec(class_def, module.__dict__)
-        
-        # Get the class from the module
-        generator_class = getattr(module, f"{signature.name}SampleGenerator")
-        return generator_class
+        return compile_class(class_def, f"{signature.name}SampleGenerator",
+                             f"dynamic_generator_{signature.fingerprint[:12]}")
         
     def generate_new_sample_from_evaluation(self, eval_result: Dict, model_name: str, program_instructions: str = "", signature_name: Optional[str] = None) -> Dict:
         """Generate a new sample using LLM based on evaluation results
@@ -2,14 +2,16 @@
 Module for managing application state
 """
 import threading
-import os
 import json
-import time
 from typing import Dict, List, Optional
 
 from ..models.signature import SignatureDefinition
 from ..models.model import ModelDefinition
 from ..config import Config
+from ..utils.lm_client import configure_chain_workers
+from ..utils.lm_pool import lm_pool
+from ..utils.rate_limit import provider_rate_limits, rate_limiters
+from .catalog import ProgramCatalog
 
 class AppState:
     """Singleton class for managing application state"""
@@ -32,15 +34,22 @@ class AppState:
         # Available models as ModelDefinition objects
         self.models = {}
         self._load_default_models()
+        self._configure_rate_limits(self.models, strict=False)
         
         # Signature management
         self.signatures = {}
         self.current_signature_name = None
+        self._signature_index = {}  # frozenset of field names -> signature names
+        self._signature_matches = {}
+        self._indexed_signatures = None
+        self._indexed_count = 0
         self._load_default_signatures()
+        self.rebuild_signature_index()
         
         # Program management
         self.programs = {}  # Dictionary of program_id -> metadata
         self.current_program_id = None
+        self.catalog = ProgramCatalog(Config.DATA_DIR / "catalog.sqlite3")
         self._ensure_directories()
         self.load_available_programs()
         
@@ -121,6 +130,26 @@ class AppState:
                 except Exception as e:
                     print(f"Error loading model from {filepath}: {e}")
                     
+    def _configure_rate_limits(self, models: Dict[str, ModelDefinition], strict: bool = True) -> bool:
+        """Set up the provider rate limiters and the hedging pool from a set of model definitions
+
+        Args:
+            models: Model definitions by full name
+            strict: Whether to refuse models of a provider that set different limits;
+                if False the lowest value is used
+
+        Returns:
+            bool: True if the limits were applied
+        """
+        try:
+            limits = provider_rate_limits(models.values(), strict=strict)
+        except ValueError as e:
+            print(f"Error configuring rate limits: {e}")
+            return False
+        rate_limiters.load(limits)
+        configure_chain_workers(models.values())
+        return True
+    
     @property
     def AVAILABLE_MODELS(self) -> List[str]:
         """Get list of available model names"""
@@ -132,6 +161,7 @@ class AppState:
         Config.SAMPLES_DIR.mkdir(exist_ok=True)
         Config.SIGNATURES_DIR.mkdir(exist_ok=True)
         Config.MODELS_DIR.mkdir(exist_ok=True)
+        Config.EVALUATIONS_DIR.mkdir(parents=True, exist_ok=True)
     
     def _load_default_signatures(self):
         """Load default signatures if none exist"""
@@ -225,6 +255,8 @@ class AppState:
         """Add a new model definition"""
         if model.full_name in self.models:
             return False
+        if not self._configure_rate_limits({**self.models, model.full_name: model}):
+            return False
         
         self.models[model.full_name] = model
         self._save_model(model)
@@ -234,9 +266,13 @@ class AppState:
         """Update an existing model"""
         if model.full_name not in self.models:
             return False
+        if not self._configure_rate_limits({**self.models, model.full_name: model}):
+            return False
             
         self.models[model.full_name] = model
         self._save_model(model)
+        # Clients set up from the old parameters must not be reused
+        lm_pool.invalidate(model.full_name)
         return True
         
     def delete_model(self, model_name: str) -> bool:
@@ -253,6 +289,8 @@ class AppState:
                 
             # Remove from models dictionary
             del self.models[model_name]
+            lm_pool.invalidate(model_name)
+            self._configure_rate_limits(self.models, strict=False)
             
             # Reset current model if needed
             if self.current_model == model_name:
@@ -290,8 +328,66 @@ class AppState:
         
         self.signatures[signature.name] = signature
         self._save_signature(signature)
+        self.rebuild_signature_index()
+        return True
+    
+    def update_signature(self, signature: SignatureDefinition) -> bool:
+        """Update an existing signature"""
+        from ..utils.dynamic_classes import dynamic_classes
+        
+        if signature.name not in self.signatures:
+            return False
+        
+        self.signatures[signature.name] = signature
+        self._save_signature(signature)
+        self.rebuild_signature_index()
+        # Drop classes compiled from the previous version of the signature
+        dynamic_classes.invalidate(signature.name)
         return True
     
+    def rebuild_signature_index(self):
+        """Rebuild the index used to find a signature by its field names"""
+        index = {}
+        for name, signature in self.signatures.items():
+            fields = frozenset(signature.input_fields + signature.output_fields)
+            index.setdefault(fields, []).append(name)
+        self._signature_index = index
+        self._signature_matches = {}  # frozenset of example fields -> names of the best matches
+        self._indexed_signatures = self.signatures
+        self._indexed_count = len(self.signatures)
+    
+    def find_signature_for_fields(self, fields) -> Optional[SignatureDefinition]:
+        """Find the most specific signature whose input and output fields are all among the given fields
+        
+        Examples may carry extra keys, so a signature matches when each of its fields
+        is present; of several matches, the one with the most fields wins.
+        
+        Args:
+            fields: Field names, e.g. the keys of an example
+            
+        Returns:
+            Optional[SignatureDefinition]: The matching signature, preferring the current
+                                           signature among equally specific ones, or None
+        """
+        # Signatures added directly to the dictionary are picked up here
+        if self._indexed_signatures is not self.signatures or self._indexed_count != len(self.signatures):
+            self.rebuild_signature_index()
+        
+        fields = frozenset(fields)
+        names = self._signature_matches.get(fields)
+        if names is None:
+            best = None
+            for field_set in self._signature_index:
+                if field_set <= fields and (best is None or len(field_set) > len(best)):
+                    best = field_set
+            names = self._signature_index[best] if best is not None else []
+            self._signature_matches[fields] = names
+        if not names:
+            return None
+        if self.current_signature_name in names:
+            return self.signatures.get(self.current_signature_name)
+        return self.signatures.get(names[0])
+    
     def get_signature(self, name: str) -> Optional[SignatureDefinition]:
         """Get a signature definition by name"""
         return self.signatures.get(name)
@@ -310,54 +406,71 @@ class AppState:
         return None
     
     def load_available_programs(self):
-        """Load metadata for all available programs"""
-        programs_dir = Config.PROGRAM_DIR
-        self.programs = {}
-        
-        # Find all program directories
-        if programs_dir.exists():
-            for program_id in os.listdir(programs_dir):
-                program_path = programs_dir / program_id
-                if program_path.is_dir():
-                    metadata_path = program_path / "metadata.json"
-                    if metadata_path.exists():
-                        try:
-                            with open(metadata_path, "r") as f:
-                                metadata = json.load(f)
-                            # Add creation time from file if not in metadata
-                            if "created_at" not in metadata:
-                                metadata["created_at"] = os.path.getctime(metadata_path)
-                            # Add program ID to metadata
-                            metadata["id"] = program_id
-                            # Add to programs dictionary
-                            self.programs[program_id] = metadata
-                        except Exception as e:
-                            print(f"Error loading program {program_id}: {e}")
+        """Load metadata for all available programs
+        
+        The catalog only reads metadata files that are new or changed since they
+        were indexed, so this stays cheap with many programs.
+        """
+        self.catalog.sync(Config.PROGRAM_DIR)
+        self.refresh_programs()
         
         # Set current program to the most recent if none is selected
         if not self.current_program_id and self.programs:
-            # Sort by creation time (newest first)
-            sorted_programs = sorted(self.programs.items(), 
-                                    key=lambda x: x[1].get("created_at", 0), 
-                                    reverse=True)
-            self.current_program_id = sorted_programs[0][0]
+            self.current_program_id = next(iter(self.programs))
+    
+    def refresh_programs(self):
+        """Reload the program metadata from the catalog, newest first
+        
+        Picks up programs registered or deleted by other processes sharing the catalog.
+        """
+        self.programs = {metadata["id"]: metadata for metadata in self.catalog.list()}
+    
+    def _has_program(self, program_id: str) -> bool:
+        """Check whether a program exists, refreshing from the catalog if it isn't known here"""
+        if program_id not in self.programs:
+            self.refresh_programs()
+        return program_id in self.programs
+    
+    def register_program(self, program_id: str) -> Optional[Dict]:
+        """Add a newly saved or updated program to the catalog
+        
+        Args:
+            program_id (str): The ID of the program
+            
+        Returns:
+            Optional[Dict]: The program's metadata, or None if it could not be read
+        """
+        metadata = self.catalog.add(Config.PROGRAM_DIR / program_id)
+        if metadata is not None:
+            if program_id in self.programs:
+                self.programs[program_id] = metadata
+            else:
+                # Keep the newest-first order of the catalog
+                self.programs = {program_id: metadata, **self.programs}
+        return metadata
     
     def set_current_program(self, program_id):
         """Set the current program"""
-        if program_id in self.programs:
+        if self._has_program(program_id):
             self.current_program_id = program_id
             return True
         return False
     
-    def get_programs_for_signature(self, signature_name: str) -> Dict:
-        """Get all programs for a specific signature
+    def get_programs_for_signature(self, signature_name: str, offset: int = 0,
+                                   limit: Optional[int] = None) -> Dict:
+        """Get all programs for a specific signature, newest first
         
         This will only return programs that are compatible with the given signature.
         Programs are only compatible if they were created with exactly the same signature.
+        
+        Args:
+            signature_name (str): Name of the signature
+            offset (int): Number of programs to skip
+            limit (int, optional): Maximum number of programs to return
         """
         return {
-            program_id: metadata for program_id, metadata in self.programs.items()
-            if metadata.get("signature_name") == signature_name
+            metadata["id"]: metadata
+            for metadata in self.catalog.list(signature_name=signature_name, offset=offset, limit=limit)
         }
         
     def create_new_program(self, model_name: str, base_program_id: str = None, signature_name: str = None):
@@ -372,7 +485,7 @@ class AppState:
             str: The ID of the created program
         """
         import dspy
-        import importlib.util
+        from ..utils.dynamic_classes import compile_class, dynamic_classes
         from ..utils.program_utils import save_program
         
         # Use provided signature name or current signature
@@ -382,17 +495,12 @@ class AppState:
         
         signature_def = self.signatures[sig_name]
         
-        # Create a module to execute the signature class definition
-        module_name = f"dynamic_signature_{int(time.time())}"
-        spec = importlib.util.spec_from_loader(module_name, loader=None)
-        module = importlib.util.module_from_spec(spec)
-        module.dspy = dspy
-        
-        # Execute the signature class definition in the module's context
-        exec(signature_def.signature_class_def, module.__dict__)
-        
-        # Get the class from the module
-        signature_class = getattr(module, sig_name)
+        # Compile the signature class definition once per signature version
+        signature_class = dynamic_classes.get(
+            "signature", signature_def,
+            lambda: compile_class(signature_def.signature_class_def, sig_name,
+                                  f"dynamic_signature_{signature_def.fingerprint[:12]}")
+        )
         
         # Create a new task using the signature
         task = dspy.ChainOfThought(signature_class)
@@ -408,7 +516,7 @@ class AppState:
         
         # Update current program in app state
         self.current_program_id = program_id
-        self.load_available_programs()  # Refresh program list
+        self.register_program(program_id)
         
         return program_id
     
@@ -423,7 +531,7 @@ class AppState:
         """
         import shutil
         
-        if program_id not in self.programs:
+        if not self._has_program(program_id):
             return False
         
         program_dir = Config.PROGRAM_DIR / program_id
@@ -434,14 +542,16 @@ class AppState:
             # Delete the program directory
             shutil.rmtree(program_dir)
             
-            # Update the current program if needed
+            from .program_cache import program_cache
+            program_cache.invalidate(program_id)
+            
+            self.catalog.remove(program_id)
+            self.programs.pop(program_id, None)
+            
+            # Switch to the newest remaining program if needed
             if self.current_program_id == program_id:
-                # Find another program to set as current
-                self.current_program_id = None
-                self.load_available_programs()
-            else:
-                # Just remove from the programs dictionary
-                del self.programs[program_id]
+                newest = self.catalog.list(limit=1)
+                self.current_program_id = newest[0]["id"] if newest else None
                 
             return True
         except Exception as e:
@@ -1,7 +1,7 @@
 # Utils package
 from .cleanpln import cleanAndScore  # noqa: F401
-import dspy
 from app.config import Config
+from .lm_pool import lm_pool
 
 def get_lm(model_name=None, **kwargs):
     """Get LM with required parameters for specific models.
@@ -11,7 +11,8 @@ def get_lm(model_name=None, **kwargs):
         **kwargs: Additional parameters to pass to dspy.LM
         
     Returns:
-        Configured dspy.LM instance
+        Configured dspy.LM instance, shared with other callers using the
+        same model and parameters
     """
     from app.services.state import AppState
     
@@ -23,21 +24,22 @@ def get_lm(model_name=None, **kwargs):
     
     # Default parameters
     params = {}
+    fallbacks = []
+    hedge_delay = None
     
     # If model definition exists, use its parameters
     if model_def:
-        params.update(model_def.parameters)
+        params.update(model_def.lm_parameters)
+        fallbacks = model_def.fallbacks
+        hedge_delay = model_def.hedge_delay
     # Fallback to hardcoded parameters for specific models
     elif selected_model_name and "o3-mini" in selected_model_name:
         params.update({
             "temperature": 1.0,
             "max_tokens": 5000
         })
-
-    print(f"Using model: {selected_model_name}")
-    print(f"Parameters: {params}")
     
     # Allow override of defaults through kwargs
     params.update(kwargs)
     
-    return dspy.LM(selected_model_name or Config.DEFAULT_MODEL, **params)
+    return lm_pool.get(selected_model_name or Config.DEFAULT_MODEL, params, fallbacks, hedge_delay)
@@ -0,0 +1,151 @@
+"""
+Persistent key/value caches stored under the data directory
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a stable hash key from JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """SQLite-backed cache of JSON values, evicting least recently used entries by size
+
+    The database is safe to share between threads and processes. Entries are
+    evicted once the total size of the stored values exceeds max_size_bytes.
+    """
+
+    # Evict down to this fraction of the maximum size so eviction runs rarely
+    LOW_WATER_MARK = 0.9
+
+    def __init__(self, path: Path, max_size_bytes: int):
+        """
+        Initialize a disk cache
+
+        Args:
+            path: Path of the SQLite database file
+            max_size_bytes: Maximum total size of the cached values
+        """
+        self.path = Path(path)
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            conn.commit()
+            self._conn = conn
+            self._size = self._total_size()
+        return self._conn
+
+    def _total_size(self) -> int:
+        """Get the exact total size of the stored values"""
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value, or None if the key is not cached"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        """Store a value, evicting old entries if the cache is full"""
+        data = json.dumps(value, default=str)
+        size = len(data.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time())
+            )
+            conn.commit()
+            self._size += size
+            if self._size > self.max_size_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is below its low water mark"""
+        conn = self._conn
+        # Other processes may have written to the cache, so start from the exact size
+        self._size = self._total_size()
+        target = self.max_size_bytes * self.LOW_WATER_MARK
+        if self._size <= self.max_size_bytes:
+            return
+        cursor = conn.execute("SELECT key, size FROM entries ORDER BY accessed_at")
+        evicted = []
+        for key, size in cursor:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        conn.commit()
+
+    def delete(self, key: str):
+        """Remove a key from the cache"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.commit()
+            self._size = self._total_size()
+
+    def clear(self):
+        """Remove all entries and reset the counters"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        """Get hit/miss counters and the current size of the cache"""
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "size_bytes": self._total_size(),
+                "max_size_bytes": self.max_size_bytes
+            }
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,6 +1,18 @@
-from typing import Tuple
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Union
 
+from ..config import Config
 from .metta.metta_handler import MeTTaHandler
+from .metta.pool import MeTTaPool
+
+def _create_metta_handler() -> MeTTaHandler:
+    return MeTTaHandler('tmp.json', read_only=True)
+
+# Interpreters are expensive to boot, so checkStmt reuses them
+metta_pool = MeTTaPool(_create_metta_handler, Config.METTA_POOL_SIZE)
 
 def balance_parentheses(expr: str) -> Tuple[str,float]:
     score = 1.0
@@ -35,14 +47,110 @@ def balance_parentheses(expr: str) -> Tuple[str,float]:
         return expr[:-excess] , score - 0.4
     return expr , score
 
-def checkStmt(expr: str) -> float:
-    metta = MeTTaHandler('tmp.json',read_only=True)
+# Shape every PLN statement must have: (: $prf (WithTV $stmt (STV $s $c)))
+STMT_PATTERN = (":", "$prf", ("WithTV", "$stmt", ("STV", "$s", "$c")))
+
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|;[^\n]*|[()]|[^\s()";]+|\S')
+
+SExpr = Union[str, List["SExpr"]]
+
+def parse_sexpr(expr: str) -> Optional[List[SExpr]]:
+    """Parse text into its top-level s-expressions
+    
+    Symbols and strings are kept as strings and expressions become lists.
+    Returns None for text this parser does not handle like MeTTa does:
+    unbalanced parentheses, comments, unterminated or glued strings and
+    grounded tokens such as &kb or !.
+    """
+    stack = [[]]
+    last_end = -1
+    last_token = None
+    for match in _TOKEN_RE.finditer(expr):
+        token = match.group()
+        glued = match.start() == last_end and last_token not in ("(", ")") and token not in ("(", ")")
+        last_end, last_token = match.end(), token
+        if glued or token[0] == ";" or token == '"':
+            return None
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            if len(stack) == 1:
+                return None
+            node = stack.pop()
+            stack[-1].append(node)
+        elif (token[0] in "&!" and token != "&") or token == "$":
+            return None
+        else:
+            stack[-1].append(token)
+    if len(stack) != 1:
+        return None
+    return stack[0]
+
+def _variables(node: SExpr) -> List[str]:
+    if isinstance(node, str):
+        return [node] if node.startswith("$") else []
+    return [var for child in node for var in _variables(child)]
+
+def _matches(node: SExpr, pattern, constrained: List[str]) -> bool:
+    """Structurally unify a parsed atom with a pattern whose variables are all distinct
+    
+    Variables of the atom that stand in for a non-variable part of the pattern
+    are appended to constrained.
+    """
+    if isinstance(pattern, str) and pattern.startswith("$"):
+        return True
+    if isinstance(node, str) and node.startswith("$"):
+        constrained.append(node)
+        return True
+    if isinstance(pattern, str):
+        return node == pattern
+    if isinstance(node, str) or len(node) != len(pattern):
+        return False
+    return all(_matches(child, sub, constrained) for child, sub in zip(node, pattern))
+
+def match_stmt_shape(expr: str) -> Optional[float]:
+    """Score a statement's shape without a MeTTa interpreter
+    
+    Args:
+        expr: The PLN statement
+        
+    Returns:
+        Optional[float]: 1.0 if the statement unifies with STMT_PATTERN, 0.1 if it
+                         does not, or None if it has to be decided by MeTTa
+    """
+    atoms = parse_sexpr(expr)
+    # checkStmt splices the text into a unify call, so anything but exactly one
+    # atom changes the call itself
+    if atoms is None or len(atoms) != 1:
+        return None
+    variables = _variables(atoms[0])
+    # These would be the same variables as the ones in the MeTTa pattern
+    if any(var.startswith("$123") for var in variables):
+        return None
+    constrained = []
+    if not _matches(atoms[0], STMT_PATTERN, constrained):
+        return 0.1
+    # A variable bound by the pattern that also occurs elsewhere may make the
+    # bindings conflict, which only full unification can tell
+    if any(variables.count(var) > 1 for var in constrained):
+        return None
+    return 1.0
+
+def check_stmt_metta(expr: str) -> float:
+    """Score a statement's shape by unifying it in a MeTTa interpreter"""
     try:
-        res = metta.run_clean(f"!(unify {expr} (: $123prf (WithTV $123stmt (STV $123s $123c))) 1.0 0.1)")
+        with metta_pool.interpreter() as metta:
+            res = metta.run_clean(f"!(unify {expr} (: $123prf (WithTV $123stmt (STV $123s $123c))) 1.0 0.1)")
         return float(res[0])
     except:
      return 0.0
 
+def checkStmt(expr: str) -> float:
+    score = match_stmt_shape(expr)
+    if score is None:
+        score = check_stmt_metta(expr)
+    return score
+
 def cleanPLN(expr: str) -> str:
     expr , _ = balance_parentheses(expr)
     return expr
@@ -53,5 +161,78 @@ def cleanAndScore(expr: str) -> Tuple[str,float]:
     s2 = checkStmt(expr)
     return expr , min(s1,s2)
 
+# Worker processes for clean_and_score_batch, started on first use
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def _init_clean_worker():
+    """Boot the worker's MeTTa interpreter before it receives any statements"""
+    metta_pool.warm(1)
+
+def get_clean_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the process pool used for cleaning, or None if cleaning runs in-process"""
+    global _process_pool
+    if Config.PLN_CLEAN_PROCESSES <= 1:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=Config.PLN_CLEAN_PROCESSES,
+                # Forking a process with running threads is unsafe
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_clean_worker
+            )
+        return _process_pool
+
+def shutdown_clean_process_pool():
+    """Stop the cleaning worker processes"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(cancel_futures=True)
+            _process_pool = None
+
+def clean_and_score_batch(exprs: List[str]) -> List[Tuple[str, float]]:
+    """Clean and score many statements, spreading the MeTTa checks over worker processes
+    
+    Statements the Python fast path can decide are scored in-process. The
+    rest go to the process pool when there are at least PLN_CLEAN_MIN_BATCH
+    of them, since each one costs far more than sending it to a worker.
+    
+    Args:
+        exprs: The statements to clean
+        
+    Returns:
+        List[Tuple[str, float]]: (cleaned statement, score) for each statement, in input order
+    """
+    results = [None] * len(exprs)
+    pending = []
+    for i, expr in enumerate(exprs):
+        cleaned, s1 = balance_parentheses(expr)
+        s2 = match_stmt_shape(cleaned)
+        if s2 is None:
+            pending.append(i)
+        else:
+            results[i] = (cleaned, min(s1, s2))
+    if not pending:
+        return results
+    
+    pending_exprs = [exprs[i] for i in pending]
+    pool = get_clean_process_pool() if len(pending) >= Config.PLN_CLEAN_MIN_BATCH else None
+    scored = None
+    if pool is not None:
+        try:
+            chunksize = max(1, len(pending_exprs) // (Config.PLN_CLEAN_PROCESSES * 4))
+            scored = list(pool.map(cleanAndScore, pending_exprs, chunksize=chunksize))
+        except Exception as e:
+            print(f"PLN cleaning workers failed, cleaning in-process: {e}")
+            shutdown_clean_process_pool()
+    if scored is None:
+        scored = [cleanAndScore(expr) for expr in pending_exprs]
+    
+    for i, result in zip(pending, scored):
+        results[i] = result
+    return results
+
 if __name__ == "__main__":
     print(cleanAndScore("(: $prf (WithTV (Dog max) (STV 1.0 1.0)))"))
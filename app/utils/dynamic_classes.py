@@ -0,0 +1,79 @@
+"""
+Registry of classes and predictors compiled from signature definitions
+"""
+import importlib.util
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import dspy
+
+def compile_class(class_def: str, class_name: str, module_name: str) -> type:
+    """Execute a class definition in a fresh module and return the class
+
+    Args:
+        class_def: Source code of the class definition
+        class_name: Name of the class defined by class_def
+        module_name: Name of the module to execute the definition in
+
+    Returns:
+        type: The compiled class
+    """
+    spec = importlib.util.spec_from_loader(module_name, loader=None)
+    module = importlib.util.module_from_spec(spec)
+    module.dspy = dspy
+
+    # Execute the class definition in the module's context
+    exec(class_def, module.__dict__)
+
+    return getattr(module, class_name)
+
+class DynamicClassRegistry:
+    """Thread-safe cache of objects built from signature definitions
+
+    Entries are keyed by kind, signature name and signature fingerprint, so an
+    edited signature never reuses the objects built for its previous version.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, signature, factory: Callable[[], Any], variant: Hashable = ()) -> Any:
+        """Get the cached object for a signature, building it on first use
+
+        Args:
+            kind: Kind of object, e.g. "judge" or "signature"
+            signature: SignatureDefinition the object is built from
+            factory: Function that builds the object
+            variant: Extra key for objects that depend on more than the signature
+
+        Returns:
+            Any: The cached object
+        """
+        key = (kind, signature.name, signature.fingerprint, variant)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+
+        # Build outside the lock; if two threads race, the first one stored wins
+        value = factory()
+        with self._lock:
+            return self._entries.setdefault(key, value)
+
+    def invalidate(self, signature_name: Optional[str] = None):
+        """Drop the cached objects of a signature, or of all signatures if no name is given"""
+        with self._lock:
+            if signature_name is None:
+                self._entries.clear()
+            else:
+                self._entries = {
+                    key: value for key, value in self._entries.items()
+                    if key[1] != signature_name
+                }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+# Shared by the judge, the sample generator and program creation
+dynamic_classes = DynamicClassRegistry()
@@ -0,0 +1,40 @@
+"""
+Read-only lists and dicts for sharing cached data between callers
+"""
+from typing import Any
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is read-only; copy it to make changes")
+
+class FrozenList(list):
+    """list that can't be changed in place
+
+    It is still a list, so it serializes to JSON and renders like one. Copies
+    made with list(), copy or pickle are ordinary, mutable lists.
+    """
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+class FrozenDict(dict):
+    """dict that can't be changed in place
+
+    Copies made with dict(), copy or pickle are ordinary, mutable dicts.
+    """
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    pop = popitem = clear = update = setdefault = _read_only
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+def freeze(value: Any) -> Any:
+    """Make a read-only copy of JSON-like data, freezing nested lists and dicts"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
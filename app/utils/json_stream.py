@@ -0,0 +1,166 @@
+"""
+Incremental parsing of large JSON and JSONL files
+"""
+import codecs
+import json
+import re
+from typing import Any, BinaryIO, Iterator
+
+# Bytes read from the file at a time
+CHUNK_SIZE = 64 * 1024
+
+# Largest value accepted, so an invalid file isn't read into memory looking for its end
+MAX_VALUE_SIZE = 16 * 1024 * 1024
+
+_WHITESPACE = " \t\r\n"
+
+# Characters that matter when finding the end of a value: outside strings, inside them,
+# and after a number or literal
+_CONTAINER_TOKEN = re.compile(r'[\[\]{}"]')
+_STRING_TOKEN = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[\s,\]}]')
+
+def iter_json_values(stream: BinaryIO, chunk_size: int = CHUNK_SIZE,
+                     max_value_size: int = MAX_VALUE_SIZE) -> Iterator[Any]:
+    """Parse the values of a JSON array, or of a JSONL file, without reading the whole file
+
+    The format is told by the first character: "[" starts a JSON array, anything
+    else is read as one JSON value per line. Only the value being parsed and one
+    chunk are held in memory.
+
+    Args:
+        stream: Binary file of UTF-8 text
+        chunk_size: Bytes read at a time
+        max_value_size: Largest value accepted, in characters
+
+    Yields:
+        Any: The values, in order
+
+    Raises:
+        ValueError: If the file isn't a valid JSON array or JSONL file
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        """Read the next chunk into the buffer, dropping what has been parsed"""
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+        return True
+
+    def skip_whitespace() -> bool:
+        """Move past whitespace, returning False at the end of the file"""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return True
+            if not fill():
+                return False
+
+    def find_value_end() -> int:
+        """Find where the value at pos ends, reading more chunks as needed
+
+        Brackets and strings are tracked as the value is scanned, so each
+        character is looked at once however many chunks the value spans. At
+        the end of the file, the end of the buffer is returned.
+
+        Raises:
+            ValueError: If the value is longer than max_value_size
+        """
+        first = buffer[pos]
+        scalar = first not in '[{"'
+        depth = 1 if first in "[{" else 0
+        in_string = first == '"'
+        scanned = 1
+        while True:
+            i = pos + scanned
+            while True:
+                if scalar:
+                    match = _SCALAR_END.search(buffer, i)
+                    if match:
+                        return match.start()
+                    i = len(buffer)
+                    break
+                if in_string:
+                    match = _STRING_TOKEN.search(buffer, i)
+                    if match is None:
+                        i = len(buffer)
+                        break
+                    if match.group() == "\\":
+                        if match.end() == len(buffer):
+                            # The escaped character is in the next chunk
+                            i = match.start()
+                            break
+                        i = match.end() + 1
+                        continue
+                    in_string = False
+                    i = match.end()
+                    if not depth:
+                        return i
+                    continue
+                match = _CONTAINER_TOKEN.search(buffer, i)
+                if match is None:
+                    i = len(buffer)
+                    break
+                i = match.end()
+                token = match.group()
+                if token == '"':
+                    in_string = True
+                elif token in "[{":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if not depth:
+                        return i
+            scanned = i - pos
+            if scanned > max_value_size:
+                raise ValueError(f"Invalid JSON: value longer than {max_value_size} characters")
+            if not fill():
+                return len(buffer)
+
+    def parse_value() -> Any:
+        nonlocal pos
+        # Decode only once the whole value is in the buffer
+        find_value_end()
+        try:
+            value, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        return value
+
+    if not skip_whitespace():
+        return
+    if buffer[pos] != "[":
+        # JSONL: values separated by newlines
+        while skip_whitespace():
+            yield parse_value()
+        return
+
+    pos += 1
+    if skip_whitespace() and buffer[pos] == "]":
+        pos += 1
+    else:
+        while True:
+            if not skip_whitespace():
+                raise ValueError("Invalid JSON: unexpected end of the array")
+            yield parse_value()
+            if not skip_whitespace():
+                raise ValueError("Invalid JSON: unexpected end of the array")
+            if buffer[pos] == "]":
+                pos += 1
+                break
+            if buffer[pos] != ",":
+                raise ValueError(f"Invalid JSON: expected ',' or ']' but found {buffer[pos]!r}")
+            pos += 1
+    if skip_whitespace():
+        raise ValueError("Invalid JSON: unexpected data after the array")
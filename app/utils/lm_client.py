@@ -0,0 +1,366 @@
+"""
+LM client used for every call the application makes
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import dspy
+import litellm
+
+from ..config import Config
+from .cache import make_cache_key
+from .program_utils import CHARS_PER_TOKEN
+from .rate_limit import rate_limiters
+from .single_flight import SingleFlight
+from .transcript import get_lm_transcript
+
+# Identical requests in flight from any client in the process
+lm_requests = SingleFlight()
+
+# Runs the calls of hedged fallback chains, so the caller can give up waiting on a slow
+# model. Sized from the model definitions by configure_chain_workers.
+_chain_workers = Config.LM_CHAIN_WORKERS
+_chain_executor = ThreadPoolExecutor(max_workers=_chain_workers, thread_name_prefix="lm-chain")
+_chain_executor_lock = threading.Lock()
+
+# Keys of requests whose responses dspy has cached in memory, oldest first
+_cached_requests: "OrderedDict[str, None]" = OrderedDict()
+_cached_requests_lock = threading.Lock()
+CACHED_REQUESTS_SIZE = 100000
+
+# Models that answered the calls made by the current thread, while tracked
+_served = threading.local()
+
+@contextmanager
+def track_served_models() -> Iterator[List[str]]:
+    """Collect the models that answer the LM calls made by this thread in a with block
+
+    Yields:
+        List[str]: Full names of the models, one per call, filled in as calls complete
+    """
+    previous = getattr(_served, "models", None)
+    models = []
+    _served.models = models
+    try:
+        yield models
+    finally:
+        _served.models = previous
+
+def _note_served(model: str):
+    models = getattr(_served, "models", None)
+    if models is not None:
+        models.append(model)
+
+def configure_chain_workers(models: Iterable) -> int:
+    """Size the pool that runs hedged fallback chains from model definitions
+
+    Each concurrent call of a model with fallbacks and a hedge delay can have a
+    request in flight to every model of its chain, so the pool has room for
+    max_workers calls of each such model, plus Config.LM_CHAIN_WORKERS threads
+    for calls made outside evaluations.
+
+    Args:
+        models: ModelDefinition objects
+
+    Returns:
+        int: Number of threads of the pool
+    """
+    global _chain_executor, _chain_workers
+    workers = Config.LM_CHAIN_WORKERS + sum(
+        model.max_workers * (1 + len(model.fallbacks))
+        for model in models if model.fallbacks and model.hedge_delay is not None
+    )
+    with _chain_executor_lock:
+        if workers != _chain_workers:
+            # Calls already submitted to the old pool still run
+            _chain_executor.shutdown(wait=False)
+            _chain_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lm-chain")
+            _chain_workers = workers
+    return workers
+
+def _submit_chain_call(fn: Callable, *args):
+    with _chain_executor_lock:
+        return _chain_executor.submit(fn, *args)
+
+def _remember_cached(key: str):
+    """Note that dspy now holds the response to a request in its cache"""
+    with _cached_requests_lock:
+        _cached_requests[key] = None
+        _cached_requests.move_to_end(key)
+        if len(_cached_requests) > CACHED_REQUESTS_SIZE:
+            _cached_requests.popitem(last=False)
+
+def _with_dspy_context(fn: Callable) -> Callable:
+    """Wrap fn to run with the calling thread's dspy.context settings in another thread"""
+    from dspy.dsp.utils.settings import thread_local_overrides
+    overrides = thread_local_overrides.overrides.copy()
+
+    def run(*args):
+        original = thread_local_overrides.overrides
+        thread_local_overrides.overrides = overrides.copy()
+        try:
+            return fn(*args)
+        finally:
+            thread_local_overrides.overrides = original
+    return run
+
+def _is_good(outputs) -> bool:
+    """Whether a response has a usable first output"""
+    if not outputs:
+        return False
+    first = outputs[0]
+    if isinstance(first, dict):
+        first = first.get("text")
+    return bool(first)
+
+def _estimate_tokens(messages: List[Dict], max_tokens: int) -> int:
+    """Estimate the tokens a request uses from its prompt size and output limit"""
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+    return prompt_chars // CHARS_PER_TOKEN + max_tokens
+
+# Request arguments that don't change the response
+_TRANSPORT_KWARGS = ("cache", "cache_in_memory")
+
+class ManagedLM(dspy.LM):
+    """dspy.LM that coalesces identical requests and respects its provider's rate limits
+
+    Cacheable requests that are identical to one already in flight wait for
+    its outputs instead of being sent again. Requests are recorded to or
+    replayed from the LM transcript when Config.LM_TRANSPORT is set, and those
+    that reach the provider, rather than being replayed or answered from
+    dspy's cache, wait for the provider's limiter if it has limits. Shared
+    state lives in module-level registries rather than on the client, so the
+    copies dspy makes of a client share it.
+
+    A client can have a chain of fallback models. Those are asked, in order,
+    when the model before them fails or, if hedge_delay is set, hasn't
+    answered within hedge_delay seconds; the first good answer wins. Without
+    a hedge delay the chain runs in the calling thread. Hedged requests run
+    in a shared pool, wait for their provider's limiter like any other, and
+    those not yet sent when an answer arrives are dropped.
+    """
+
+    # Full names of the models to fall back to, and the seconds to wait before hedging
+    fallbacks: Tuple[str, ...] = ()
+    hedge_delay: Optional[float] = None
+
+    def copy(self, **kwargs):
+        """Copy the client, keeping its fallbacks and hedge delay unless new ones are given"""
+        fallbacks = tuple(kwargs.pop("fallbacks", self.fallbacks))
+        hedge_delay = kwargs.pop("hedge_delay", self.hedge_delay)
+        new_instance = super().copy(**kwargs)
+        new_instance.fallbacks = fallbacks
+        new_instance.hedge_delay = hedge_delay
+        return new_instance
+
+    @property
+    def provider_name(self) -> str:
+        """Get the provider prefix of the model name"""
+        return self.model.split("/", 1)[0]
+
+    def __call__(self, prompt=None, messages=None, **kwargs):
+        # Pass our own messages list so the history entry of this call can be found
+        messages = messages or [{"role": "user", "content": prompt}]
+
+        # A caller that disabled the cache wants a fresh response
+        if not kwargs.get("cache", self.cache):
+            outputs, served_by = self._call_chain(prompt, messages, kwargs)
+        else:
+            key = self._flight_key(messages, kwargs)
+            outputs, served_by = lm_requests.do(key, lambda: self._call_chain(prompt, messages, kwargs))
+        _note_served(served_by)
+        return list(outputs)
+
+    def _call_chain(self, prompt, messages: List[Dict], kwargs: Dict) -> Tuple[List, str]:
+        """Make the request with this model and its fallbacks
+
+        Returns:
+            Tuple[List, str]: The outputs, and the full name of the model that produced them
+        """
+        if not self.fallbacks:
+            return self._transport(prompt, messages, kwargs), self.model
+
+        from . import get_lm
+        chain = [self] + [get_lm(name) for name in self.fallbacks if name != self.model]
+        if self.hedge_delay is None:
+            return self._fall_through(chain, prompt, messages, kwargs)
+        return self._hedge(chain, prompt, messages, kwargs)
+
+    @staticmethod
+    def _fall_through(chain: List["ManagedLM"], prompt, messages: List[Dict], kwargs: Dict) -> Tuple[List, str]:
+        """Ask each model of a chain in turn until one answers"""
+        errors = []
+        for lm in chain:
+            try:
+                outputs = lm._transport(prompt, messages, kwargs)
+            except Exception as e:
+                print(f"LM call to {lm.model} failed: {e}")
+                errors.append(e)
+                continue
+            if _is_good(outputs):
+                return outputs, lm.model
+            errors.append(ValueError(f"Empty response from {lm.model}"))
+        raise errors[-1]
+
+    def _hedge(self, chain: List["ManagedLM"], prompt, messages: List[Dict], kwargs: Dict) -> Tuple[List, str]:
+        """Ask the models of a chain in the pool, asking the next one too whenever an answer is late"""
+        pending = {}
+        errors = []
+        # Set once the chain has an answer, or has given up, so requests not yet sent are dropped
+        settled = threading.Event()
+
+        def attempt(lm: "ManagedLM"):
+            if settled.is_set():
+                raise CancelledError()
+            return lm._transport(prompt, messages, kwargs, settled)
+
+        def launch():
+            lm = chain[len(pending) + len(errors)]
+            future = _submit_chain_call(_with_dspy_context(attempt), lm)
+            pending[future] = lm.model
+
+        try:
+            launch()
+            while pending:
+                can_hedge = len(pending) + len(errors) < len(chain)
+                timeout = self.hedge_delay if can_hedge else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Too slow: also ask the next model, and take whichever answers first
+                    launch()
+                    continue
+                for future in done:
+                    model = pending.pop(future)
+                    try:
+                        outputs = future.result()
+                    except Exception as e:
+                        print(f"LM call to {model} failed: {e}")
+                        errors.append(e)
+                        continue
+                    if _is_good(outputs):
+                        return outputs, model
+                    errors.append(ValueError(f"Empty response from {model}"))
+                if not pending and len(errors) < len(chain):
+                    launch()
+            raise errors[-1]
+        finally:
+            # Requests already sent finish in the background and are ignored
+            settled.set()
+            for future in pending:
+                future.cancel()
+
+    def _request_key(self, messages: List[Dict], kwargs: Dict) -> str:
+        """Hash the parts of a request that determine its response"""
+        request_kwargs = {
+            key: value for key, value in {**self.kwargs, **kwargs}.items()
+            if key not in _TRANSPORT_KWARGS and not key.startswith("api_")
+        }
+        return make_cache_key(self.model, self.model_type, messages, request_kwargs)
+
+    def _flight_key(self, messages: List[Dict], kwargs: Dict) -> str:
+        """Hash a request and the fallback chain that answers it, so only calls through the same chain share a response"""
+        key = self._request_key(messages, kwargs)
+        if not self.fallbacks:
+            return key
+        return make_cache_key(key, list(self.fallbacks), self.hedge_delay)
+
+    def _usage(self, messages: List[Dict]) -> Optional[Dict]:
+        """Get the token usage from the history entry of the call made with messages"""
+        for entry in reversed(self.history[-50:]):
+            if entry.get("messages") is messages:
+                return entry.get("usage")
+        return None
+
+    def _is_cached(self, key: str, messages: List[Dict], kwargs: Dict) -> bool:
+        """Whether dspy's memory or disk cache holds the response to a request"""
+        with _cached_requests_lock:
+            if key in _cached_requests:
+                return True
+        if litellm.cache is None or self.model_type != "chat":
+            return False
+        request = {k: v for k, v in {**self.kwargs, **kwargs}.items() if k not in _TRANSPORT_KWARGS}
+        # Returns None, rather than raising, when the cache can't be read
+        return litellm.cache.get_cache(model=self.model, messages=messages, **request) is not None
+
+    @contextmanager
+    def _provider_slot(self, messages: List[Dict], kwargs: Dict) -> Iterator[None]:
+        """Wait for the provider's limiter, if it has limits, around a call to the provider"""
+        limiter = rate_limiters.get(self.provider_name)
+        if limiter is None:
+            yield
+            return
+
+        max_tokens = kwargs.get("max_tokens", self.kwargs.get("max_tokens", 0)) or 0
+        estimated = _estimate_tokens(messages, max_tokens)
+        with limiter.request(estimated):
+            try:
+                yield
+            except CancelledError:
+                # The request was dropped before being sent, so it used no tokens
+                limiter.record_usage(estimated, 0)
+                raise
+
+        actual = (self._usage(messages) or {}).get("total_tokens")
+        if actual is not None:
+            limiter.record_usage(estimated, actual)
+
+    def _transport(self, prompt, messages: List[Dict], kwargs: Dict,
+                   cancelled: Optional[threading.Event] = None):
+        """Call the provider, recording the response, or replay a recorded response
+
+        Args:
+            cancelled: Set when the response is no longer needed; checked once the
+                       provider's limiter lets the request through, before it is sent
+
+        Raises:
+            CancelledError: If cancelled was set before the request was sent
+        """
+        transcript = get_lm_transcript()
+        key = self._request_key(messages, kwargs)
+        if transcript is not None and transcript.mode == "replay":
+            entry = transcript.replay(key)
+            outputs = list(entry["outputs"])
+            self._log_replayed(prompt, messages, kwargs, outputs, entry.get("usage"))
+            return outputs
+
+        start = time.monotonic()
+        cache = kwargs.get("cache", self.cache)
+        if cache and self._is_cached(key, messages, kwargs):
+            outputs = super().__call__(prompt=prompt, messages=messages, **kwargs)
+        else:
+            with self._provider_slot(messages, kwargs):
+                if cancelled is not None and cancelled.is_set():
+                    raise CancelledError()
+                outputs = super().__call__(prompt=prompt, messages=messages, **kwargs)
+            if cache:
+                _remember_cached(key)
+        if transcript is not None:
+            transcript.record(key, self.model, outputs, self._usage(messages), time.monotonic() - start)
+        return outputs
+
+    def _log_replayed(self, prompt, messages: List[Dict], kwargs: Dict, outputs: List, usage: Optional[Dict]):
+        """Add a replayed call to the history, like dspy.LM does for calls it makes"""
+        if dspy.settings.disable_history:
+            return
+        entry = dict(
+            prompt=prompt,
+            messages=messages,
+            kwargs={k: v for k, v in kwargs.items() if not k.startswith("api_")},
+            response=None,
+            outputs=outputs,
+            usage=dict(usage or {}),
+            cost=None,
+            timestamp=datetime.now().isoformat(),
+            uuid=str(uuid.uuid4()),
+            model=self.model,
+            response_model=self.model,
+            model_type=self.model_type,
+        )
+        self.history.append(entry)
+        self.update_global_history(entry)
@@ -0,0 +1,91 @@
+"""
+Pool of LM clients shared across requests
+"""
+import json
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import dspy
+
+from .lm_client import ManagedLM
+
+# Number of calls kept in a pooled client's history for inspect_history()
+HISTORY_SIZE = 100
+
+class LMPool:
+    """Thread-safe cache of LM clients keyed by model name and parameters
+
+    Reusing a client lets LiteLLM reuse the HTTP clients, and with them the
+    open connections, it keeps per model and credentials. Clients are shared
+    between threads, so callers that change one must work on a copy.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[str, str], dspy.LM] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name: str, params: Dict, fallbacks: Sequence[str],
+             hedge_delay: Optional[float]) -> Tuple[str, str]:
+        return (model_name, json.dumps([params, list(fallbacks), hedge_delay], sort_keys=True, default=str))
+
+    def get(self, model_name: str, params: Dict, fallbacks: Sequence[str] = (),
+            hedge_delay: Optional[float] = None) -> dspy.LM:
+        """Get the client for a model and parameters, creating it on first use
+
+        Args:
+            model_name (str): Full name of the model
+            params (Dict): Parameters passed to dspy.LM
+            fallbacks (Sequence[str]): Full names of the models to fall back to, in order
+            hedge_delay (float, optional): Seconds to wait for an answer before also
+                asking the next fallback
+
+        Returns:
+            dspy.LM: The shared client
+        """
+        key = self._key(model_name, params, fallbacks, hedge_delay)
+        with self._lock:
+            lm = self._entries.get(key)
+            if lm is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if lm is None:
+            lm = ManagedLM(model_name, **params)
+            if fallbacks:
+                lm.fallbacks = tuple(fallbacks)
+                lm.hedge_delay = hedge_delay
+            with self._lock:
+                # If two threads race, the first one stored wins
+                lm = self._entries.setdefault(key, lm)
+
+        # A long-lived client would otherwise keep every call it has made
+        history = getattr(lm, "history", None)
+        if isinstance(history, list) and len(history) > HISTORY_SIZE:
+            del history[:-HISTORY_SIZE]
+        return lm
+
+    def invalidate(self, model_name: Optional[str] = None):
+        """Drop the clients of a model, or all clients if no name is given"""
+        with self._lock:
+            if model_name is None:
+                self._entries.clear()
+            else:
+                self._entries = {
+                    key: lm for key, lm in self._entries.items()
+                    if key[0] != model_name
+                }
+
+    def stats(self) -> Dict:
+        """Get the number of pooled clients and the hit/miss counters"""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+# Shared by every caller of get_lm
+lm_pool = LMPool()
@@ -2,12 +2,18 @@
 Metrics used for evaluating DSPy programs
 """
 import dspy
-import importlib
-import time
-from typing import Tuple, List
+import threading
+from typing import Tuple, List, Optional
 
+from ..config import Config
 from ..models.signature import SignatureDefinition
 from ..services.state import AppState
+from .cache import DiskCache, make_cache_key
+from .dynamic_classes import compile_class, dynamic_classes
+
+# Cache of judge results, opened on first use so the cache directory can be configured
+_judge_cache = None
+_judge_cache_lock = threading.Lock()
 
 class PLNJudgeSignature(dspy.Signature):
     """You are a Judge for the following task:
@@ -45,23 +51,19 @@ class GenericJudgeSignature(dspy.Signature):
 
 def clean_pln_list(pln_text: List[str]) -> Tuple[List[str], float]:
     """Clean a string of PLN statements or questions and return the cleaned list and minimum score."""
-    from ..utils import cleanAndScore
+    from .cleanpln import clean_and_score_batch
     
-    cleaned_list = []
-    score_sum = 0.0
-    cnt = 0.0
+    # Skip empty lines
+    lines = [line.strip() for line in pln_text if line.strip()]
+    results = clean_and_score_batch(lines)
     
-    for line in pln_text:
-        line = line.strip()
-        if line:  # Skip empty lines
-            cleaned_item, score = cleanAndScore(line)
-            cleaned_list.append(cleaned_item)
-            score_sum += score
-            cnt += 1.0
+    cleaned_list = [cleaned_item for cleaned_item, _ in results]
+    score_sum = sum(score for _, score in results)
+    cnt = float(len(results))
     
     return cleaned_list, score_sum / cnt if cnt > 0 else 1.0
 
-def judge_metric(example, pred, trace=None) -> Tuple[float, str]:
+def judge_metric(example, pred, trace=None, signature: Optional[SignatureDefinition] = None) -> Tuple[float, str]:
     """Judge metric that handles different signature types
     
     Uses a generic judge for all signature types.
@@ -71,12 +73,14 @@ def judge_metric(example, pred, trace=None) -> Tuple[float, str]:
         example: The example (reference) to compare against
         pred: The prediction to evaluate
         trace: Optional trace information
+        signature: Signature of the example, looked up from its fields if not given
         
     Returns:
         Tuple[float, str]: A tuple of (score, explanation)
     """
     # For backward compatibility with PLN tasks
-    if (hasattr(example, 'english') and 
+    if (signature is None and
+        hasattr(example, 'english') and 
         hasattr(example, 'pln_types') and 
         hasattr(example, 'pln_statements') and 
         hasattr(example, 'pln_query')):
@@ -98,9 +102,10 @@ def judge_metric(example, pred, trace=None) -> Tuple[float, str]:
                     "pln_query": "clean_pln_list"
                 }
             )
+            app_state.rebuild_signature_index()
     
     # Use the generic judge for all signatures
-    return judge_generic_metric(example, pred, trace)
+    return judge_generic_metric(example, pred, trace, signature=signature)
 
 def create_dynamic_judge(signature: SignatureDefinition) -> type:
     """Create a dynamic judge signature for a specific task signature
@@ -111,12 +116,6 @@ def create_dynamic_judge(signature: SignatureDefinition) -> type:
     Returns:
         type: A dynamic dspy.Signature class for judging
     """
-    # Create a dynamic module for the judge
-    module_name = f"dynamic_judge_{int(time.time())}"
-    spec = importlib.util.spec_from_loader(module_name, loader=None)
-    module = importlib.util.module_from_spec(spec)
-    module.dspy = dspy
-    
     # Build class definition with dynamic fields based on signature
     class_def = f"""class {signature.name}JudgeSignature(dspy.Signature):
     \"\"\"
@@ -153,12 +152,22 @@ def create_dynamic_judge(signature: SignatureDefinition) -> type:
     class_def += "    explanation = dspy.OutputField(desc=\"Detailed explanation of the similarity score\")\n"
     class_def += "    similarity: float = dspy.OutputField(desc=\"Overall similarity score between true and predicted outputs (0.0 to 1.0)\")\n"
     
-    # Execute the class definition in the module's context
-    exec(class_def, module.__dict__)
+    return compile_class(class_def, f"{signature.name}JudgeSignature",
+                         f"dynamic_judge_{signature.fingerprint[:12]}")
+
+def get_judge(signature: SignatureDefinition) -> dspy.Module:
+    """Get the judge predictor for a signature, compiling it once per signature version
     
-    # Get the class from the module
-    judge_class = getattr(module, f"{signature.name}JudgeSignature")
-    return judge_class
+    Args:
+        signature (SignatureDefinition): The signature to get a judge for
+        
+    Returns:
+        dspy.Module: A ChainOfThought judge
+    """
+    return dynamic_classes.get(
+        "judge", signature,
+        lambda: dspy.ChainOfThought(create_dynamic_judge(signature))
+    )
 
 def get_processor_by_name(processor_name: str):
     """Get a processor function by name
@@ -221,7 +230,53 @@ def process_field(field_name: str, field_value: str, signature: SignatureDefinit
         # Other processors just return a value (no score)
         return processor_fn(field_value), 1.0
 
-def judge_generic_metric(example, pred, trace=None) -> Tuple[float, str]:
+def get_judge_cache() -> DiskCache:
+    """Get the cache of judge results
+    
+    Returns:
+        DiskCache: The judge cache, with hit/miss counters for this process
+    """
+    global _judge_cache
+    path = Config.CACHE_DIR / "judge_scores.sqlite3"
+    with _judge_cache_lock:
+        if _judge_cache is None or _judge_cache.path != path:
+            if _judge_cache is not None:
+                _judge_cache.close()
+            _judge_cache = DiskCache(path, Config.JUDGE_CACHE_MAX_BYTES)
+        return _judge_cache
+
+def _judge_cache_key(signature: SignatureDefinition, judge_inputs: dict) -> Optional[str]:
+    """Build the judge cache key for a set of judge inputs
+    
+    Args:
+        signature: Signature definition the judge is created from
+        judge_inputs: Inputs passed to the judge, with processed predicted outputs
+        
+    Returns:
+        str: The cache key, or None if no judge model is configured
+    """
+    lm = dspy.settings.lm
+    if lm is None:
+        return None
+    return make_cache_key(
+        "judge",
+        signature.name,
+        signature.description,
+        signature.input_fields,
+        signature.output_fields,
+        judge_inputs,
+        getattr(lm, "model", str(lm)),
+        getattr(lm, "kwargs", {})
+    )
+
+def _example_fields(example) -> List[str]:
+    """Get the field names of an example"""
+    if hasattr(example, "keys"):
+        # dspy.Example and plain dictionaries
+        return list(example.keys())
+    return list(vars(example))
+
+def judge_generic_metric(example, pred, trace=None, signature: Optional[SignatureDefinition] = None) -> Tuple[float, str]:
     """Judge metric for any signature type
     
     Dynamically creates a judge for the signature and uses it to evaluate.
@@ -230,32 +285,20 @@ def judge_generic_metric(example, pred, trace=None) -> Tuple[float, str]:
         example: The example (reference) to compare against
         pred: The prediction to evaluate
         trace: Optional trace information
+        signature: Signature of the example. If None, it is looked up by the
+                   example's field names in the AppState signature index.
         
     Returns:
         Tuple[float, str]: A tuple of (score, explanation)
     """
-    # Get the app state
-    app_state = AppState()
-    
-    # Determine which signature this is for
-    signature_name = None
-    for sig_name, signature in app_state.signatures.items():
-        # Check if this example matches the signature's fields
-        if all(hasattr(example, field) for field in signature.input_fields + signature.output_fields):
-            signature_name = sig_name
-            break
-    
-    if not signature_name:
+    if signature is None:
+        # Determine which signature this is for
+        signature = AppState().find_signature_for_fields(_example_fields(example))
+    
+    if not signature:
         # Fall back to a simple similarity score if we can't determine the signature
         return 0.5, "Could not determine signature type for evaluation"
     
-    # Get the signature
-    signature = app_state.get_signature(signature_name)
-    
-    # Create a dynamic judge for this signature
-    judge_class = create_dynamic_judge(signature)
-    judge = dspy.ChainOfThought(judge_class)
-    
     # Prepare the judge inputs
     judge_inputs = {
         "task_description": signature.description
@@ -277,14 +320,23 @@ def judge_generic_metric(example, pred, trace=None) -> Tuple[float, str]:
         judge_inputs[f"pred_{field}"] = processed_value
         processing_scores.append(score)
     
-    # Run the judge
-    res = judge(**judge_inputs)
+    # Reuse the judge's verdict if it has already seen these outputs
+    cache = get_judge_cache()
+    cache_key = _judge_cache_key(signature, judge_inputs)
+    cached = cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        similarity, explanation = cached["similarity"], cached["explanation"]
+    else:
+        res = get_judge(signature)(**judge_inputs)
+        similarity, explanation = res.similarity, res.explanation
+        if cache_key:
+            cache.set(cache_key, {"similarity": similarity, "explanation": explanation})
     
     # Calculate average processing score
     avg_processing_score = sum(processing_scores) / len(processing_scores) if processing_scores else 1.0
     
     # Adjust similarity by processing score
-    adjusted_similarity = res.similarity * avg_processing_score
+    adjusted_similarity = similarity * avg_processing_score
     
     # Return the score and explanation
-    return adjusted_similarity, res.explanation
+    return adjusted_similarity, explanation
@@ -40,6 +40,14 @@ class MeTTaHandler:
     def read_only(self) -> bool:
         return self._read_only
 
+    def reset_kb(self):
+        """Restore &kb to the rules it was initialized with
+        
+        Any code run on the interpreter can change &kb, so it is always rebuilt.
+        """
+        self.metta.run("!(match &kb $a (remove-atom &kb $a))")
+        self.metta.run("!(add-atom &kb (get-atoms &rules))")
+
     def add_atom_and_run_fc(self, atom: str) -> List[str]:
         self.metta.run(f'!(add-atom &kb {atom})')                  
         res = self.metta.run(f'!(ddfc &kb {atom})')
@@ -0,0 +1,95 @@
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from .metta_handler import MeTTaHandler
+
+class MeTTaPool:
+    """Pool of initialized MeTTa interpreters that are reused across calls
+
+    Booting an interpreter loads chainer.metta and its imports, which costs far
+    more than a single query. Interpreters are checked out by one thread at a
+    time and their KB is reset before they go back into the pool. An
+    interpreter that fails to reset is replaced by an empty slot, None in the
+    idle queue, which the next acquire() fills with a new interpreter.
+    """
+
+    def __init__(self, factory: Callable[[], MeTTaHandler], size: int):
+        """
+        Initialize a pool
+
+        Args:
+            factory: Function that creates a new interpreter
+            size: Maximum number of interpreters kept in the pool
+        """
+        self.factory = factory
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def warm(self, count: int = None):
+        """Create interpreters up front so the first calls don't pay for booting them"""
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self._lock:
+                if self._created >= count:
+                    return
+                self._created += 1
+            self._idle.put(self._create())
+
+    def _create(self) -> MeTTaHandler:
+        try:
+            return self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def acquire(self) -> MeTTaHandler:
+        """Check out an interpreter, creating one if the pool is not full yet"""
+        try:
+            handler = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                return self._create()
+            # Every interpreter is in use, wait for one to come back
+            handler = self._idle.get()
+        if handler is None:
+            return self._replace()
+        return handler
+
+    def _replace(self) -> MeTTaHandler:
+        """Create an interpreter in the slot of a discarded one"""
+        try:
+            return self.factory()
+        except Exception:
+            # Give the slot back, so threads waiting for it don't wait forever
+            self._idle.put(None)
+            raise
+
+    def release(self, handler: MeTTaHandler):
+        """Return an interpreter to the pool with a clean KB"""
+        try:
+            handler.reset_kb()
+        except Exception as e:
+            # Don't hand out an interpreter in an unknown state, but wake a waiting
+            # thread to create a new one in its place
+            print(f"Discarding MeTTa interpreter that failed to reset: {e}")
+            self._idle.put(None)
+            return
+        self._idle.put(handler)
+
+    @contextmanager
+    def interpreter(self) -> Iterator[MeTTaHandler]:
+        """Check out an interpreter for the duration of a with block"""
+        handler = self.acquire()
+        try:
+            yield handler
+        finally:
+            self.release(handler)
@@ -1,12 +1,129 @@
 """
 Utility functions for program management
 """
+import os
 import time
 import json
-from typing import Optional
+import uuid
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional
 
 from ..config import Config
 
+# Rough number of characters per token, used to estimate prompt sizes
+CHARS_PER_TOKEN = 4
+
+def get_program_instructions(task) -> str:
+    """Get the instructions of a program's predictor
+    
+    Args:
+        task: The DSPy program
+        
+    Returns:
+        str: The instructions, or an empty string if the program has none
+    """
+    if hasattr(task, 'predict') and hasattr(task.predict, 'signature'):
+        return task.predict.signature.instructions or ""
+    return ""
+
+def _text_length(value) -> int:
+    """Get the number of characters a value takes up in a prompt"""
+    if hasattr(value, 'items'):
+        return sum(len(str(v)) for _, v in value.items())
+    return len(str(value))
+
+def build_prompt_profile(task) -> Dict:
+    """Summarize the size of the prompts a program sends
+    
+    Args:
+        task: The DSPy program
+        
+    Returns:
+        Dict: Number of demos, total demo characters and an estimated prompt
+              token count (instructions, field descriptions and demos)
+    """
+    num_demos = 0
+    demo_chars = 0
+    prompt_chars = 0
+    for predictor in task.predictors():
+        for demo in predictor.demos:
+            num_demos += 1
+            demo_chars += _text_length(demo)
+        signature = predictor.signature
+        prompt_chars += len(signature.instructions or "")
+        for name, field in signature.fields.items():
+            extra = field.json_schema_extra or {}
+            prompt_chars += len(name) + len(str(extra.get('desc', '')))
+    
+    return {
+        "num_demos": num_demos,
+        "demo_chars": demo_chars,
+        "estimated_prompt_tokens": (prompt_chars + demo_chars) // CHARS_PER_TOKEN
+    }
+
+def update_program_metadata(program_dir: Path, task, **fields) -> Dict:
+    """Write a program's instructions and prompt profile into its metadata.json
+    
+    Args:
+        program_dir (Path): Directory of the saved program
+        task: The DSPy program saved in the directory
+        **fields: Other metadata fields to set
+        
+    Returns:
+        Dict: The updated metadata
+    """
+    metadata_path = Path(program_dir) / "metadata.json"
+    metadata = {}
+    if metadata_path.exists():
+        with open(metadata_path, "r") as f:
+            metadata = json.load(f)
+    
+    metadata.update(fields)
+    metadata["instructions"] = get_program_instructions(task)
+    metadata["prompt_profile"] = build_prompt_profile(task)
+    
+    with open(metadata_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+def new_program_id() -> str:
+    """Generate a program ID that is unique across processes
+    
+    IDs combine the creation time with a sequence number from the program
+    catalog, so programs created in the same second get distinct, increasing IDs.
+    
+    Returns:
+        str: The new program ID
+    """
+    from ..services.state import AppState
+    seq = AppState().catalog.next_sequence()
+    return f"program_{int(time.time())}_{seq:06d}"
+
+def _publish_program_dir(tmp_dir: Path) -> str:
+    """Move a fully written program directory to its final location
+    
+    Args:
+        tmp_dir (Path): Temporary directory holding the program
+        
+    Returns:
+        str: The ID the program was published under
+    """
+    while True:
+        program_id = new_program_id()
+        program_dir = Config.PROGRAM_DIR / program_id
+        # rename() would replace an empty directory, so never reuse an existing ID
+        if program_dir.exists():
+            continue
+        try:
+            os.rename(tmp_dir, program_dir)
+        except OSError:
+            if program_dir.exists():
+                continue
+            raise
+        return program_id
+
 def save_program(
     task,
     model_name: str,
@@ -26,30 +143,88 @@ def save_program(
     Returns:
         str: The ID of the created program
     """
-    # Generate a unique ID for the program
-    program_id = f"program_{int(time.time())}"
-    program_dir = Config.PROGRAM_DIR / program_id
+    # Write the program to a temporary directory, which listings skip, so a
+    # partially written program is never visible under its final ID
+    Config.PROGRAM_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Config.PROGRAM_DIR / f".tmp_{uuid.uuid4().hex}"
+    tmp_dir.mkdir()
+    
+    try:
+        # Save program to the directory
+        task.save(str(tmp_dir), save_program=True)
+        
+        # Add additional metadata, so listings don't need to load the program
+        update_program_metadata(
+            tmp_dir,
+            task,
+            model=model_name,
+            created_at=time.time(),
+            task_name=signature_description,
+            base_program_id=base_program_id,
+            signature_name=signature_name
+        )
+        
+        program_id = _publish_program_dir(tmp_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    
+    # Don't serve a previously loaded program saved under the same ID
+    from ..services.program_cache import program_cache
+    program_cache.invalidate(program_id)
     
-    # Create directory if it doesn't exist
-    program_dir.mkdir(exist_ok=True)
+    return program_id
+
+def resave_program(task, program_id: str) -> Dict:
+    """Save a modified program over an existing one, keeping its metadata
     
-    # Save program to the directory
-    task.save(str(program_dir), save_program=True)
+    The program is written to a temporary directory first and each file is
+    then moved over the old one, so readers never see a partially written file
+    and a failed save leaves the old program in place.
     
-    # Add additional metadata
+    Args:
+        task: The modified DSPy program
+        program_id (str): The ID of the program to overwrite
+        
+    Returns:
+        Dict: The updated metadata of the program
+    """
+    program_dir = Config.PROGRAM_DIR / program_id
     metadata_path = program_dir / "metadata.json"
+    metadata = {}
     if metadata_path.exists():
         with open(metadata_path, "r") as f:
             metadata = json.load(f)
+    
+    tmp_dir = Config.PROGRAM_DIR / f".tmp_{uuid.uuid4().hex}"
+    tmp_dir.mkdir()
+    try:
+        # Saving writes metadata.json with only the dependency versions
+        task.save(str(tmp_dir), save_program=True)
+        metadata.pop("dependency_versions", None)
+        metadata = update_program_metadata(tmp_dir, task, **metadata)
         
-        # Add additional metadata
-        metadata["model"] = model_name
-        metadata["created_at"] = time.time()
-        metadata["task_name"] = signature_description
-        metadata["base_program_id"] = base_program_id
-        metadata["signature_name"] = signature_name
-        
-        with open(metadata_path, "w") as f:
-            json.dump(metadata, f, indent=2)
+        # Replace the program before its metadata, which describes the new version
+        for name in sorted(os.listdir(tmp_dir), key=lambda name: name == "metadata.json"):
+            os.replace(tmp_dir / name, program_dir / name)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    from ..services.program_cache import program_cache
+    program_cache.invalidate(program_id)
+    return metadata
+
+def program_fingerprint(program_id: str) -> str:
+    """Get a hash of the saved content of a program
     
-    return program_id
\ No newline at end of file
+    Args:
+        program_id (str): The ID of the program
+        
+    Returns:
+        str: SHA-256 hex digest of the program's pickle file
+    """
+    digest = hashlib.sha256()
+    with open(Config.PROGRAM_DIR / program_id / "program.pkl", "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
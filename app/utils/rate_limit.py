@@ -0,0 +1,189 @@
+"""
+Per-provider rate limiting of LM calls
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+# Limits a provider can have: requests per minute, tokens per minute and concurrent requests
+LIMIT_NAMES = ("rpm", "tpm", "max_in_flight")
+
+class TokenBucket:
+    """Token bucket refilled continuously at a rate per minute
+
+    The bucket holds at most one minute's worth of tokens. Callers may be
+    charged more than an estimate afterwards, which can leave the bucket in
+    debt until it refills.
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        Initialize a token bucket
+
+        Args:
+            per_minute: Number of tokens added per minute, and the bucket's capacity
+        """
+        self.per_minute = float(per_minute)
+        self.tokens = self.per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.per_minute, self.tokens + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def acquire(self, amount: float = 1):
+        """Take tokens from the bucket, waiting until enough are available
+
+        Args:
+            amount: Number of tokens to take; capped at the bucket's capacity
+        """
+        amount = min(amount, self.per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) * 60 / self.per_minute
+            time.sleep(wait)
+
+    def adjust(self, amount: float):
+        """Return tokens to the bucket, or take more if amount is negative"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.per_minute, self.tokens + amount)
+
+class ProviderLimiter:
+    """Request, token and concurrency limits shared by every LM call to a provider"""
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_in_flight: Optional[int] = None):
+        """
+        Initialize a provider limiter
+
+        Args:
+            rpm: Maximum number of requests per minute
+            tpm: Maximum number of tokens per minute
+            max_in_flight: Maximum number of concurrent requests
+        """
+        self.limits = (rpm, tpm, max_in_flight)
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.in_flight = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+
+    @contextmanager
+    def request(self, estimated_tokens: int = 0) -> Iterator[None]:
+        """Wait for the limits to allow a request, and hold a concurrency slot while it runs
+
+        Args:
+            estimated_tokens: Tokens the request is expected to use
+        """
+        if self.in_flight:
+            self.in_flight.acquire()
+        try:
+            if self.requests:
+                self.requests.acquire()
+            if self.tokens and estimated_tokens:
+                self.tokens.acquire(estimated_tokens)
+            yield
+        finally:
+            if self.in_flight:
+                self.in_flight.release()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token budget once a request's actual usage is known"""
+        if self.tokens:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+def provider_rate_limits(models: Iterable, strict: bool = True) -> Dict[str, Dict[str, int]]:
+    """Combine the rate limits of model definitions into limits per provider
+
+    Every model of a provider shares its limits, so models of the same provider
+    must not set different values for the same limit.
+
+    Args:
+        models: ModelDefinition objects
+        strict: Whether conflicting values are an error; if False the lowest value is kept
+
+    Returns:
+        Dict[str, Dict[str, int]]: Limits of each provider that has any
+
+    Raises:
+        ValueError: If strict and two models of a provider set different values for a limit
+    """
+    limits: Dict[str, Dict[str, int]] = {}
+    for model in models:
+        provider_limits = limits.setdefault(model.provider, {})
+        for name, value in model.rate_limits.items():
+            current = provider_limits.get(name)
+            if current is not None and current != value:
+                if strict:
+                    raise ValueError(
+                        f"{model.full_name} sets {name}={value} but another {model.provider} "
+                        f"model sets {name}={current}; limits are shared by the provider"
+                    )
+                value = min(current, value)
+            provider_limits[name] = value
+    return {provider: values for provider, values in limits.items() if values}
+
+class RateLimiterRegistry:
+    """Thread-safe map of provider names to their shared limiters"""
+
+    def __init__(self):
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, provider: str, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                  max_in_flight: Optional[int] = None) -> ProviderLimiter:
+        """Set the limits of a provider, replacing its limiter if they have changed
+
+        Args:
+            provider: Name of the provider, e.g. "anthropic"
+            rpm: Maximum number of requests per minute
+            tpm: Maximum number of tokens per minute
+            max_in_flight: Maximum number of concurrent requests
+
+        Returns:
+            ProviderLimiter: The provider's limiter
+        """
+        limits = (rpm, tpm, max_in_flight)
+        with self._lock:
+            limiter = self._limiters.get(provider)
+            if limiter is None or limiter.limits != limits:
+                limiter = ProviderLimiter(rpm, tpm, max_in_flight)
+                self._limiters[provider] = limiter
+            return limiter
+
+    def load(self, limits: Dict[str, Dict[str, int]]):
+        """Replace every provider's limits, keeping the limiters whose limits are unchanged
+
+        Args:
+            limits: Limits of each provider, as returned by provider_rate_limits
+        """
+        with self._lock:
+            limiters = {}
+            for provider, values in limits.items():
+                limiter = self._limiters.get(provider)
+                if limiter is None or limiter.limits != tuple(values.get(name) for name in LIMIT_NAMES):
+                    limiter = ProviderLimiter(**values)
+                limiters[provider] = limiter
+            self._limiters = limiters
+
+    def get(self, provider: str) -> Optional[ProviderLimiter]:
+        """Get the limiter of a provider, or None if it has no limits"""
+        with self._lock:
+            return self._limiters.get(provider)
+
+    def clear(self, provider: Optional[str] = None):
+        """Drop the limiter of a provider, or every limiter if no provider is given"""
+        with self._lock:
+            if provider is None:
+                self._limiters.clear()
+            else:
+                self._limiters.pop(provider, None)
+
+# Shared by every LM client in the process
+rate_limiters = RateLimiterRegistry()
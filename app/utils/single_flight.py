@@ -0,0 +1,68 @@
+"""
+Coalescing of identical concurrent calls
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+class _Call:
+    """A call in flight, and the result its followers wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Runs at most one call per key at a time
+
+    Callers that arrive while a call with the same key is in flight wait for
+    it and share its result, or its exception, instead of making their own.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn, or wait for the call already in flight for key
+
+        Args:
+            key: Key identifying identical calls
+            fn: Function making the call
+
+        Returns:
+            Any: The result of the call
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._in_flight[key] = call
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def stats(self) -> Dict:
+        """Get the number of calls made, calls coalesced into them, and calls in flight"""
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
@@ -0,0 +1,170 @@
+"""
+Recorded LM responses for replaying calls without a provider
+"""
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from ..config import Config
+
+# Transcript used by LM clients, opened on first use so its settings can be configured
+_transcript = None
+_transcript_lock = threading.Lock()
+
+class TranscriptMiss(LookupError):
+    """Raised when replaying a request that was never recorded"""
+
+def parse_latency(spec: str, seed: Optional[int] = None) -> Callable[[Dict], float]:
+    """Parse a simulated latency setting
+
+    Args:
+        spec: One of "none", "recorded" (the latency seen while recording),
+            "fixed:<seconds>", "uniform:<min>,<max>" or "lognormal:<mu>,<sigma>"
+        seed: Seed for the random latencies, so replays are repeatable
+
+    Returns:
+        Callable[[Dict], float]: Function returning the delay in seconds for a transcript entry
+    """
+    kind, _, args = (spec or "none").partition(":")
+    rng = random.Random(seed)
+    try:
+        values = [float(value) for value in args.split(",")] if args else []
+        if kind == "none":
+            return lambda entry: 0.0
+        if kind == "recorded":
+            return lambda entry: entry.get("latency", 0.0)
+        if kind == "fixed":
+            return lambda entry: values[0]
+        if kind == "uniform":
+            low, high = values
+            return lambda entry: rng.uniform(low, high)
+        if kind == "lognormal":
+            mu, sigma = values
+            return lambda entry: rng.lognormvariate(mu, sigma)
+    except (ValueError, IndexError):
+        pass
+    raise ValueError(f"Invalid LM replay latency: {spec}")
+
+class LMTranscript:
+    """Append-only JSONL file of LM responses keyed by request
+
+    Each line holds the hash of a request, the model, its outputs, token usage
+    and latency. Identical requests recorded several times are replayed in the
+    order they were recorded, starting over once all have been served.
+    """
+
+    def __init__(self, path: Path, mode: str, latency: str = "none", seed: Optional[int] = None):
+        """
+        Initialize a transcript
+
+        Args:
+            path: Path of the JSONL file
+            mode: "record" to append responses, or "replay" to serve them
+            latency: Simulated latency of replayed responses, see parse_latency()
+            seed: Seed for the simulated latencies
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid LM transport mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.settings = (self.path, mode, latency, seed)
+        self._latency = parse_latency(latency, seed)
+        self._entries: Dict[str, List[Dict]] = {}
+        self._replayed: Dict[str, int] = {}
+        self._file = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Read the responses recorded so far"""
+        if not self.path.exists():
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by an interrupted recording
+                    continue
+                self._entries.setdefault(entry["key"], []).append(entry)
+
+    def record(self, key: str, model: str, outputs: List, usage: Optional[Dict], latency: float):
+        """Append a response to the transcript
+
+        Args:
+            key: Hash of the request
+            model: Full name of the model
+            outputs: Outputs returned by the LM
+            usage: Token usage reported by the provider
+            latency: Seconds the call took
+        """
+        entry = {
+            "key": key,
+            "model": model,
+            "outputs": outputs,
+            "usage": usage or {},
+            "latency": round(latency, 3)
+        }
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a")
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._entries.setdefault(key, []).append(entry)
+
+    def replay(self, key: str) -> Dict:
+        """Get the recorded response of a request, after its simulated latency
+
+        Args:
+            key: Hash of the request
+
+        Returns:
+            Dict: The transcript entry, with outputs and usage
+        """
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise TranscriptMiss(f"No recorded LM response for request {key} in {self.path}")
+            index = self._replayed.get(key, 0)
+            self._replayed[key] = index + 1
+            entry = entries[index % len(entries)]
+            delay = self._latency(entry)
+        if delay > 0:
+            time.sleep(delay)
+        return entry
+
+    def close(self):
+        """Close the transcript file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+def get_lm_transcript() -> Optional[LMTranscript]:
+    """Get the transcript LM calls are recorded to or replayed from
+
+    Returns:
+        Optional[LMTranscript]: The transcript, or None if calls go to the providers
+    """
+    global _transcript
+    if Config.LM_TRANSPORT not in ("record", "replay"):
+        return None
+    path = Path(Config.LM_TRANSCRIPT) if Config.LM_TRANSCRIPT else Config.DATA_DIR / "lm_transcript.jsonl"
+    settings = (path, Config.LM_TRANSPORT, Config.LM_REPLAY_LATENCY, Config.LM_REPLAY_SEED)
+    with _transcript_lock:
+        if _transcript is None or _transcript.settings != settings:
+            if _transcript is not None:
+                _transcript.close()
+            _transcript = LMTranscript(*settings)
+        return _transcript
@@ -0,0 +1,68 @@
+"""Benchmark scoring PLN statements: a new MeTTa interpreter per call, the pool and checkStmt.
+
+Usage:
+    python benchmarks/checkstmt_benchmark.py [--samples samples/PLNTask_samples.json] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.cleanpln import balance_parentheses, checkStmt, check_stmt_metta, metta_pool
+from app.utils.metta.metta_handler import MeTTaHandler
+
+def load_statements(path: str):
+    """Get the non-empty PLN statement lines of every sample"""
+    with open(path, "r") as f:
+        samples = json.load(f)
+    statements = []
+    for sample in samples:
+        for field in ("pln_statements", "pln_queries", "pln_query"):
+            for line in str(sample.get(field, "")).splitlines():
+                line = line.strip()
+                if line:
+                    statements.append(balance_parentheses(line)[0])
+    return statements
+
+def check_unpooled(expr: str) -> float:
+    """checkStmt as it was before pooling: boot an interpreter for every statement"""
+    metta = MeTTaHandler('tmp.json', read_only=True)
+    try:
+        res = metta.run_clean(f"!(unify {expr} (: $123prf (WithTV $123stmt (STV $123s $123c))) 1.0 0.1)")
+        return float(res[0])
+    except Exception:
+        return 0.0
+
+def run(name: str, fn, statements, workers: int = 1):
+    start = time.perf_counter()
+    if workers == 1:
+        for stmt in statements:
+            fn(stmt)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(fn, statements))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {len(statements) / elapsed:10.1f} statements/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", default=os.path.join("samples", "PLNTask_samples.json"))
+    parser.add_argument("--repeat", type=int, default=3, help="Number of passes over the statements")
+    parser.add_argument("--workers", type=int, default=4, help="Threads for the concurrent run")
+    args = parser.parse_args()
+
+    statements = load_statements(args.samples) * args.repeat
+    print(f"{len(statements)} statements, pool size {metta_pool.size}")
+
+    run("new interpreter per call", check_unpooled, statements)
+    metta_pool.warm()
+    run("pooled", check_stmt_metta, statements)
+    run(f"pooled, {args.workers} threads", check_stmt_metta, statements, workers=args.workers)
+    run("checkStmt (Python fast path)", checkStmt, statements)
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,22 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from app.services.state import AppState
 from app.services.samples import SampleManager
 
+@pytest.fixture(autouse=True)
+def clear_dynamic_classes():
+    """Fixture to start every test without compiled dynamic classes."""
+    from app.utils.dynamic_classes import dynamic_classes
+    dynamic_classes.invalidate()
+    yield
+    dynamic_classes.invalidate()
+
+@pytest.fixture(autouse=True)
+def clear_lm_pool():
+    """Fixture to start every test without pooled LM clients."""
+    from app.utils.lm_pool import lm_pool
+    lm_pool.invalidate()
+    yield
+    lm_pool.invalidate()
+
 @pytest.fixture
 def temp_dir():
     """Fixture to create a temporary directory for tests."""
@@ -29,12 +45,20 @@ def app_state(temp_dir):
     original_program_dir = Config.PROGRAM_DIR
     original_samples_dir = Config.SAMPLES_DIR
     original_signatures_dir = Config.SIGNATURES_DIR
+    original_data_dir = Config.DATA_DIR
+    original_evaluations_dir = Config.EVALUATIONS_DIR
+    original_cache_dir = Config.CACHE_DIR
+    original_models_dir = Config.MODELS_DIR
     
     # Update Config paths to use temp directory
     temp_path = Path(temp_dir)
     Config.PROGRAM_DIR = temp_path / "programs"
     Config.SAMPLES_DIR = temp_path / "samples"
     Config.SIGNATURES_DIR = temp_path / "signatures"
+    Config.DATA_DIR = temp_path / "data"
+    Config.EVALUATIONS_DIR = Config.DATA_DIR / "evaluations"
+    Config.CACHE_DIR = Config.DATA_DIR / "cache"
+    Config.MODELS_DIR = temp_path / "models"
     
     # Clear the singleton instance if it exists
     AppState._instance = None
@@ -48,6 +72,10 @@ def app_state(temp_dir):
     Config.PROGRAM_DIR = original_program_dir
     Config.SAMPLES_DIR = original_samples_dir
     Config.SIGNATURES_DIR = original_signatures_dir
+    Config.DATA_DIR = original_data_dir
+    Config.EVALUATIONS_DIR = original_evaluations_dir
+    Config.CACHE_DIR = original_cache_dir
+    Config.MODELS_DIR = original_models_dir
     
     # Reset the singleton
     AppState._instance = None
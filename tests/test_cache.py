@@ -0,0 +1,49 @@
+"""Tests for the persistent disk cache."""
+from app.utils.cache import DiskCache, make_cache_key
+
+
+def test_make_cache_key_is_stable():
+    """Keys do not depend on dict ordering and change with their parts."""
+    assert make_cache_key("a", {"x": 1, "y": 2}) == make_cache_key("a", {"y": 2, "x": 1})
+    assert make_cache_key("a", {"x": 1}) != make_cache_key("a", {"x": 2})
+
+
+def test_get_set_and_stats(tmp_path):
+    """Stored values round-trip and lookups are counted."""
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_size_bytes=1024)
+    assert cache.get("missing") is None
+    cache.set("key", {"response": "hello"})
+    assert cache.get("key") == {"response": "hello"}
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    """Entries that were not read recently are evicted once the cache is full."""
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_size_bytes=100)
+    cache.set("a", "x" * 30)
+    cache.set("b", "x" * 30)
+    cache.get("a")
+    cache.set("c", "x" * 30)
+    cache.set("d", "x" * 30)
+
+    assert cache.get("b") is None
+    assert cache.get("d") is not None
+    assert cache.stats()["size_bytes"] <= 100
+    cache.close()
+
+
+def test_persists_across_instances(tmp_path):
+    """A new cache on the same file sees earlier entries."""
+    path = tmp_path / "cache.sqlite3"
+    cache = DiskCache(path, max_size_bytes=1024)
+    cache.set("key", [1, 2, 3])
+    cache.close()
+
+    reopened = DiskCache(path, max_size_bytes=1024)
+    assert reopened.get("key") == [1, 2, 3]
+    reopened.close()
@@ -0,0 +1,103 @@
+"""Tests for the program catalog."""
+import json
+
+import pytest
+
+from app.config import Config
+from app.services.catalog import ProgramCatalog
+
+
+def write_program(program_id, signature_name, created_at, base_program_id=None):
+    """Write a program directory with a metadata.json."""
+    program_dir = Config.PROGRAM_DIR / program_id
+    program_dir.mkdir(parents=True, exist_ok=True)
+    with open(program_dir / "metadata.json", "w") as f:
+        json.dump({
+            "signature_name": signature_name,
+            "created_at": created_at,
+            "base_program_id": base_program_id
+        }, f)
+    return program_dir
+
+
+@pytest.fixture
+def catalog(app_state):
+    """Fixture for a catalog of four programs."""
+    write_program("program_a", "SigA", 1.0)
+    write_program("program_b", "SigA", 2.0, base_program_id="program_a")
+    write_program("program_c", "SigB", 3.0)
+    write_program("program_d", "SigA", 4.0, base_program_id="program_a")
+    catalog = ProgramCatalog(Config.DATA_DIR / "catalog.sqlite3")
+    catalog.sync(Config.PROGRAM_DIR)
+    yield catalog
+    catalog.close()
+
+
+def test_list_filters_and_pages(catalog):
+    """Programs are listed newest first, filtered and paginated."""
+    assert [p["id"] for p in catalog.list()] == ["program_d", "program_c", "program_b", "program_a"]
+    assert [p["id"] for p in catalog.list(signature_name="SigA", offset=1, limit=1)] == ["program_b"]
+    assert [p["id"] for p in catalog.list(base_program_id="program_a")] == ["program_d", "program_b"]
+    assert catalog.count(signature_name="SigA") == 3
+
+
+def test_sync_picks_up_changes(catalog):
+    """Sync adds new programs and drops deleted ones."""
+    import shutil
+    
+    write_program("program_e", "SigB", 5.0)
+    shutil.rmtree(Config.PROGRAM_DIR / "program_a")
+    catalog.sync(Config.PROGRAM_DIR)
+    
+    ids = {p["id"] for p in catalog.list()}
+    assert "program_e" in ids
+    assert "program_a" not in ids
+
+
+def test_app_state_uses_catalog(app_state):
+    """AppState lists programs per signature newest first and removes deleted ones."""
+    write_program("program_a", "SigA", 1.0)
+    write_program("program_b", "SigA", 2.0)
+    app_state.load_available_programs()
+    
+    assert list(app_state.get_programs_for_signature("SigA")) == ["program_b", "program_a"]
+    assert app_state.current_program_id == "program_b"
+    
+    assert app_state.delete_program("program_b")
+    assert list(app_state.get_programs_for_signature("SigA")) == ["program_a"]
+    assert app_state.current_program_id == "program_a"
+
+
+def test_app_state_keeps_programs_newest_first(app_state):
+    """Registered programs go first, and deleting the current one selects the newest left."""
+    write_program("program_a", "SigA", 1.0)
+    write_program("program_b", "SigA", 2.0)
+    app_state.load_available_programs()
+    
+    write_program("program_c", "SigA", 3.0)
+    app_state.register_program("program_c")
+    assert list(app_state.programs) == ["program_c", "program_b", "program_a"]
+    
+    assert app_state.set_current_program("program_c")
+    assert app_state.delete_program("program_c")
+    assert app_state.current_program_id == "program_b"
+    
+    # A program registered by another process is found through the catalog
+    write_program("program_d", "SigB", 4.0)
+    other = ProgramCatalog(Config.DATA_DIR / "catalog.sqlite3")
+    other.add(Config.PROGRAM_DIR / "program_d")
+    other.close()
+    assert app_state.set_current_program("program_d")
+    assert next(iter(app_state.programs)) == "program_d"
+
+
+def test_next_sequence_increases_across_catalogs(tmp_path):
+    """Catalogs sharing a database never hand out the same sequence number."""
+    first = ProgramCatalog(tmp_path / "catalog.sqlite3")
+    second = ProgramCatalog(tmp_path / "catalog.sqlite3")
+    
+    numbers = [first.next_sequence(), second.next_sequence(), first.next_sequence()]
+    assert numbers == [1, 2, 3]
+    
+    first.close()
+    second.close()
@@ -112,4 +112,172 @@ def test_clean_pln_list_duplicates():
     
     # Check that the score is a valid value
     assert isinstance(score, float)
-    assert 0 <= score <= 1
\ No newline at end of file
+    assert 0 <= score <= 1
+
+def test_metta_pool_reuses_interpreters():
+    """Interpreters are created up to the pool size and reset when returned."""
+    from app.utils.metta.pool import MeTTaPool
+    
+    factory = MagicMock(side_effect=lambda: MagicMock())
+    pool = MeTTaPool(factory, size=2)
+    
+    with pool.interpreter() as first:
+        pass
+    with pool.interpreter() as second:
+        pass
+    assert first is second
+    assert factory.call_count == 1
+    assert first.reset_kb.call_count == 2
+    
+    # Two interpreters are needed while one is checked out
+    with pool.interpreter() as outer:
+        with pool.interpreter() as inner:
+            assert inner is not outer
+    assert factory.call_count == 2
+
+def test_metta_pool_replaces_interpreter_that_fails_to_reset():
+    """A thread waiting for the only interpreter gets a new one if it fails to reset."""
+    import threading
+    from app.utils.metta.pool import MeTTaPool
+    
+    broken = MagicMock()
+    broken.reset_kb.side_effect = RuntimeError("reset failed")
+    replacement = MagicMock()
+    factory = MagicMock(side_effect=[broken, replacement])
+    pool = MeTTaPool(factory, size=1)
+    
+    acquired = []
+    handler = pool.acquire()
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()), daemon=True)
+    waiter.start()
+    pool.release(handler)
+    waiter.join(5)
+    
+    assert acquired == [replacement]
+    assert factory.call_count == 2
+    assert pool._created == 1
+
+def test_metta_pool_resets_kb_changed_by_any_call():
+    """Atoms added to &kb by arbitrary code don't leak to the next checkout."""
+    from app.utils.metta.metta_handler import MeTTaHandler
+    from app.utils.metta.pool import MeTTaPool
+    
+    pool = MeTTaPool(lambda: MeTTaHandler("tmp.json", read_only=True), size=1)
+    with pool.interpreter() as first:
+        first.run("!(add-atom &kb (leaked atom))")
+        assert first.run_clean("!(match &kb (leaked $x) $x)") == ["atom"]
+    with pool.interpreter() as second:
+        assert second is first
+        assert second.run_clean("!(match &kb (leaked $x) $x)") == []
+
+def test_check_stmt_metta_uses_pool():
+    """MeTTa checks score statements without booting an interpreter per call."""
+    from app.utils import cleanpln
+    from app.utils.metta.pool import MeTTaPool
+    
+    handler = MagicMock()
+    handler.run_clean.return_value = ["1.0"]
+    factory = MagicMock(return_value=handler)
+    with patch.object(cleanpln, "metta_pool", MeTTaPool(factory, size=1)):
+        assert cleanpln.check_stmt_metta("(: $prf (WithTV (Dog max) (STV 1.0 1.0)))") == 1.0
+        assert cleanpln.check_stmt_metta("(: $prf (WithTV (Cat tom) (STV 1.0 1.0)))") == 1.0
+    assert factory.call_count == 1
+
+def _sample_pln_lines():
+    """Every PLN line of the PLNTask samples, as written and with balanced parentheses."""
+    import json
+    from pathlib import Path
+    from app.utils.cleanpln import balance_parentheses
+    
+    sample_file = Path(__file__).parent.parent / "samples" / "PLNTask_samples.json"
+    with open(sample_file, "r") as f:
+        samples = json.load(f)
+    lines = []
+    for sample in samples:
+        for field in ("pln_types", "pln_statements", "pln_queries"):
+            for line in str(sample.get(field, "")).splitlines():
+                line = line.strip()
+                if line:
+                    lines.append(line)
+                    lines.append(balance_parentheses(line)[0])
+    return lines
+
+def test_match_stmt_shape_agrees_with_metta():
+    """The Python fast path gives the same scores as MeTTa on all sample data."""
+    from app.utils.cleanpln import match_stmt_shape, check_stmt_metta
+    
+    lines = _sample_pln_lines()
+    decided = 0
+    for line in lines:
+        score = match_stmt_shape(line)
+        if score is None:
+            continue
+        decided += 1
+        assert score == check_stmt_metta(line), line
+    
+    # Only comments, unbalanced lines and the like should need MeTTa
+    assert decided > 0.9 * len(lines)
+
+@pytest.mark.parametrize("expr", [
+    "$x",
+    "foo",
+    "()",
+    "(: a b)",
+    "(: a (WithTV b $tv))",
+    "(: a (WithTV b (STV 1)))",
+    "(: $x (WithTV $x (STV 1 1)))",
+    "($x a (WithTV b ($x 1 1)))",
+    "(: a ($x b (STV $x 1)))",
+    '(: a (WithTV "b c" (STV 1 1)))',
+    '("x" a (WithTV b (STV 1 1)))',
+    '(: a"q" (WithTV b (STV 1 1)))',
+    '(: "unterminated (WithTV b (STV 1 1)))',
+    "(: &kb (WithTV b (STV 1 1)))",
+    "(: a (WithTV b (STV 1 1))) ; comment",
+    "(: a (WithTV b (STV 1 1))) (x)",
+    "(: a (WithTV b (STV 1 1))))",
+])
+def test_checkStmt_edge_cases_agree_with_metta(expr):
+    """checkStmt gives the MeTTa answer whether or not the fast path decides."""
+    from app.utils.cleanpln import checkStmt, check_stmt_metta
+    
+    assert checkStmt(expr) == check_stmt_metta(expr)
+
+def test_clean_and_score_batch_in_worker_processes():
+    """Batches cleaned by worker processes come back in input order with cleanAndScore's results."""
+    from app.config import Config
+    from app.utils.cleanpln import clean_and_score_batch, cleanAndScore, shutdown_clean_process_pool
+    
+    exprs = [
+        "(: a (WithTV (Dog a) (STV 1.0 1.0)))",
+        "(: b (WithTV (Cat b) (STV 1.0 1.0))) ; needs MeTTa",
+        "(: c (WithTV (Bird c) (STV 1.0 1.0)",
+        "Birds can fly.",
+        "(: d (WithTV (Fish d) (STV 1.0 1.0))) ; needs MeTTa",
+    ]
+    with patch.object(Config, "PLN_CLEAN_PROCESSES", 2), patch.object(Config, "PLN_CLEAN_MIN_BATCH", 1):
+        try:
+            results = clean_and_score_batch(exprs)
+        finally:
+            shutdown_clean_process_pool()
+    
+    assert results == [cleanAndScore(expr) for expr in exprs]
+
+def test_clean_and_score_batch_in_process():
+    """Small batches are cleaned without starting worker processes."""
+    from app.utils import cleanpln
+    
+    with patch.object(cleanpln, "get_clean_process_pool") as mock_get_pool:
+        results = cleanpln.clean_and_score_batch(["(: a (WithTV (Dog a) (STV 1.0 1.0))) ; x"])
+    mock_get_pool.assert_not_called()
+    assert results == [cleanpln.cleanAndScore("(: a (WithTV (Dog a) (STV 1.0 1.0))) ; x")]
+
+def test_spawned_workers_do_not_build_the_app():
+    """Workers re-importing wsgi.py as __mp_main__ don't build an application."""
+    import runpy
+    from app.config import Config
+    
+    with patch("app.create_app") as mock_create_app:
+        module_globals = runpy.run_path(str(Config.BASE_DIR / "wsgi.py"), run_name="__mp_main__")
+    mock_create_app.assert_not_called()
+    assert "app" not in module_globals
@@ -0,0 +1,87 @@
+"""Tests for the command line interface."""
+import json
+from unittest.mock import MagicMock, patch
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from app.cli import cli, parse_sample_ids
+
+
+def test_parse_sample_ids():
+    """Sample ranges, shards and limits select sample indices."""
+    assert parse_sample_ids(None, None, None, 10) is None
+    assert parse_sample_ids("0-3,7,2", None, None, 10) == [0, 1, 2, 3, 7]
+    assert parse_sample_ids(None, "1/3", None, 10) == [1, 4, 7]
+    assert parse_sample_ids("0-9", "0/2", 3, 10) == [0, 2, 4]
+    with pytest.raises(click.BadParameter):
+        parse_sample_ids(None, "3/3", None, 10)
+    with pytest.raises(click.BadParameter):
+        parse_sample_ids("a-b", None, None, 10)
+
+
+@pytest.fixture
+def services():
+    """Fixture for mocked services with one program and four samples."""
+    app_state = MagicMock()
+    app_state.current_program_id = "program_1"
+    app_state.programs = {"program_1": {"signature_name": "QASignature"}}
+    sample_manager = MagicMock()
+    sample_manager.count_samples.return_value = 4
+    services = {
+        "app_state": app_state,
+        "sample_manager": sample_manager,
+        "optimizer": MagicMock(),
+        "evaluator": MagicMock(),
+    }
+    with patch("app.cli.create_services", return_value=services):
+        yield services
+
+
+def test_evaluate_writes_json_to_stdout_only(services):
+    """Progress printed by the services doesn't end up in the JSON output."""
+    def run_evaluation(model, similarity_model, **options):
+        print("evaluating sample 1")
+        return {"status": "success", "program_id": options["program_id"],
+                "metrics": {"avg_score": 1.0, "num_samples": 2, "cache_hits": 0},
+                "results": [], "options": options}
+    services["evaluator"].run_evaluation.side_effect = run_evaluation
+    
+    result = CliRunner().invoke(cli, ["evaluate", "--model", "openai/gpt-4o", "--workers", "4",
+                                                      "--no-cache", "--shard", "1/2"])
+    
+    assert result.exit_code == 0, result.stderr
+    output = json.loads(result.stdout)
+    assert output["options"] == {"num_workers": 4, "program_id": "program_1",
+                                 "use_cache": False, "sample_ids": [1, 3]}
+    assert "evaluating sample 1" in result.stderr
+
+
+def test_evaluate_jsonl_streams_records(services):
+    """JSONL output has one record per line and fails on an error record."""
+    services["evaluator"].stream_evaluation.return_value = iter([
+        {"type": "start", "total": 1},
+        {"type": "result", "sample_id": 0, "score": 1.0},
+        {"type": "done"},
+    ])
+    result = CliRunner().invoke(cli, ["evaluate", "--model", "m", "--format", "jsonl"])
+    assert result.exit_code == 0
+    assert [json.loads(line)["type"] for line in result.stdout.splitlines()] == ["start", "result", "done"]
+    
+    services["evaluator"].stream_evaluation.return_value = iter([{"type": "error", "message": "no samples"}])
+    result = CliRunner().invoke(cli, ["evaluate", "--model", "m", "--format", "jsonl"])
+    assert result.exit_code == 1
+
+
+def test_optimize_reports_new_program(services):
+    """The optimized program ID is returned, and a failed optimization exits with an error."""
+    services["optimizer"].run_optimization.return_value = "program_2"
+    result = CliRunner().invoke(cli, ["optimize", "--model", "m", "--samples", "0-1"])
+    assert result.exit_code == 0
+    assert json.loads(result.stdout)["program_id"] == "program_2"
+    services["optimizer"].run_optimization.assert_called_once_with("m", "QASignature", "program_1", [0, 1])
+    
+    services["optimizer"].run_optimization.return_value = None
+    result = CliRunner().invoke(cli, ["optimize", "--model", "m"])
+    assert result.exit_code == 1
@@ -107,4 +107,213 @@ def test_run_evaluation_with_model_error(mock_judge, evaluator, app_state, sampl
             assert results["average_score"] == 0  # Should be 0 due to errors
             
             # Check that judge_metric was not called (since prediction failed)
-            mock_judge.assert_not_called()
\ No newline at end of file
+            mock_judge.assert_not_called()
+
+class ContextRecordingProgram:
+    """Mock program that records the LM active in the calling thread."""
+    
+    def __init__(self, delays):
+        self.delays = delays
+    
+    def __call__(self, **kwargs):
+        import time
+        import dspy
+        time.sleep(self.delays.get(kwargs["query"], 0))
+        return dspy.Prediction(response=f"{kwargs['query']}|{dspy.settings.lm}")
+
+@pytest.fixture
+def concurrent_setup(app_state, sample_manager, basic_signature):
+    """Register a program and samples for concurrent evaluation tests."""
+    app_state.add_signature(basic_signature)
+    app_state.programs["program_test"] = {"signature_name": basic_signature.name}
+    app_state.current_program_id = "program_test"
+    samples = [{"query": f"q{i}", "response": f"r{i}"} for i in range(6)]
+    # Make the first samples the slowest so they finish last
+    delays = {f"q{i}": 0.05 * (6 - i) for i in range(6)}
+    return samples, ContextRecordingProgram(delays)
+
+def test_run_evaluation_concurrent_order_and_context(evaluator, sample_manager, concurrent_setup):
+    """Concurrent evaluation keeps sample order and per-thread LM contexts."""
+    import dspy
+    samples, program = concurrent_setup
+    judge_lms = []
+    
+    def fake_judge(example, pred, trace=None, signature=None):
+        judge_lms.append(dspy.settings.lm)
+        return 1.0, "ok"
+    
+    with patch.object(sample_manager, "load_samples", return_value=samples), \
+         patch("app.services.evaluation.dspy.load", return_value=program), \
+         patch("app.utils.get_lm", side_effect=lambda name: f"lm:{name}"), \
+         patch("app.services.evaluation.judge_metric", side_effect=fake_judge):
+        results = evaluator.run_evaluation("eval-model", "sim-model", num_workers=4)
+    
+    assert results["status"] == "success"
+    assert results["metrics"]["num_workers"] == 4
+    assert results["metrics"]["avg_score"] == 1.0
+    assert [r["sample_id"] for r in results["results"]] == list(range(6))
+    for i, result in enumerate(results["results"]):
+        assert result["predicted_response"] == f"q{i}|lm:eval-model"
+    assert judge_lms == ["lm:sim-model"] * 6
+
+def test_run_evaluation_uses_model_max_workers(evaluator, app_state, sample_manager, concurrent_setup):
+    """The worker count defaults to the model's max_workers parameter."""
+    from app.models.model import ModelDefinition
+    samples, program = concurrent_setup
+    model = ModelDefinition(name="test-model", provider="test",
+                            parameters={"temperature": 0.0, "max_workers": 3})
+    app_state.models[model.full_name] = model
+    
+    with patch.object(sample_manager, "load_samples", return_value=samples), \
+         patch("app.services.evaluation.dspy.load", return_value=program), \
+         patch("app.utils.get_lm", side_effect=lambda name: f"lm:{name}"), \
+         patch("app.services.evaluation.judge_metric", return_value=(0.5, "ok")):
+        results = evaluator.run_evaluation(model.full_name)
+    
+    assert results["metrics"]["num_workers"] == 3
+    assert model.lm_parameters == {"temperature": 0.0}
+    del app_state.models[model.full_name]
+
+def test_stream_evaluation_records(evaluator, sample_manager, concurrent_setup):
+    """Streaming yields a start record, one record per sample and a done record."""
+    samples, program = concurrent_setup
+    scores = iter([1.0, 0.5, 0.0, 1.0, 0.5, 0.0])
+    
+    with patch.object(sample_manager, "load_samples", return_value=samples), \
+         patch("app.services.evaluation.dspy.load", return_value=program), \
+         patch("app.utils.get_lm", side_effect=lambda name: f"lm:{name}"), \
+         patch("app.services.evaluation.judge_metric", side_effect=lambda e, p, signature=None: (next(scores), "why")):
+        records = list(evaluator.stream_evaluation("eval-model", num_workers=1))
+    
+    assert records[0] == {"type": "start", "program_id": "program_test", "total": 6, "num_workers": 1}
+    results = records[1:-1]
+    assert [r["sample_id"] for r in results] == list(range(6))
+    assert [r["completed"] for r in results] == list(range(1, 7))
+    assert results[1]["running_avg_score"] == 0.75
+    assert results[0]["explanation"] == "why"
+    assert results[0]["latency"] >= 0
+    assert records[-1]["type"] == "done"
+    assert records[-1]["metrics"]["avg_score"] == 0.5
+
+def test_stream_evaluation_error(evaluator, app_state):
+    """Streaming reports validation errors as a single error record."""
+    app_state.current_program_id = None
+    records = list(evaluator.stream_evaluation("eval-model"))
+    assert records == [{"type": "error", "message": "No program selected. Please select a program first."}]
+
+def test_stream_evaluation_abort_cancels_pending(evaluator, sample_manager, concurrent_setup):
+    """Closing the stream early stops samples that have not started."""
+    samples, program = concurrent_setup
+    calls = []
+    
+    def fake_judge(example, pred, trace=None, signature=None):
+        calls.append(example.query)
+        return 1.0, "ok"
+    
+    with patch.object(sample_manager, "load_samples", return_value=samples * 10), \
+         patch("app.services.evaluation.dspy.load", return_value=program), \
+         patch("app.utils.get_lm", side_effect=lambda name: f"lm:{name}"), \
+         patch("app.services.evaluation.judge_metric", side_effect=fake_judge):
+        records = evaluator.stream_evaluation("eval-model", num_workers=2)
+        next(records)  # start
+        next(records)  # first result
+        records.close()
+        import time
+        time.sleep(0.5)
+    
+    assert len(calls) < 60
+
+def test_run_evaluation_cancel(evaluator, sample_manager, concurrent_setup):
+    """Setting the cancel event stops that run only, after the samples in flight."""
+    import threading
+    samples, program = concurrent_setup
+    cancel_event = threading.Event()
+    calls = []
+    
+    def fake_judge(example, pred, trace=None, signature=None):
+        calls.append(example.query)
+        cancel_event.set()
+        return 1.0, "ok"
+    
+    with patch.object(sample_manager, "load_samples", return_value=samples), \
+         patch("app.services.evaluation.dspy.load", return_value=program), \
+         patch("app.utils.get_lm", side_effect=lambda name: f"lm:{name}"), \
+         patch("app.services.evaluation.judge_metric", side_effect=fake_judge):
+        cancelled = evaluator.run_evaluation("eval-model", num_workers=1, cancel_event=cancel_event)
+        # Another run on the same evaluator is not affected
+        finished = evaluator.run_evaluation("eval-model", num_workers=1)
+    
+    assert cancelled["status"] == "cancelled"
+    assert len(calls) == 1 + len(samples)
+    assert finished["status"] == "success"
+
+def test_run_evaluation_records_served_models(evaluator, sample_manager, concurrent_setup):
+    """Each result names the models that answered for its sample, also when cached."""
+    import dspy
+    from app.utils.lm_client import _note_served
+    samples, _ = concurrent_setup
+    
+    def program(**kwargs):
+        _note_served("eval-model")
+        return dspy.Prediction(response=kwargs["query"])
+    
+    with patch.object(sample_manager, "load_samples", return_value=samples[:2]), \
+         patch("app.services.evaluation.dspy.load", return_value=program), \
+         patch("app.services.evaluation.program_fingerprint", return_value="program-hash"), \
+         patch("app.utils.get_lm", side_effect=lambda name: f"lm:{name}"), \
+         patch("app.services.evaluation.judge_metric", return_value=(1.0, "ok")):
+        first = evaluator.run_evaluation("eval-model", num_workers=1)
+        second = evaluator.run_evaluation("eval-model", num_workers=1)
+    
+    for results, cached in ((first, False), (second, True)):
+        assert [r["cached"] for r in results["results"]] == [cached, cached]
+        assert [r["served_models"] for r in results["results"]] == [["eval-model"]] * 2
+        assert results["results"][0]["predicted_response"] == "q0"
+
+def test_run_evaluation_skips_caching_fallback_outputs(evaluator, sample_manager, concurrent_setup):
+    """Outputs served by a fallback model are not cached, and fallbacks are part of the key."""
+    import dspy
+    from types import SimpleNamespace
+    from app.utils.lm_client import _note_served
+    samples, _ = concurrent_setup
+    served = iter(["openai/backup", "openai/primary", "openai/primary"])
+    lms = {
+        "primary": SimpleNamespace(model="openai/primary", kwargs={}, fallbacks=("backup",)),
+        "backup": SimpleNamespace(model="openai/backup", kwargs={}),
+        "other-backup": SimpleNamespace(model="openai/other-backup", kwargs={}),
+    }
+    
+    def program(**kwargs):
+        _note_served(next(served))
+        return dspy.Prediction(response=kwargs["query"])
+    
+    with patch.object(sample_manager, "load_samples", return_value=samples[:1]), \
+         patch("app.services.evaluation.dspy.load", return_value=program), \
+         patch("app.services.evaluation.program_fingerprint", return_value="program-hash"), \
+         patch("app.utils.get_lm", side_effect=lambda name: lms[name]), \
+         patch("app.services.evaluation.judge_metric", return_value=(1.0, "ok")):
+        from_fallback = evaluator.run_evaluation("primary", num_workers=1)
+        from_primary = evaluator.run_evaluation("primary", num_workers=1)
+        lms["primary"].fallbacks = ("other-backup",)
+        other_chain = evaluator.run_evaluation("primary", num_workers=1)
+        repeated = evaluator.run_evaluation("primary", num_workers=1)
+    
+    assert from_fallback["results"][0]["served_models"] == ["openai/backup"]
+    assert from_fallback["results"][0]["cached"] is False
+    assert from_primary["results"][0]["cached"] is False
+    assert other_chain["results"][0]["cached"] is False
+    assert repeated["results"][0]["cached"] is True
+
+def test_run_evaluation_sample_subset(evaluator, sample_manager, concurrent_setup):
+    """A subset of samples keeps the indices of the full sample list."""
+    samples, program = concurrent_setup
+    
+    with patch.object(sample_manager, "load_samples", return_value=samples), \
+         patch("app.services.evaluation.dspy.load", return_value=program), \
+         patch("app.utils.get_lm", side_effect=lambda name: f"lm:{name}"), \
+         patch("app.services.evaluation.judge_metric", return_value=(1.0, "ok")):
+        results = evaluator.run_evaluation("eval-model", num_workers=2, sample_ids=[4, 1, 99])
+    
+    assert [r["sample_id"] for r in results["results"]] == [1, 4]
+    assert results["results"][1]["predicted_response"] == "q4|lm:eval-model"
+    assert results["metrics"]["num_samples"] == 2
@@ -0,0 +1,152 @@
+"""Tests for model fallback chains and hedged requests."""
+import time
+from unittest.mock import patch
+
+import dspy
+import pytest
+
+from app.models.model import ModelDefinition
+from app.utils.lm_client import ManagedLM, track_served_models
+from app.utils.rate_limit import rate_limiters
+
+
+def provider(delays, failing=()):
+    """Create a fake provider call that answers after a per-model delay."""
+    def call(self, prompt=None, messages=None, **kwargs):
+        time.sleep(delays.get(self.model, 0))
+        if self.model in failing:
+            raise RuntimeError(f"{self.model} is down")
+        return [f"answer from {self.model}"]
+    return call
+
+
+@pytest.fixture
+def chain():
+    """Fixture for a client with two fallbacks, created without model definitions."""
+    lm = ManagedLM("deepseek/deepseek-reasoner", cache=False)
+    lm.fallbacks = ("openai/gpt-4o", "anthropic/claude")
+    with patch("app.utils.get_lm", side_effect=lambda name: ManagedLM(name, cache=False)):
+        yield lm
+
+
+def test_hedged_request_takes_first_answer(chain):
+    """A slow primary is hedged with the next model after the delay."""
+    chain.hedge_delay = 0.05
+    delays = {"deepseek/deepseek-reasoner": 1.0, "openai/gpt-4o": 0.01}
+    
+    with patch.object(dspy.LM, "__call__", provider(delays)), track_served_models() as served:
+        start = time.monotonic()
+        outputs = chain(prompt="question")
+        elapsed = time.monotonic() - start
+    
+    assert outputs == ["answer from openai/gpt-4o"]
+    assert served == ["openai/gpt-4o"]
+    assert elapsed < 0.5
+
+
+def test_hedge_waiting_for_its_limiter_is_dropped(chain):
+    """A hedged request still waiting for its provider's limiter when an answer arrives is not sent."""
+    chain.fallbacks = ("openai/gpt-4o",)
+    chain.hedge_delay = 0.05
+    calls = []
+    answer = provider({"deepseek/deepseek-reasoner": 0.2})
+    
+    def call(self, prompt=None, messages=None, **kwargs):
+        calls.append(self.model)
+        return answer(self, prompt, messages, **kwargs)
+    
+    limiter = rate_limiters.configure("openai", max_in_flight=1)
+    try:
+        with patch.object(dspy.LM, "__call__", call):
+            # Keep the fallback's provider busy until the primary has answered
+            with limiter.request():
+                outputs = chain(prompt="question")
+            time.sleep(0.1)
+    finally:
+        rate_limiters.clear()
+    
+    assert outputs == ["answer from deepseek/deepseek-reasoner"]
+    assert calls == ["deepseek/deepseek-reasoner"]
+
+
+def test_copy_keeps_chain_settings(chain):
+    """Copies dspy makes of a client keep its fallbacks and hedging delay."""
+    chain.hedge_delay = 0.5
+    
+    copied = chain.copy(temperature=0.5)
+    assert copied.fallbacks == chain.fallbacks
+    assert copied.hedge_delay == 0.5
+    assert copied.kwargs["temperature"] == 0.5
+    
+    changed = chain.copy(fallbacks=["openai/gpt-4o"], hedge_delay=None)
+    assert changed.fallbacks == ("openai/gpt-4o",)
+    assert changed.hedge_delay is None
+    assert "fallbacks" not in changed.kwargs
+
+
+def test_fast_primary_is_not_hedged(chain):
+    """A primary answering within the delay serves the request alone."""
+    chain.hedge_delay = 0.5
+    
+    with patch.object(dspy.LM, "__call__", provider({})), track_served_models() as served:
+        assert chain(prompt="question") == ["answer from deepseek/deepseek-reasoner"]
+    assert served == ["deepseek/deepseek-reasoner"]
+
+
+def test_failures_fall_through_the_chain(chain):
+    """Without a hedging delay, each model is only asked once the previous one failed."""
+    failing = ("deepseek/deepseek-reasoner", "openai/gpt-4o")
+    
+    with patch.object(dspy.LM, "__call__", provider({}, failing)), track_served_models() as served:
+        assert chain(prompt="question") == ["answer from anthropic/claude"]
+    assert served == ["anthropic/claude"]
+    
+    with patch.object(dspy.LM, "__call__", provider({}, failing + ("anthropic/claude",))):
+        with pytest.raises(RuntimeError):
+            chain(prompt="question")
+
+
+def test_unhedged_chain_runs_in_calling_thread(chain):
+    """Without a hedging delay no pool thread is used."""
+    import threading
+    threads = []
+    answer = provider({}, ("deepseek/deepseek-reasoner",))
+    
+    def call(self, prompt=None, messages=None, **kwargs):
+        threads.append(threading.current_thread())
+        return answer(self, prompt, messages, **kwargs)
+    
+    with patch.object(dspy.LM, "__call__", call):
+        assert chain(prompt="question") == ["answer from openai/gpt-4o"]
+    assert threads == [threading.current_thread()] * 2
+
+
+def test_chain_pool_is_sized_from_model_definitions():
+    """The hedging pool has room for every concurrent call of each hedged model."""
+    from app.config import Config
+    from app.utils import lm_client
+    hedged = ModelDefinition(name="deepseek-reasoner", provider="deepseek", parameters={
+        "max_workers": 10, "fallbacks": ["openai/gpt-4o", "anthropic/claude"], "hedge_delay": 1
+    })
+    unhedged = ModelDefinition(name="gpt-4o", provider="openai", parameters={
+        "max_workers": 50, "fallbacks": ["anthropic/claude"]
+    })
+    
+    try:
+        assert lm_client.configure_chain_workers([hedged, unhedged]) == Config.LM_CHAIN_WORKERS + 30
+        assert lm_client._chain_executor._max_workers == Config.LM_CHAIN_WORKERS + 30
+    finally:
+        lm_client.configure_chain_workers([])
+    assert lm_client._chain_executor._max_workers == Config.LM_CHAIN_WORKERS
+
+
+def test_model_definition_chain_parameters():
+    """Fallbacks and the hedging delay are read from the parameters and not passed to dspy.LM."""
+    model = ModelDefinition(name="deepseek-reasoner", provider="deepseek", parameters={
+        "temperature": 0.0,
+        "fallbacks": ["deepseek/deepseek-reasoner", "openai/gpt-4o"],
+        "hedge_delay": "2.5"
+    })
+    assert model.fallbacks == ["openai/gpt-4o"]
+    assert model.hedge_delay == 2.5
+    assert model.lm_parameters == {"temperature": 0.0}
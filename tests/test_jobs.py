@@ -0,0 +1,150 @@
+"""Tests for background evaluation jobs."""
+
+import json
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from app.config import Config
+from app.services.jobs import EvaluationJobManager
+
+def fake_evaluation(release):
+    """Create a fake run_evaluation that reports two samples and waits for release."""
+    def run_evaluation(model_name, similarity_model_name=None, num_workers=None,
+                       program_id=None, on_result=None, use_cache=True, cancel_event=None):
+        on_result({"sample_id": 1, "overall_score": 0.5}, 1, 2)
+        deadline = time.time() + 5
+        while not release.wait(0.01) and time.time() < deadline:
+            if cancel_event and cancel_event.is_set():
+                return {"status": "cancelled", "message": "Evaluation was cancelled after 1 of 2 samples"}
+        on_result({"sample_id": 0, "overall_score": 1.0}, 2, 2)
+        return {
+            "status": "success",
+            "program_id": program_id,
+            "metrics": {"avg_score": 0.75, "num_samples": 2},
+            "results": [
+                {"sample_id": 0, "overall_score": 1.0},
+                {"sample_id": 1, "overall_score": 0.5}
+            ]
+        }
+    return run_evaluation
+
+@pytest.fixture
+def release():
+    """Event that lets a fake evaluation finish."""
+    return threading.Event()
+
+@pytest.fixture
+def job_manager(app_state, release):
+    """Fixture for an EvaluationJobManager with a fake evaluator."""
+    evaluator = MagicMock()
+    evaluator.run_evaluation.side_effect = fake_evaluation(release)
+    app_state.current_program_id = "program_test"
+    return EvaluationJobManager(app_state, evaluator, max_jobs=2)
+
+def wait_for(job, timeout=5):
+    """Wait until a job has finished."""
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.01)
+
+def test_submit_returns_before_evaluation_finishes(job_manager, release):
+    """Submitting a job returns immediately and exposes partial results."""
+    job = job_manager.submit("test-model")
+    
+    assert job.id.startswith("eval_")
+    assert job.program_id == "program_test"
+    
+    # The evaluation is blocked after its first sample
+    deadline = time.time() + 5
+    while job.completed < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    status = job.to_dict()
+    assert status["status"] == "running"
+    assert status["completed"] == 1
+    assert status["total"] == 2
+    assert job.get_partial_results() == [{"sample_id": 1, "overall_score": 0.5}]
+    
+    release.set()
+    wait_for(job)
+    
+    assert job.status == "completed"
+    assert job.get_partial_results(offset=1) == [{"sample_id": 0, "overall_score": 1.0}]
+    assert job.result["metrics"]["avg_score"] == 0.75
+    assert job.result["job_id"] == job.id
+
+def test_results_are_stored_per_job(job_manager, app_state, release):
+    """Each finished job keeps its own result on disk."""
+    release.set()
+    first = job_manager.submit("model-a")
+    second = job_manager.submit("model-b")
+    wait_for(first)
+    wait_for(second)
+    
+    for job in (first, second):
+        with open(Config.EVALUATIONS_DIR / f"{job.id}.json") as f:
+            data = json.load(f)
+        assert data["model"] == job.model_name
+        assert data["result"]["status"] == "success"
+    
+    # Finished jobs can be loaded back after a restart
+    job_manager.jobs.clear()
+    reloaded = job_manager.get_job(first.id)
+    assert reloaded.status == "completed"
+    assert reloaded.result == first.result
+    assert {job["job_id"] for job in job_manager.list_jobs()} == {first.id, second.id}
+
+def test_finished_jobs_leave_memory_and_are_listed_from_the_index(job_manager, release):
+    """Finished jobs are dropped from memory, and listings don't read their results files."""
+    release.set()
+    job = job_manager.submit("model-a")
+    wait_for(job)
+    deadline = time.time() + 5
+    while job.id in job_manager.jobs and time.time() < deadline:
+        time.sleep(0.01)
+    
+    assert job.id not in job_manager.jobs
+    assert job_manager.get_job(job.id).result == job.result
+    
+    # A job saved before the index existed is added to it the first time jobs are listed
+    legacy = dict(job.to_dict(include_result=True), job_id="eval_legacy", created_at=0)
+    with open(Config.EVALUATIONS_DIR / "eval_legacy.json", "w") as f:
+        json.dump(legacy, f)
+    assert [data["job_id"] for data in job_manager.list_jobs()] == [job.id, "eval_legacy"]
+    
+    for job_id in (job.id, "eval_legacy"):
+        with open(Config.EVALUATIONS_DIR / f"{job_id}.json", "w") as f:
+            f.write("not read by listings")
+    listed = job_manager.list_jobs()
+    assert [data["job_id"] for data in listed] == [job.id, "eval_legacy"]
+    assert listed[0]["status"] == "completed"
+    assert "result" not in listed[0]
+
+def test_failed_evaluation_marks_job_failed(app_state):
+    """An evaluation error is reported on the job."""
+    evaluator = MagicMock()
+    evaluator.run_evaluation.return_value = {"status": "error", "message": "No samples"}
+    manager = EvaluationJobManager(app_state, evaluator, max_jobs=1)
+    
+    job = manager.submit("test-model", program_id="program_test")
+    wait_for(job)
+    
+    assert job.status == "failed"
+    assert job.error == "No samples"
+    assert manager.get_job("eval_missing") is None
+
+def test_cancel_job(job_manager):
+    """A cancelled job stops and is reported as cancelled."""
+    job = job_manager.submit("test-model")
+    deadline = time.time() + 5
+    while job.completed < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    
+    assert job_manager.cancel(job.id) is True
+    wait_for(job)
+    
+    assert job.status == "cancelled"
+    assert job.get_partial_results() == [{"sample_id": 1, "overall_score": 0.5}]
+    assert job_manager.cancel(job.id) is False
+    assert job_manager.cancel("eval_missing") is None
@@ -0,0 +1,69 @@
+"""Tests for incremental JSON parsing."""
+import io
+import json
+
+import pytest
+
+from app.utils.json_stream import iter_json_values
+
+
+def parse(text, chunk_size=3):
+    """Parse text in small chunks, so values span chunk boundaries."""
+    return list(iter_json_values(io.BytesIO(text.encode("utf-8")), chunk_size=chunk_size))
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps([{"query": "é" * 10, "n": 12345}, [1.5, None], "text", 7]),
+    json.dumps([{"query": "a"}, {"query": "b"}], indent=2),
+    "[]",
+    "﻿[1, 2]",
+])
+def test_parses_json_arrays(text):
+    """JSON arrays are parsed value by value, whatever the chunk boundaries."""
+    assert parse(text) == json.loads(text.lstrip("﻿"))
+
+
+def test_parses_jsonl():
+    """Anything not starting with an array is read as a value per line."""
+    assert parse('{"query": "a"}\n\n{"query": "b"}\n123') == [{"query": "a"}, {"query": "b"}, 123]
+    assert parse("") == []
+
+
+@pytest.mark.parametrize("text", ["[1,", "[1 2]", "[1] 2", '[{"query": }]'])
+def test_rejects_invalid_json(text):
+    """Malformed files raise ValueError."""
+    with pytest.raises(ValueError):
+        parse(text)
+
+
+def test_rejects_values_over_the_limit():
+    """A value larger than the limit is rejected instead of read whole."""
+    text = json.dumps(["x" * 1000])
+    with pytest.raises(ValueError):
+        list(iter_json_values(io.BytesIO(text.encode()), chunk_size=16, max_value_size=100))
+
+
+@pytest.mark.parametrize("text, expected", [
+    (json.dumps([{"a": 'x"y\\z]}', "b": [[1], {"c": "\u00e9"}]}, -1.5e3, True, None]),
+     [{"a": 'x"y\\z]}', "b": [[1], {"c": "\u00e9"}]}, -1500.0, True, None]),
+    ('{"a": "\\\\"}\n"tail\\"]"\n-12', [{"a": "\\"}, 'tail"]', -12]),
+])
+def test_strings_and_escapes_across_chunks(text, expected):
+    """Brackets and escapes inside strings don't end a value, whatever the chunk size."""
+    for chunk_size in (1, 2, 5):
+        assert parse(text, chunk_size) == expected
+
+
+def test_large_value_scanned_once():
+    """A value spanning many chunks is decoded once, not after every chunk."""
+    from unittest.mock import patch
+    text = json.dumps([{"query": "x" * 100000}, {"query": "y"}])
+    decode = json.JSONDecoder.raw_decode
+    calls = []
+    def counting_decode(self, s, idx=0):
+        calls.append(idx)
+        return decode(self, s, idx)
+    with patch.object(json.JSONDecoder, "raw_decode", counting_decode):
+        values = list(iter_json_values(io.BytesIO(text.encode()), chunk_size=1024))
+    assert values == json.loads(text)
+    assert len(calls) == 2
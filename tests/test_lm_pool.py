@@ -0,0 +1,47 @@
+"""Tests for the LM client pool."""
+from unittest.mock import patch, MagicMock
+
+from app.models.model import ModelDefinition
+from app.utils import get_lm
+from app.utils.lm_pool import lm_pool, HISTORY_SIZE
+
+
+@patch('app.utils.lm_pool.ManagedLM')
+def test_get_lm_reuses_clients(mock_lm):
+    """Clients are shared per model name and parameters."""
+    mock_lm.side_effect = lambda *args, **kwargs: MagicMock(history=[])
+    
+    first = get_lm("openai/gpt-4o")
+    assert get_lm("openai/gpt-4o") is first
+    assert get_lm("openai/gpt-4o", temperature=0.5) is not first
+    assert mock_lm.call_count == 2
+    assert lm_pool.stats() == {"entries": 2, "hits": 1, "misses": 2}
+
+
+@patch('app.utils.lm_pool.ManagedLM')
+def test_update_and_delete_model_invalidate_clients(mock_lm, app_state):
+    """Changing a model's definition creates new clients for it."""
+    mock_lm.side_effect = lambda *args, **kwargs: MagicMock(history=[])
+    model = ModelDefinition(name="gpt-4o", provider="openai", parameters={"temperature": 0.0})
+    app_state.add_model(model)
+    other = get_lm("openai/gpt-4o-mini")
+    
+    first = get_lm(model.full_name)
+    model.parameters = {"temperature": 0.7}
+    app_state.update_model(model)
+    second = get_lm(model.full_name)
+    assert second is not first
+    mock_lm.assert_called_with(model.full_name, temperature=0.7)
+    
+    app_state.delete_model(model.full_name)
+    assert get_lm("openai/gpt-4o-mini") is other
+    assert len(lm_pool) == 1
+
+
+@patch('app.utils.lm_pool.ManagedLM')
+def test_pooled_client_history_is_bounded(mock_lm):
+    """A shared client only keeps its most recent calls."""
+    mock_lm.return_value = MagicMock(history=list(range(HISTORY_SIZE + 10)))
+    
+    lm = get_lm("openai/gpt-4o")
+    assert lm.history == list(range(10, HISTORY_SIZE + 10))
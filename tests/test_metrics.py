@@ -172,4 +172,67 @@ def test_create_dynamic_judge(mock_chain):
     assert judge_class.__name__ == "TestSignatureJudgeSignature"
     
     # The signature definition should be available from the class
-    assert hasattr(judge_class, "__module__")
\ No newline at end of file
+    assert hasattr(judge_class, "__module__")
+@patch("app.utils.metrics.create_dynamic_judge")
+@patch("dspy.ChainOfThought")
+def test_judge_generic_metric_uses_cache(mock_chain, mock_create_judge, basic_signature, app_state):
+    """Repeated judgements of the same outputs are served from the judge cache."""
+    import dspy
+    
+    class Example:
+        def __init__(self, **kwargs):
+            for k, v in kwargs.items():
+                setattr(self, k, v)
+    
+    mock_judge = MagicMock()
+    mock_judge.return_value.similarity = 0.7
+    mock_judge.return_value.explanation = "Close enough"
+    mock_chain.return_value = mock_judge
+    app_state.signatures = {basic_signature.name: basic_signature}
+    
+    example = Example(query="q", response="expected")
+    judge_lm = MagicMock(model="judge-model", kwargs={"temperature": 0.0})
+    
+    with dspy.context(lm=judge_lm):
+        first = metrics.judge_generic_metric(example, Example(response="predicted"))
+        second = metrics.judge_generic_metric(example, Example(response="predicted"))
+        metrics.judge_generic_metric(example, Example(response="different"))
+    
+    assert first == second == (0.7, "Close enough")
+    assert mock_judge.call_count == 2
+    stats = metrics.get_judge_cache().stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+def test_get_judge_is_compiled_once_per_signature_version(basic_signature):
+    """The judge is reused until the signature is edited."""
+    judge = metrics.get_judge(basic_signature)
+    assert metrics.get_judge(basic_signature) is judge
+    
+    basic_signature.description = "An edited description"
+    edited_judge = metrics.get_judge(basic_signature)
+    assert edited_judge is not judge
+    assert metrics.get_judge(basic_signature) is edited_judge
+
+@patch("app.utils.metrics.get_judge")
+def test_judge_generic_metric_uses_given_signature(mock_get_judge, basic_signature, app_state):
+    """An explicitly passed signature is used even if the example matches another one."""
+    import dspy
+    from app.models.signature import SignatureDefinition
+    
+    mock_get_judge.return_value.return_value = MagicMock(similarity=1.0, explanation="Same")
+    other = SignatureDefinition(
+        name="OtherSignature",
+        signature_class_def="",
+        input_fields=["query"],
+        output_fields=["response"]
+    )
+    app_state.signatures = {other.name: other}
+    
+    example = dspy.Example(query="q", response="r")
+    metrics.judge_generic_metric(example, dspy.Prediction(response="r"), signature=basic_signature)
+    mock_get_judge.assert_called_once_with(basic_signature)
+    
+    mock_get_judge.reset_mock()
+    metrics.judge_generic_metric(example, dspy.Prediction(response="r"))
+    mock_get_judge.assert_called_once_with(other)
@@ -0,0 +1,71 @@
+"""Tests for the loaded-program cache."""
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.config import Config
+from app.services.program_cache import ProgramCache
+
+
+@pytest.fixture
+def program_dirs(app_state):
+    """Fixture for three saved programs in the temporary program directory."""
+    for program_id in ("program_1", "program_2", "program_3"):
+        program_dir = Config.PROGRAM_DIR / program_id
+        program_dir.mkdir(parents=True)
+        (program_dir / "program.pkl").write_bytes(b"v1")
+    return Config.PROGRAM_DIR
+
+
+def test_get_returns_cached_program(program_dirs):
+    """A program is unpickled once and then served from memory."""
+    cache = ProgramCache(max_entries=2)
+    with patch("app.services.program_cache.dspy.load", side_effect=lambda path: object()) as mock_load:
+        first = cache.get("program_1")
+        assert cache.get("program_1") is first
+    assert mock_load.call_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_get_reloads_changed_program(program_dirs):
+    """Saving over program.pkl makes the next get load the new version."""
+    cache = ProgramCache(max_entries=2)
+    with patch("app.services.program_cache.dspy.load", side_effect=lambda path: object()):
+        first = cache.get("program_1")
+        pkl = program_dirs / "program_1" / "program.pkl"
+        pkl.write_bytes(b"version 2")
+        stat = pkl.stat()
+        os.utime(pkl, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert cache.get("program_1") is not first
+
+
+def test_least_recently_used_program_is_evicted(program_dirs):
+    """Only max_entries programs stay loaded."""
+    cache = ProgramCache(max_entries=2)
+    with patch("app.services.program_cache.dspy.load", side_effect=lambda path: object()) as mock_load:
+        first = cache.get("program_1")
+        cache.get("program_2")
+        cache.get("program_1")
+        cache.get("program_3")  # Evicts program_2
+        assert len(cache) == 2
+        assert cache.get("program_1") is first
+        cache.get("program_2")
+    assert mock_load.call_count == 4
+
+
+def test_invalidate_drops_program(program_dirs):
+    """An invalidated program is loaded again."""
+    cache = ProgramCache(max_entries=2)
+    with patch("app.services.program_cache.dspy.load", side_effect=lambda path: object()):
+        first = cache.get("program_1")
+        cache.invalidate("program_1")
+        assert cache.get("program_1") is not first
+
+
+def test_missing_program_is_not_cached(app_state):
+    """Programs without a program.pkl are passed to dspy.load but never cached."""
+    cache = ProgramCache(max_entries=2)
+    with patch("app.services.program_cache.dspy.load", side_effect=lambda path: object()):
+        cache.get("program_missing")
+    assert len(cache) == 0
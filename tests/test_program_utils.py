@@ -0,0 +1,104 @@
+"""Tests for program utility functions."""
+import json
+from pathlib import Path
+
+import dspy
+import pytest
+
+from app.config import Config
+from app.utils.program_utils import save_program, resave_program
+
+
+class QASignature(dspy.Signature):
+    """Answer the question."""
+    question = dspy.InputField(desc="The question")
+    answer = dspy.OutputField(desc="The answer")
+
+
+@pytest.fixture
+def program():
+    """Fixture for a program with one demo."""
+    task = dspy.ChainOfThought(QASignature)
+    task.predict.demos = [dspy.Example(question="What is 2 + 2?", answer="4")]
+    return task
+
+
+def test_save_program_stores_instructions_and_profile(app_state, program):
+    """Instructions and a prompt profile are written to metadata.json."""
+    Config.PROGRAM_DIR.mkdir(exist_ok=True)
+    program_id = save_program(program, "test-model", "QASignature", "Answer questions")
+    
+    with open(Config.PROGRAM_DIR / program_id / "metadata.json") as f:
+        metadata = json.load(f)
+    assert metadata["signature_name"] == "QASignature"
+    assert metadata["instructions"] == "Answer the question."
+    assert metadata["prompt_profile"]["num_demos"] == 1
+    assert metadata["prompt_profile"]["demo_chars"] == len("What is 2 + 2?") + len("4")
+    assert metadata["prompt_profile"]["estimated_prompt_tokens"] > 0
+
+
+def test_resave_program_keeps_metadata(app_state, program):
+    """Saving edited instructions keeps the rest of the metadata."""
+    Config.PROGRAM_DIR.mkdir(exist_ok=True)
+    program_id = save_program(program, "test-model", "QASignature", "Answer questions")
+    
+    edited = program.deepcopy()
+    edited.predict.signature = edited.predict.signature.with_instructions("Answer briefly.")
+    metadata = resave_program(edited, program_id)
+    
+    assert metadata["instructions"] == "Answer briefly."
+    assert metadata["model"] == "test-model"
+    assert metadata["signature_name"] == "QASignature"
+    # The original program's signature is not changed
+    assert program.predict.signature.instructions == "Answer the question."
+    # No temporary files are left behind
+    assert sorted(p.name for p in Config.PROGRAM_DIR.iterdir()) == [program_id]
+
+
+def test_resave_program_failure_keeps_old_program(app_state, program, monkeypatch):
+    """A program that fails to save again leaves the saved one untouched."""
+    Config.PROGRAM_DIR.mkdir(exist_ok=True)
+    program_id = save_program(program, "test-model", "QASignature", "Answer questions")
+    program_dir = Config.PROGRAM_DIR / program_id
+    saved = {path.name: path.read_bytes() for path in program_dir.iterdir()}
+    
+    edited = program.deepcopy()
+    
+    def fail(path, **kwargs):
+        # Fail part way through, after writing some of the program
+        (Path(path) / "program.pkl").write_bytes(b"partial")
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(edited, "save", fail)
+    
+    with pytest.raises(RuntimeError):
+        resave_program(edited, program_id)
+    assert {path.name: path.read_bytes() for path in program_dir.iterdir()} == saved
+    assert sorted(p.name for p in Config.PROGRAM_DIR.iterdir()) == [program_id]
+
+
+def test_save_program_ids_are_unique_and_increasing(app_state, program):
+    """Programs saved concurrently get distinct IDs in creation order."""
+    from concurrent.futures import ThreadPoolExecutor
+    
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        program_ids = list(executor.map(
+            lambda _: save_program(program, "test-model", "QASignature", "Answer questions"),
+            range(8)
+        ))
+    
+    assert len(set(program_ids)) == 8
+    sequence_numbers = [int(program_id.rsplit("_", 1)[1]) for program_id in program_ids]
+    assert sorted(sequence_numbers) == list(range(1, 9))
+    # Only the published programs are left in the program directory
+    assert sorted(p.name for p in Config.PROGRAM_DIR.iterdir()) == sorted(program_ids)
+
+
+def test_save_program_failure_leaves_no_directory(app_state, program, monkeypatch):
+    """A program that fails to save is never published."""
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(program, "save", fail)
+    
+    with pytest.raises(RuntimeError):
+        save_program(program, "test-model", "QASignature", "Answer questions")
+    assert list(Config.PROGRAM_DIR.iterdir()) == []
@@ -0,0 +1,116 @@
+"""Tests for per-provider rate limiting."""
+import threading
+import time
+from unittest.mock import patch
+
+import dspy
+
+from app.models.model import ModelDefinition
+from app.utils.lm_client import ManagedLM
+from app.utils.rate_limit import TokenBucket, ProviderLimiter, rate_limiters
+
+
+def test_token_bucket_waits_for_refill():
+    """Taking more than is available waits for the bucket to refill."""
+    bucket = TokenBucket(per_minute=600)  # 10 tokens per second
+    bucket.acquire(600)
+    
+    start = time.monotonic()
+    bucket.acquire(2)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_max_in_flight_limits_concurrency():
+    """No more than max_in_flight requests run at once."""
+    limiter = ProviderLimiter(max_in_flight=2)
+    lock = threading.Lock()
+    running = []
+    peak = []
+    
+    def request():
+        with limiter.request():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+    
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+
+
+def test_rate_limits_exclude_invalid_values():
+    """Only positive rate limits are used, and none are passed to dspy.LM."""
+    model = ModelDefinition(name="claude", provider="anthropic", parameters={
+        "temperature": 0.0, "rpm": 50, "tpm": "bad", "max_in_flight": 0
+    })
+    assert model.rate_limits == {"rpm": 50}
+    assert model.lm_parameters == {"temperature": 0.0}
+
+
+def test_managed_lm_records_actual_usage():
+    """Copies share the provider's limiter, which is charged the tokens actually used."""
+    limiter = rate_limiters.configure("anthropic", tpm=10000)
+    
+    def fake_call(self, prompt=None, messages=None, **kwargs):
+        self.history.append({"messages": messages, "usage": {"total_tokens": 100}})
+        return ["answer"]
+    
+    lm = ManagedLM("anthropic/claude", max_tokens=1000, cache=False)
+    with patch.object(dspy.LM, "__call__", fake_call):
+        assert lm(prompt="x" * 400) == ["answer"]
+        assert lm.copy()(prompt="x" * 400) == ["answer"]
+    
+    assert 9790 < limiter.tokens.tokens < 9810
+    rate_limiters.clear()
+
+
+def test_limiters_built_from_all_models(app_state):
+    """Provider limits come from every model definition, and conflicting values are refused."""
+    assert app_state.add_model(ModelDefinition(
+        name="claude-a", provider="anthropic", parameters={"rpm": 50}
+    ))
+    assert app_state.add_model(ModelDefinition(
+        name="claude-b", provider="anthropic", parameters={"rpm": 50, "tpm": 1000}
+    ))
+    limiter = rate_limiters.get("anthropic")
+    assert limiter.limits == (50, 1000, None)
+    
+    # Adding an unrelated model keeps the existing limiter and its budget
+    assert app_state.add_model(ModelDefinition(name="gpt", provider="openai"))
+    assert rate_limiters.get("anthropic") is limiter
+    
+    assert not app_state.add_model(ModelDefinition(
+        name="claude-c", provider="anthropic", parameters={"rpm": 10}
+    ))
+    assert "anthropic/claude-c" not in app_state.models
+    assert rate_limiters.get("anthropic").limits == (50, 1000, None)
+    
+    app_state.delete_model("anthropic/claude-b")
+    assert rate_limiters.get("anthropic").limits == (50, None, None)
+    rate_limiters.clear()
+
+
+def test_cached_responses_skip_the_limiter():
+    """Only calls that reach the provider are charged to its limiter."""
+    limiter = rate_limiters.configure("anthropic", tpm=10000)
+    calls = []
+    
+    def fake_call(self, prompt=None, messages=None, **kwargs):
+        calls.append(kwargs.get("cache"))
+        self.history.append({"messages": messages, "usage": {"total_tokens": 100}})
+        return ["answer"]
+    
+    lm = ManagedLM("anthropic/claude-cached", max_tokens=1000)
+    with patch.object(dspy.LM, "__call__", fake_call):
+        assert lm(prompt="cached limiter test") == ["answer"]
+        assert lm(prompt="cached limiter test") == ["answer"]
+    
+    assert len(calls) == 2
+    assert 9890 < limiter.tokens.tokens < 9910
+    rate_limiters.clear()
@@ -0,0 +1,205 @@
+"""Tests for the sample stores."""
+import json
+
+import pytest
+
+from app.config import Config
+from app.services.sample_store import (
+    JSONLSampleStore, JSONSampleStore, SQLiteSampleStore, StaleSampleFileError, jsonl_sample_file
+)
+
+
+def write_json_samples(signature_name, samples):
+    """Write a JSON sample file for a signature."""
+    Config.SAMPLES_DIR.mkdir(parents=True, exist_ok=True)
+    with open(Config.SAMPLES_DIR / f"{signature_name}_samples.json", "w") as f:
+        json.dump(samples, f)
+
+
+@pytest.fixture(params=["sqlite", "json", "jsonl"])
+def store(request, app_state):
+    """Fixture for an empty store of each kind."""
+    if request.param == "sqlite":
+        store = SQLiteSampleStore(Config.DATA_DIR / "samples.sqlite3")
+    elif request.param == "jsonl":
+        store = JSONLSampleStore()
+    else:
+        store = JSONSampleStore()
+    yield store
+    store.close()
+
+
+def test_row_operations(store):
+    """Samples are added, updated and deleted by index."""
+    samples = [{"query": f"q{i}"} for i in range(4)]
+    assert store.add("Sig", samples) == 4
+    assert store.count("Sig") == 4
+    assert store.get("Sig", 2) == {"query": "q2"}
+    assert store.get("Sig", 4) is None
+
+    assert store.update("Sig", 1, {"query": "changed"})
+    assert store.delete("Sig", 0)
+    assert not store.delete("Sig", 10)
+    assert not store.update("Sig", -1, {"query": "nope"})
+    assert store.list("Sig") == [{"query": "changed"}, {"query": "q2"}, {"query": "q3"}]
+    assert store.list("Other") == []
+
+    assert store.page("Sig", 1, 5) == [{"query": "q2"}, {"query": "q3"}]
+    assert list(store.stream("Sig", 2)) == [{"query": "q3"}]
+
+    store.replace("Sig", [{"query": "only"}])
+    assert store.list("Sig") == [{"query": "only"}]
+
+
+def test_sqlite_imports_json_once(app_state):
+    """The JSON file of a signature is imported on first use and not again."""
+    write_json_samples("Sig", [{"query": "a"}, {"query": "b"}])
+    store = SQLiteSampleStore(Config.DATA_DIR / "samples.sqlite3")
+    assert store.list("Sig") == [{"query": "a"}, {"query": "b"}]
+    store.delete("Sig", 0)
+    store.close()
+
+    # A new store over the same database must not import the file again
+    store = SQLiteSampleStore(Config.DATA_DIR / "samples.sqlite3")
+    assert store.list("Sig") == [{"query": "b"}]
+    assert store.migrate("Sig") == 0
+    assert store.migrate("Sig", force=True) == 2
+    assert store.count("Sig") == 2
+    store.close()
+
+
+def test_sqlite_refuses_changed_json_file(app_state):
+    """A JSON file changed after its import is refused until it is re-imported."""
+    write_json_samples("Sig", [{"query": "a"}])
+    store = SQLiteSampleStore(Config.DATA_DIR / "samples.sqlite3")
+    assert store.count("Sig") == 1
+
+    # Rewriting the same content is not a change
+    write_json_samples("Sig", [{"query": "a"}])
+    assert store.count("Sig") == 1
+
+    write_json_samples("Sig", [{"query": "a"}, {"query": "new"}])
+    with pytest.raises(StaleSampleFileError):
+        store.list("Sig")
+    with pytest.raises(StaleSampleFileError):
+        store.add("Sig", [{"query": "b"}])
+    assert store.migrate("Sig", force=True) == 2
+    assert store.list("Sig") == [{"query": "a"}, {"query": "new"}]
+
+    # Removing the file after the import keeps the stored samples
+    (Config.SAMPLES_DIR / "Sig_samples.json").unlink()
+    assert store.count("Sig") == 2
+    store.close()
+
+
+def test_sqlite_stores_are_shared(app_state):
+    """Writes through one store are seen by another on the same database."""
+    first = SQLiteSampleStore(Config.DATA_DIR / "samples.sqlite3")
+    second = SQLiteSampleStore(Config.DATA_DIR / "samples.sqlite3")
+    first.add("Sig", [{"query": "a"}])
+    second.add("Sig", [{"query": "b"}])
+    assert first.list("Sig") == second.list("Sig") == [{"query": "a"}, {"query": "b"}]
+    first.close()
+    second.close()
+
+
+def test_sample_manager_row_methods(sample_manager, app_state, basic_signature, sample_data):
+    """SampleManager edits single samples through its store."""
+    app_state.add_signature(basic_signature)
+    app_state.set_current_signature(basic_signature.name)
+
+    assert sample_manager.add_samples(sample_data) == 2
+    assert sample_manager.update_sample(0, {"query": "q", "response": "r"})
+    assert sample_manager.get_sample(0) == {"query": "q", "response": "r"}
+    assert sample_manager.delete_sample(1)
+    assert sample_manager.load_samples() == [{"query": "q", "response": "r"}]
+    assert sample_manager.count_samples(basic_signature.name) == 1
+
+
+def test_jsonl_index_follows_file(app_state):
+    """The JSONL offset index is rebuilt when the file changes behind the store."""
+    store = JSONLSampleStore()
+    store.add("Sig", [{"query": "a"}, {"query": "b"}])
+    index_file = jsonl_sample_file("Sig").with_name("Sig_samples.jsonl.idx")
+    assert index_file.stat().st_size == 3 * 8
+
+    # Hand-edited file, with a blank line and no trailing newline
+    jsonl_sample_file("Sig").write_text('{"query": "x"}\n\n{"query": "y"}')
+    assert store.count("Sig") == 2
+    assert store.get("Sig", 1) == {"query": "y"}
+
+    store.add("Sig", [{"query": "z"}])
+    assert store.list("Sig") == [{"query": "x"}, {"query": "y"}, {"query": "z"}]
+
+
+def test_sample_manager_uses_jsonl_file(sample_manager, app_state, basic_signature, sample_data):
+    """A signature with a JSONL sample file is read from it, whatever the configured store."""
+    app_state.add_signature(basic_signature)
+    JSONLSampleStore().add(basic_signature.name, sample_data)
+
+    assert sample_manager.get_sample(1, basic_signature.name) == sample_data[1]
+    assert list(sample_manager.iter_samples(basic_signature.name, offset=1)) == sample_data[1:]
+    sample_manager.add_samples([{"query": "q", "response": "r"}], basic_signature.name)
+    assert len(JSONLSampleStore().list(basic_signature.name)) == 3
+
+
+def test_version_changes_with_samples(store):
+    """The version of a signature changes whenever its samples do."""
+    versions = [store.version("Sig")]
+    store.add("Sig", [{"query": "a"}])
+    versions.append(store.version("Sig"))
+    store.update("Sig", 0, {"query": "bb"})
+    versions.append(store.version("Sig"))
+    store.delete("Sig", 0)
+    versions.append(store.version("Sig"))
+    assert None not in versions
+    assert len(set(versions)) == 4
+
+
+def collect(store, **query):
+    """Follow the cursors of a query to the end, returning the sample IDs in order."""
+    ids = []
+    cursor = None
+    while True:
+        page, cursor = store.query("Sig", cursor=cursor, limit=2, **query)
+        assert len(page) <= 2
+        ids.extend(index for index, _ in page)
+        if cursor is None:
+            return ids
+
+
+def test_query_pages_filters_and_sorts(store):
+    """Queries filter by field text, sort by field, and page with cursors."""
+    store.add("Sig", [
+        {"query": "Paris", "tags": ["city"]},
+        {"query": "london", "tags": ["city", "uk"]},
+        {"query": "Berlin"},
+        {"query": "paris, texas", "tags": ["city", "us"]},
+        {"query": "Lyon"},
+    ])
+    assert collect(store) == [0, 1, 2, 3, 4]
+    assert collect(store, descending=True) == [4, 3, 2, 1, 0]
+    assert collect(store, filters={"query": "PARIS"}) == [0, 3]
+    assert collect(store, filters={"tags": '"uk"'}) == [1]
+    assert collect(store, filters={"query": "o", "tags": "city"}) == [1]
+    assert collect(store, sort="query") == [2, 4, 0, 1, 3]
+    # Lists sort by their JSON text, and missing fields as empty text
+    assert collect(store, sort="tags", descending=True) == [0, 3, 1, 4, 2]
+
+    page, cursor = store.query("Sig", limit=2)
+    with pytest.raises(ValueError):
+        store.query("Sig", sort="query", cursor=cursor)
+    with pytest.raises(ValueError):
+        store.query("Sig", cursor="not a cursor")
+
+
+def test_sqlite_streams_in_batches(app_state):
+    """Streaming reads the SQLite store a batch at a time, across offsets and limits."""
+    store = SQLiteSampleStore(Config.DATA_DIR / "samples.sqlite3")
+    store.STREAM_BATCH_SIZE = 3
+    store.add("Sig", [{"n": i} for i in range(10)])
+    store.add("Other", [{"n": -1}])
+    assert [s["n"] for s in store.stream("Sig")] == list(range(10))
+    assert [s["n"] for s in store.stream("Sig", 2, 5)] == [2, 3, 4, 5, 6]
+    assert list(store.stream("Sig", 10)) == []
+    store.close()
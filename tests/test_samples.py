@@ -73,7 +73,7 @@ def test_save_samples_integration(mock_isfile, mock_exists, temp_dir, sample_man
     try:
         # Save samples
         with patch("pathlib.Path.open", return_value=open(temp_path, "w")):
-            sample_manager.save_samples(basic_signature.name, sample_data)
+            sample_manager.save_samples(sample_data, basic_signature.name)
             
         # The file should have been accessed
         assert temp_path.exists()
@@ -110,4 +110,122 @@ def test_load_samples_nonexistent(mock_exists, sample_manager, app_state, basic_
     samples = sample_manager.load_samples(basic_signature.name)
     
     # Should return an empty list
-    assert samples == []
\ No newline at end of file
+    assert samples == []
+def test_load_samples_cached_until_changed(sample_manager, app_state, basic_signature, sample_data):
+    """Loaded samples are shared read-only until the store changes."""
+    app_state.add_signature(basic_signature)
+    sample_manager.save_samples(sample_data, basic_signature.name)
+
+    samples = sample_manager.load_samples(basic_signature.name)
+    assert sample_manager.load_samples(basic_signature.name) is samples
+    assert sample_manager.cache_stats()["hits"] == 1
+    with pytest.raises(TypeError):
+        samples.append({})
+    with pytest.raises(TypeError):
+        samples[0]["query"] = "changed"
+
+    sample_manager.update_sample(0, {**samples[0], "query": "changed"}, basic_signature.name)
+    assert sample_manager.load_samples(basic_signature.name)[0]["query"] == "changed"
+
+    # Changes made through another manager are picked up by the version check
+    other = SampleManager(app_state)
+    other.add_samples([{"query": "q", "response": "r"}], basic_signature.name)
+    assert len(sample_manager.load_samples(basic_signature.name)) == 3
+
+def test_query_samples_cached_and_uncached(sample_manager, app_state, basic_signature, sample_data):
+    """Queries give the same pages from the cache as from the store."""
+    app_state.add_signature(basic_signature)
+    sample_manager.save_samples(sample_data * 3, basic_signature.name)
+    query = dict(filters={"response": "paris"}, sort="query", limit=2)
+
+    uncached = sample_manager.query_samples(basic_signature.name, **query)
+    sample_manager.load_samples(basic_signature.name)
+    cached = sample_manager.query_samples(basic_signature.name, **query)
+    assert cached == uncached
+    assert [sample_id for sample_id, _ in cached[0]] == [0, 2]
+    assert cached[1] is not None
+
+def test_dashboard_and_listing_read_the_file_once(sample_manager, app_state, basic_signature, sample_data):
+    """Repeated dashboard and listing reads are served from the cache after the first parse."""
+    from app.services import sample_store
+    app_state.add_signature(basic_signature)
+    sample_manager.save_samples(sample_data * 3, basic_signature.name)
+
+    with patch.object(sample_store, "read_json_samples", wraps=sample_store.read_json_samples) as read:
+        for _ in range(3):
+            # Dashboard
+            assert len(list(sample_manager.iter_samples(basic_signature.name, limit=3))) == 3
+            assert sample_manager.count_samples(basic_signature.name) == 6
+            # Listing
+            page, _ = sample_manager.query_samples(basic_signature.name, limit=2)
+            assert [sample_id for sample_id, _ in page] == [0, 1]
+            assert sample_manager.count_samples(basic_signature.name) == 6
+            assert sample_manager.get_sample(5, basic_signature.name) == sample_data[1]
+
+    assert read.call_count == 1
+    assert sample_manager.cache_stats() == {"hits": 14, "misses": 1, "signatures": 1}
+
+def test_stream_import_and_export(sample_manager, app_state, basic_signature, sample_data):
+    """Imports are written in batches with progress records, and exports round-trip."""
+    import io
+    app_state.add_signature(basic_signature)
+    sample_manager.save_samples(sample_data, basic_signature.name)
+    upload = json.dumps(sample_data * 3 + [{"query": "no response"}, 5])
+
+    records = list(sample_manager.stream_import(io.BytesIO(upload.encode()), basic_signature.name, batch_size=4))
+    assert [r["type"] for r in records] == ["start", "progress", "progress", "done"]
+    assert records[0] == {"type": "start", "total": 6, "invalid": 2, "existing": 2, "replace": False}
+    assert records[-1]["imported"] == 6
+    assert sample_manager.count_samples(basic_signature.name) == 8
+
+    exported = "".join(sample_manager.stream_export(basic_signature.name))
+    assert json.loads(exported) == sample_data * 4
+    jsonl = "".join(sample_manager.stream_export(basic_signature.name, "jsonl"))
+
+    records = list(sample_manager.stream_import(io.BytesIO(jsonl.encode()), basic_signature.name, replace=True))
+    assert records[-1]["type"] == "done"
+    assert sample_manager.load_samples(basic_signature.name) == sample_data * 4
+
+
+def test_stream_import_rejects_bad_files_without_writing(sample_manager, app_state, basic_signature, sample_data):
+    """A malformed file is reported before any sample is written."""
+    import io
+    app_state.add_signature(basic_signature)
+    sample_manager.save_samples(sample_data, basic_signature.name)
+    upload = json.dumps(sample_data)[:-5]
+
+    records = list(sample_manager.stream_import(io.BytesIO(upload.encode()), basic_signature.name, replace=True))
+    assert [r["type"] for r in records] == ["error"]
+    assert sample_manager.load_samples(basic_signature.name) == sample_data
+
+
+@pytest.mark.parametrize("store_kind", ["json", "sqlite"])
+def test_stream_import_failing_partway_keeps_samples(store_kind, sample_manager, app_state, basic_signature, sample_data):
+    """An import that fails or is abandoned after some batches leaves the samples as they were."""
+    import io
+    from app.services.sample_store import SQLiteSampleStore
+    if store_kind == "sqlite":
+        sample_manager.store = SQLiteSampleStore(Config.DATA_DIR / "samples.sqlite3")
+    app_state.add_signature(basic_signature)
+    sample_manager.save_samples(sample_data, basic_signature.name)
+    upload = json.dumps([{"query": f"q{i}", "response": "r"} for i in range(6)]).encode()
+
+    validate = sample_manager.validate_sample
+    calls = []
+    def failing_validate(sample, signature_name=None):
+        calls.append(sample)
+        if len(calls) == 10:
+            raise OSError("disk full")
+        return validate(sample, signature_name)
+
+    with patch.object(sample_manager, "validate_sample", failing_validate):
+        records = list(sample_manager.stream_import(io.BytesIO(upload), basic_signature.name,
+                                                    replace=True, batch_size=2))
+    assert [r["type"] for r in records] == ["start", "progress", "error"]
+    assert sample_manager.load_samples(basic_signature.name) == sample_data
+
+    records = sample_manager.stream_import(io.BytesIO(upload), basic_signature.name, batch_size=2)
+    assert [next(records)["type"], next(records)["type"]] == ["start", "progress"]
+    records.close()
+    assert sample_manager.load_samples(basic_signature.name) == sample_data
+    sample_manager.store.close()
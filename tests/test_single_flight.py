@@ -0,0 +1,118 @@
+"""Tests for coalescing identical in-flight LM requests."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import dspy
+import pytest
+
+from app.utils.lm_client import ManagedLM, lm_requests
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    """Callers with the same key wait for the call in flight."""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    
+    def slow_call():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+    
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        leader = executor.submit(flight.do, "key", slow_call)
+        started.wait(5)
+        followers = [executor.submit(flight.do, "key", slow_call) for _ in range(2)]
+        while flight.stats()["coalesced"] < 2:
+            pass
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+    
+    assert results == ["result"] * 3
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 2, "in_flight": 0}
+    
+    # Once the call has finished, the next one is made again
+    assert flight.do("key", lambda: "again") == "again"
+
+
+def test_followers_receive_the_error():
+    """An exception from the call is raised to every waiting caller."""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    
+    def failing_call():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("rate limited")
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "key", failing_call)
+        started.wait(5)
+        follower = executor.submit(flight.do, "key", failing_call)
+        while flight.stats()["coalesced"] < 1:
+            pass
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_managed_lm_only_coalesces_cacheable_requests():
+    """Identical cacheable requests are coalesced, uncached ones are always sent."""
+    release = threading.Event()
+    sent = []
+    
+    def fake_call(self, prompt=None, messages=None, **kwargs):
+        sent.append(prompt)
+        release.wait(5)
+        return ["answer"]
+    
+    lm = ManagedLM("openai/gpt-4o")
+    before = lm_requests.stats()["coalesced"]
+    with patch.object(dspy.LM, "__call__", fake_call):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            cached = [executor.submit(lm, prompt="same") for _ in range(2)]
+            uncached = [executor.submit(lm, prompt="same", cache=False) for _ in range(2)]
+            while len(sent) < 3 or lm_requests.stats()["coalesced"] < before + 1:
+                pass
+            release.set()
+            assert [f.result() for f in cached + uncached] == [["answer"]] * 4
+    
+    assert len(sent) == 3
+    assert lm_requests.stats()["coalesced"] == before + 1
+
+
+def test_managed_lm_coalesces_only_calls_through_the_same_chain():
+    """Clients of one model with different fallbacks each get their own chain's answer."""
+    import time
+    release = threading.Event()
+    sent = []
+    
+    def fake_call(self, prompt=None, messages=None, **kwargs):
+        sent.append(self.model)
+        if self.model == "openai/gpt-4o":
+            release.wait(5)
+            raise RuntimeError("gpt-4o is down")
+        return [f"answer from {self.model}"]
+    
+    first = ManagedLM("openai/gpt-4o")
+    first.fallbacks = ("anthropic/claude",)
+    second = ManagedLM("openai/gpt-4o")
+    second.fallbacks = ("deepseek/deepseek-chat",)
+    with patch.object(dspy.LM, "__call__", fake_call), \
+         patch("app.utils.get_lm", side_effect=lambda name: ManagedLM(name)):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(lm, prompt="same chain question") for lm in (first, second)]
+            deadline = time.time() + 5
+            while sent.count("openai/gpt-4o") < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result() for future in futures]
+    
+    assert results == [["answer from anthropic/claude"], ["answer from deepseek/deepseek-chat"]]
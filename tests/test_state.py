@@ -108,4 +108,48 @@ def test_load_default_signatures(app_state):
     assert "PLNTask" in app_state.signatures
     
     # Check that the current signature name is set
-    assert app_state.current_signature_name is not None
\ No newline at end of file
+    assert app_state.current_signature_name is not None
+def test_update_signature_invalidates_compiled_classes(app_state, basic_signature):
+    """Updating a signature drops the classes compiled from its old version."""
+    from app.utils.dynamic_classes import dynamic_classes
+    
+    app_state.add_signature(basic_signature)
+    dynamic_classes.get("judge", basic_signature, object)
+    assert len(dynamic_classes) == 1
+    
+    basic_signature.output_fields = ["response", "confidence"]
+    assert app_state.update_signature(basic_signature)
+    assert len(dynamic_classes) == 0
+
+def test_find_signature_for_fields(app_state, basic_signature):
+    """Signatures are found by their fields, preferring the most specific and then the current one."""
+    from app.models.signature import SignatureDefinition
+    
+    app_state.add_signature(basic_signature)
+    assert app_state.find_signature_for_fields(["response", "query"]) is basic_signature
+    assert app_state.find_signature_for_fields(["query"]) is None
+    
+    # Extra keys on an example don't stop it matching
+    assert app_state.find_signature_for_fields(["query", "response", "id"]) is basic_signature
+    
+    # A signature using more of the example's fields wins
+    detailed = SignatureDefinition(
+        name="DetailedSignature",
+        signature_class_def="",
+        input_fields=["query", "context"],
+        output_fields=["response"]
+    )
+    app_state.add_signature(detailed)
+    assert app_state.find_signature_for_fields(["query", "context", "response", "id"]) is detailed
+    assert app_state.find_signature_for_fields(["query", "response", "id"]) is basic_signature
+    
+    # A signature with the same fields only wins when it is the current one
+    twin = SignatureDefinition(
+        name="TwinSignature",
+        signature_class_def="",
+        input_fields=["query"],
+        output_fields=["response"]
+    )
+    app_state.signatures[twin.name] = twin
+    app_state.current_signature_name = twin.name
+    assert app_state.find_signature_for_fields(["query", "response"]) is twin
@@ -0,0 +1,71 @@
+"""Tests for recording and replaying LM calls."""
+from unittest.mock import patch
+
+import dspy
+import pytest
+
+from app.config import Config
+from app.utils.lm_client import ManagedLM
+from app.utils.transcript import LMTranscript, TranscriptMiss, parse_latency
+
+
+@pytest.fixture
+def transport(tmp_path, monkeypatch):
+    """Fixture that sets the LM transport mode, with a transcript in a temporary directory."""
+    monkeypatch.setattr(Config, "LM_TRANSCRIPT", str(tmp_path / "transcript.jsonl"))
+    monkeypatch.setattr(Config, "LM_REPLAY_LATENCY", "none")
+    
+    def set_mode(mode):
+        monkeypatch.setattr(Config, "LM_TRANSPORT", mode)
+    return set_mode
+
+
+def test_record_then_replay_without_provider(transport):
+    """Recorded responses are replayed for the same requests without calling the provider."""
+    def provider_call(self, prompt=None, messages=None, **kwargs):
+        self.history.append({"messages": messages, "usage": {"total_tokens": 12}})
+        return [f"answer to {messages[0]['content']}"]
+    
+    transport("record")
+    lm = ManagedLM("openai/gpt-4o", cache=False)
+    with patch.object(dspy.LM, "__call__", provider_call):
+        assert lm(prompt="first") == ["answer to first"]
+        assert lm(prompt="second", temperature=0.5) == ["answer to second"]
+    
+    transport("replay")
+    lm = ManagedLM("openai/gpt-4o", cache=False, api_key="other-key")
+    with patch.object(dspy.LM, "__call__", side_effect=AssertionError("provider called")):
+        assert lm(prompt="second", temperature=0.5) == ["answer to second"]
+        assert lm(prompt="first") == ["answer to first"]
+        assert lm.history[-1]["usage"] == {"total_tokens": 12}
+        with pytest.raises(TranscriptMiss):
+            lm(prompt="never recorded")
+
+
+def test_repeated_requests_replay_in_recorded_order(tmp_path):
+    """Responses recorded for the same request are served in turn."""
+    path = tmp_path / "transcript.jsonl"
+    recorder = LMTranscript(path, "record")
+    recorder.record("key", "openai/gpt-4o", ["one"], {}, 0.1)
+    recorder.record("key", "openai/gpt-4o", ["two"], {}, 0.1)
+    recorder.close()
+    
+    replayer = LMTranscript(path, "replay")
+    assert len(replayer) == 2
+    assert [replayer.replay("key")["outputs"] for _ in range(3)] == [["one"], ["two"], ["one"]]
+
+
+def test_parse_latency():
+    """Simulated latencies are repeatable for a seed."""
+    entry = {"latency": 1.5}
+    assert parse_latency("none")(entry) == 0.0
+    assert parse_latency("recorded")(entry) == 1.5
+    assert parse_latency("fixed:0.25")(entry) == 0.25
+    
+    first = parse_latency("lognormal:-1,0.5", seed=7)
+    second = parse_latency("lognormal:-1,0.5", seed=7)
+    assert [first(entry) for _ in range(3)] == [second(entry) for _ in range(3)]
+    assert 0.1 <= parse_latency("uniform:0.1,0.2", seed=1)(entry) <= 0.2
+    
+    with pytest.raises(ValueError):
+        parse_latency("uniform:1")
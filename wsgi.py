@@ -1,6 +1,9 @@
 from app import create_app
 
-app = create_app()
+# Worker processes started with spawn, such as the PLN cleaning workers, import
+# this module as __mp_main__; they only need the functions sent to them
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
     app.run(debug=True)